@@ -0,0 +1,114 @@
+"""
+Records/sec of the log formatters compared to the reference (pre-optimization) implementation.
+
+The benchmark verifies that the optimized formatters produce byte-identical output to the reference ones
+(except for the optional `orjson` backend, which uses compact separators) before measuring.
+
+Usage:
+    python benchmarks/formatters.py [--records N]
+"""
+import argparse
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+from runtools.runcli import log
+
+
+class ReferenceJsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        ts = datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds')
+        data = {
+            "timestamp": ts[:-6] + 'Z' if ts.endswith('+00:00') else ts,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        data.update(_reference_collect_extras(record))
+        if record.exc_info and record.exc_info[1]:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class ReferencePlainFormatter(logging.Formatter):
+
+    def format(self, record):
+        msg = f"{record.levelname} - {record.getMessage()}"
+        extras = _reference_collect_extras(record)
+        if extras:
+            msg += ' ' + ' '.join(f"{k}={v}" for k, v in extras.items())
+        if record.exc_info and record.exc_info[1]:
+            msg += '\n' + self.formatException(record.exc_info)
+        return msg
+
+
+def _reference_collect_extras(record):
+    return {k: v for k, v in record.__dict__.items()
+            if k not in log._LOG_RECORD_BUILTINS and not k.startswith('_') and v is not None}
+
+
+def create_records(count):
+    """Records resembling the runjob output events: a few call sites with extras, spread over several seconds."""
+    logger = logging.getLogger('runtools.runjob.bench')
+    start = time.time()
+    records = []
+    for i in range(count):
+        if i % 3 == 0:
+            record = logger.makeRecord(logger.name, logging.DEBUG, __file__, 1, "Output line", None, None,
+                                       extra={"instance": "job@run", "ordinal": i, "is_error": False, "ctx": None})
+        elif i % 3 == 1:
+            record = logger.makeRecord(logger.name, logging.INFO, __file__, 2, "Status %s", (i,), None,
+                                       extra={"instance": "job@run", "event": "progress", "completed": i})
+        else:
+            record = logger.makeRecord(logger.name, logging.WARNING, __file__, 3, "Zażółć %d", (i,), None)
+        record.created = start + i / 1000
+        records.append(record)
+    return records
+
+
+def records_per_sec(formatter, records):
+    start = time.perf_counter()
+    for record in records:
+        formatter.format(record)
+    return len(records) / (time.perf_counter() - start)
+
+
+def verify_identical(reference, optimized, records):
+    for record in records:
+        expected, actual = reference.format(record), optimized.format(record)
+        if expected != actual:
+            raise AssertionError(f"Output differs:\n  reference: {expected}\n  optimized: {actual}")
+
+
+def optimized_formatters():
+    result = [('json', log.JsonFormatter()), ('plain', log.PlainFormatter())]
+    if log.is_json_backend_available(log.JSON_ORJSON):
+        result.append(('json_orjson', log.JsonFormatter(log.JSON_ORJSON)))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark log formatters')
+    parser.add_argument('--records', type=int, default=200_000, help='Number of formatted records')
+    args = parser.parse_args()
+
+    records = create_records(args.records)
+    pairs = [
+        ('json', ReferenceJsonFormatter(), log.JsonFormatter()),
+        ('plain', ReferencePlainFormatter(), log.PlainFormatter()),
+    ]
+    for name, reference, optimized in pairs:
+        verify_identical(reference, optimized, records)
+        before, after = records_per_sec(reference, records), records_per_sec(optimized, records)
+        print(f"{name:<13} reference {before:>10,.0f} rec/s   optimized {after:>10,.0f} rec/s   x{after / before:.2f}")
+
+    if log.is_json_backend_available(log.JSON_ORJSON):
+        before = records_per_sec(ReferenceJsonFormatter(), records)
+        after = records_per_sec(log.JsonFormatter(log.JSON_ORJSON), records)
+        print(f"{'json (orjson)':<13} reference {before:>10,.0f} rec/s   optimized {after:>10,.0f} rec/s   x{after / before:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Lines/sec of the output parsing: the default `OutputParser` applied to every line compared to the parser behind
+`OutputPrefilter` (`--parse-prefilter` / `--parse-marker` options), on output of a chatty job where only a few lines
+carry status information.
+
+Usage:
+    python benchmarks/output_parsing.py [--lines N] [--status-every N]
+"""
+import argparse
+import time
+
+from runtools.runcore.output import OutputLine
+
+from runtools.runcli import job
+from runtools.runcli.output import PARSE_KV
+
+
+def create_lines(count, status_every):
+    lines = []
+    for i in range(count):
+        if i % status_every == 0:
+            message = f"event=[downloading] completed=[{i}] total=[{count}] unit=[files]"
+        else:
+            message = f"processing record {i}: id={i * 7} name=item-{i} status ok, elapsed {i % 97} ms"
+        lines.append(OutputLine(message, i))
+    return lines
+
+
+def lines_per_sec(processors, lines):
+    start = time.perf_counter()
+    for line in lines:
+        for processor in processors:
+            line = processor(line)
+    return len(lines) / (time.perf_counter() - start)
+
+
+def variants():
+    return [
+        ('default', job.create_output_processors()),
+        ('kv_prefilter', job.create_output_processors(parse_prefilter=[PARSE_KV])),
+        ('marker', job.create_output_processors(parse_marker='event')),
+        ('no_parse', job.create_output_processors(parse=False)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark output parsing')
+    parser.add_argument('--lines', type=int, default=200_000, help='Number of processed lines')
+    parser.add_argument('--status-every', type=int, default=1000, help='Every N-th line carries status')
+    args = parser.parse_args()
+
+    lines = create_lines(args.lines, args.status_every)
+    for name, processors in variants():
+        print(f"{name:<14} {lines_per_sec(processors, lines):>12,.0f} lines/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Lines/sec of the output warning matching (`--output-warn` / `--output-warn-literal`) by the number of patterns:
+`OutputWarningMatcher` searching the lines by the gate of all patterns compared to searching by each pattern.
+The cost of the matcher stays about the same regardless of the number of patterns, as only the lines matching
+the gate (rare warnings) are searched by the individual patterns.
+
+Usage:
+    python benchmarks/output_warnings.py [--lines N] [--warn-every N]
+"""
+import argparse
+import re
+import time
+
+from runtools.runcli.output import OutputWarningMatcher
+
+PATTERN_COUNTS = (1, 10, 50, 200)
+
+
+def create_lines(count, warn_every):
+    return [f"ERR{i % 10:03d} request {i} failed" if i % warn_every == 0
+            else f"processing record {i}: id={i * 7} name=item-{i} status ok, elapsed {i % 97} ms"
+            for i in range(count)]
+
+
+def create_patterns(count):
+    return [f"ERR{i:03d}.*failed" for i in range(count)]
+
+
+class _EachPattern:
+
+    def __init__(self, patterns):
+        self.patterns = [re.compile(p) for p in patterns]
+
+    def match(self, text):
+        return next((p.pattern for p in self.patterns if p.search(text)), None)
+
+
+def lines_per_sec(matcher, lines):
+    start = time.perf_counter()
+    for line in lines:
+        matcher.match(line)
+    return len(lines) / (time.perf_counter() - start)
+
+
+def variants():
+    for count in PATTERN_COUNTS:
+        patterns = create_patterns(count)
+        yield f"gate_{count}", OutputWarningMatcher(patterns)
+        yield f"each_{count}", _EachPattern(patterns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark output warning matching')
+    parser.add_argument('--lines', type=int, default=100_000, help='Number of processed lines')
+    parser.add_argument('--warn-every', type=int, default=1000, help='Every N-th line matches a warning pattern')
+    args = parser.parse_args()
+
+    lines = create_lines(args.lines, args.warn_every)
+    for name, matcher in variants():
+        print(f"{name:<10} {lines_per_sec(matcher, lines):>12,.0f} lines/s")
+
+
+if __name__ == '__main__':
+    main()
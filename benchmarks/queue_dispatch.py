@@ -0,0 +1,81 @@
+"""
+Dispatch latency of the local queue (`dispatch.LocalDispatcher`) behind `--serial` / `--max-concurrent`: many
+processes are queued in one concurrency group and each holds its slot only briefly, so the measured time is
+dominated by handing the slot over to the next waiter. The run also verifies that the waiters are admitted
+in FIFO order and that the concurrency limit is never exceeded.
+
+Usage:
+    python benchmarks/queue_dispatch.py [--waiters N] [--max-concurrent N]
+"""
+import argparse
+import multiprocessing
+import statistics
+import tempfile
+import time
+
+from runtools.runcli.dispatch import LocalDispatcher
+
+
+def _waiter(directory, max_concurrent, hold, ready, start, results):
+    dispatcher = LocalDispatcher('bench', max_concurrent, directory=directory)
+    ready.release()
+    start.wait()
+    ticket = dispatcher.acquire()
+    admitted = time.monotonic()
+    time.sleep(hold)
+    results.put((ticket.name, admitted, time.monotonic(), ticket.dispatch_latency))
+    dispatcher.release(ticket)
+
+
+def measure(waiters=200, max_concurrent=1, hold=0.001):
+    """
+    Returns:
+        Tuple of (median dispatch latency in ms, p99 dispatch latency in ms, admissions per second)
+
+    Raises:
+        AssertionError: when the FIFO order or the concurrency limit is violated
+    """
+    ctx = multiprocessing.get_context('fork')
+    ready, start, results = ctx.Semaphore(0), ctx.Event(), ctx.Queue()
+    with tempfile.TemporaryDirectory() as directory:
+        processes = [ctx.Process(target=_waiter, args=(directory, max_concurrent, hold, ready, start, results))
+                     for _ in range(waiters)]
+        for p in processes:
+            p.start()
+        for _ in processes:
+            ready.acquire()
+        begin = time.monotonic()
+        start.set()
+        records = [results.get() for _ in processes]
+        elapsed = time.monotonic() - begin
+        for p in processes:
+            p.join()
+
+    by_admission = sorted(records, key=lambda r: r[1])
+    # Tickets are assigned when entering the queue, admission must follow them (ties possible with max > 1)
+    tickets = [r[0] for r in by_admission]
+    assert max_concurrent > 1 or tickets == sorted(tickets), "FIFO order violated"
+    events = sorted([(r[1], 1) for r in records] + [(r[2], -1) for r in records], key=lambda e: (e[0], e[1]))
+    running = peak = 0
+    for _, change in events:
+        running += change
+        peak = max(peak, running)
+    assert peak <= max_concurrent, f"Concurrency limit exceeded: {peak} > {max_concurrent}"
+
+    latencies = sorted(r[3] * 1000 for r in records if r[3] is not None)
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0
+    return statistics.median(latencies) if latencies else 0.0, p99, waiters / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark local queue dispatch')
+    parser.add_argument('--waiters', type=int, default=200, help='Number of queued processes')
+    parser.add_argument('--max-concurrent', type=int, default=1, help='Slots of the concurrency group')
+    args = parser.parse_args()
+
+    median, p99, throughput = measure(args.waiters, args.max_concurrent)
+    print(f"dispatch latency median {median:.3f} ms, p99 {p99:.3f} ms, {throughput:,.0f} admissions/s")
+
+
+if __name__ == '__main__':
+    main()
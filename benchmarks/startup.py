@@ -0,0 +1,97 @@
+"""
+Startup budget of the `run` subcommands.
+
+Each subcommand is measured in a fresh interpreter: the time to import `runtools.runcli`, parse the arguments and
+load the subcommand module from the `cmd` package, i.e. everything `run` does before the subcommand starts its work.
+The interpreter start itself is not included. A subcommand is over budget when its median time
+exceeds the budget or when it imports any of its forbidden modules.
+
+Usage:
+    python benchmarks/startup.py [--repeat N] [--scale FACTOR]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+
+LIGHT_FORBIDDEN = ('rich', 'rich_argparse', 'runtools.runjob')
+
+
+@dataclass(frozen=True)
+class Budget:
+    argv: tuple
+    max_ms: float
+    forbidden: tuple = ()
+
+
+BUDGETS = {
+    'log': Budget(('log',), 40, LIGHT_FORBIDDEN),
+    'config print': Budget(('config', 'print'), 40, LIGHT_FORBIDDEN),
+    'env': Budget(('env',), 150, LIGHT_FORBIDDEN),
+    'job': Budget(('job', 'true'), 300, ('rich', 'rich_argparse')),
+}
+
+_PROBE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+from runtools.runcli import cli
+args = cli.parse_args(json.loads(sys.argv[1]))
+importlib.import_module('runtools.runcli.cmd.' + args.action.replace('-', '_'))
+elapsed_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({"ms": elapsed_ms, "modules": sorted(sys.modules)}))
+"""
+
+
+def measure(argv, repeat):
+    """
+    Returns:
+        Tuple of the median time in milliseconds and the set of modules loaded by the subcommand
+    """
+    times = []
+    modules = set()
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', _PROBE, json.dumps(list(argv))],
+                             check=True, capture_output=True, text=True).stdout
+        result = json.loads(out)
+        times.append(result['ms'])
+        modules = set(result['modules'])
+    return statistics.median(times), modules
+
+
+def _loaded(modules, forbidden):
+    return sorted(m for m in forbidden if m in modules or any(name.startswith(m + '.') for name in modules))
+
+
+def check(repeat=5, scale=1.0):
+    """
+    Measures all subcommands and prints the results.
+
+    Returns:
+        True if all subcommands are within their budgets
+    """
+    ok = True
+    for name, budget in BUDGETS.items():
+        median_ms, modules = measure(budget.argv, repeat)
+        limit_ms = budget.max_ms * scale
+        violations = _loaded(modules, budget.forbidden)
+        within = median_ms <= limit_ms and not violations
+        ok &= within
+        status = 'OK' if within else 'OVER BUDGET'
+        print(f"{name:<14} {median_ms:8.1f} ms  (budget {limit_ms:.0f} ms)  {status}"
+              + (f"  forbidden imports: {', '.join(violations)}" if violations else ''))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check startup budget of the run subcommands')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of measured runs per subcommand')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiplier of the time budgets, useful on slow machines')
+    args = parser.parse_args()
+    sys.exit(0 if check(args.repeat, args.scale) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark suite of the `run` wrapper hot paths with stored baselines and regression detection.
+
+Measured metrics:
+    startup.*       Cold startup of the subcommands: import, argument parsing and subcommand load (ms)
+    e2e.job_true    Complete `run job true` execution including the interpreter start (ms)
+    output.*        Output throughput of `run job` through `ProgramPhase` with capture, `--output-mode raw` and `--bypass-output`
+    parser.*        Output parsing throughput (lines/s)
+    warn.*          Output warning matching throughput by the number of patterns (lines/s)
+    queue.*         Local queue dispatch latency (ms) and admissions/s with 200 queued processes
+    formatter.*     Log formatters throughput (records/s)
+
+Results are compared to the baseline file (if exists) and the suite fails when any metric is worse than
+the baseline by more than the threshold. Baselines are machine specific, create them with `--save-baseline`.
+
+Usage:
+    python benchmarks/suite.py [--only PREFIX] [--threshold 0.15] [--baseline FILE] [--save-baseline]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+DEFAULT_BASELINE = Path(__file__).with_name('baseline.json')
+DEFAULT_THRESHOLD = 0.15
+
+LOWER_IS_BETTER = 'ms'
+
+_RUN = [sys.executable, '-m', 'runtools.runcli']
+_RUN_JOB_OPTIONS = ['--def-config', '--set', 'log.enabled=false']
+_OUTPUT_LINES = 200_000
+_OUTPUT_PROGRAM = [sys.executable, '-c', f'for i in range({_OUTPUT_LINES}): print("line", i, "x" * 80)']
+
+
+def bench_startup(repeat):
+    import startup
+    return {f"startup.{name.replace(' ', '_')}": (startup.measure(budget.argv, repeat)[0], 'ms')
+            for name, budget in startup.BUDGETS.items()}
+
+
+def _run_job_ms(job_id, program, *options, repeat=1):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(_RUN + ['job', *_RUN_JOB_OPTIONS, '--id', job_id, *options, *program],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return sorted(times)[len(times) // 2]
+
+
+def bench_e2e(repeat):
+    return {'e2e.job_true': (_run_job_ms('bench-true', ['true'], repeat=repeat), 'ms')}
+
+
+def bench_output(repeat):
+    result = {}
+    for name, options in (('capture', ()), ('raw', ('--output-mode', 'raw')), ('bypass', ('--bypass-output',))):
+        elapsed_ms = _run_job_ms(f'bench-output-{name}', _OUTPUT_PROGRAM, *options, repeat=repeat)
+        result[f"output.{name}"] = (_OUTPUT_LINES / (elapsed_ms / 1000), 'lines/s')
+    return result
+
+
+def bench_parser(_):
+    import output_parsing
+    lines = output_parsing.create_lines(100_000, 1000)
+    return {f"parser.{name}": (output_parsing.lines_per_sec(processors, lines), 'lines/s')
+            for name, processors in output_parsing.variants()}
+
+
+def bench_warn(_):
+    import output_warnings
+    lines = output_warnings.create_lines(100_000, 1000)
+    return {f"warn.{name}": (output_warnings.lines_per_sec(matcher, lines), 'lines/s')
+            for name, matcher in output_warnings.variants() if name.startswith('gate')}
+
+
+def bench_queue(_):
+    import queue_dispatch
+    median, _, throughput = queue_dispatch.measure(200)
+    return {'queue.dispatch_latency': (median, 'ms'), 'queue.admissions': (throughput, 'admissions/s')}
+
+
+def bench_formatter(_):
+    import formatters
+    records = formatters.create_records(100_000)
+    return {f"formatter.{name}": (formatters.records_per_sec(formatter, records), 'records/s')
+            for name, formatter in formatters.optimized_formatters()}
+
+
+BENCHMARKS = {
+    'startup': bench_startup,
+    'e2e': bench_e2e,
+    'output': bench_output,
+    'parser': bench_parser,
+    'warn': bench_warn,
+    'queue': bench_queue,
+    'formatter': bench_formatter,
+}
+
+
+def regression(value, unit, baseline_value):
+    """
+    Returns:
+        Relative regression against the baseline (positive = worse), independent of the metric direction
+    """
+    if not baseline_value:
+        return 0.0
+    if unit == LOWER_IS_BETTER:
+        return (value - baseline_value) / baseline_value
+    return (baseline_value - value) / baseline_value
+
+
+def run(only=None, repeat=5):
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if only and not any(name.startswith(p) or p.startswith(name) for p in only):
+            continue
+        for metric, measured in bench(repeat).items():
+            if not only or any(metric.startswith(p) for p in only):
+                results[metric] = measured
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmark suite')
+    parser.add_argument('--only', action='append', metavar='PREFIX', help='Run only metrics with the prefix')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions of the process based measurements')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE, help='Baseline file')
+    parser.add_argument('--threshold', type=float,
+                        default=float(os.environ.get('RUNCLI_BENCH_THRESHOLD', DEFAULT_THRESHOLD)),
+                        help='Allowed relative regression, e.g. 0.15 for 15%% (env: RUNCLI_BENCH_THRESHOLD)')
+    parser.add_argument('--save-baseline', action='store_true', help='Store the results as the new baseline')
+    args = parser.parse_args()
+
+    results = run(args.only, args.repeat)
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+
+    failed = []
+    for metric, (value, unit) in results.items():
+        line = f"{metric:<24} {value:>14,.1f} {unit:<10}"
+        if metric in baseline:
+            change = regression(value, unit, baseline[metric]['value'])
+            status = 'REGRESSION' if change > args.threshold else 'ok'
+            line += f" baseline {baseline[metric]['value']:>14,.1f}  {-change:+.1%}  {status}"
+            if change > args.threshold:
+                failed.append(metric)
+        print(line)
+
+    if args.save_baseline:
+        baseline.update({metric: {"value": value, "unit": unit} for metric, (value, unit) in results.items()})
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        print(f"Baseline saved to {args.baseline}")
+    elif failed:
+        print(f"Regressions over {args.threshold:.0%}: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
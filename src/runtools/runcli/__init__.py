@@ -2,27 +2,32 @@
 This is a command line interface for the `runjob` library.
 """
 import logging
+import sys
+import time
 
-from rich.console import Console
-from rich.text import Text
-
-from runtools.runcore import util, env, paths
-from runtools.runcore.env import lookup, load_env_config, BUILTIN_LOCAL
-from runtools.runcore.err import RuntoolsException
-from runtools.runcore.job import InstanceID, DuplicateStrategy
-from runtools.runcore.paths import ConfigFileNotFoundError
-from runtools.runcore.run import JobCompletionError
-from runtools.runcore.util import update_nested_dict
-from runtools.runcore.util.files import format_toml
-from runtools.runcore.util.parser import KVParser
-from runtools.runjob.output import OutputParser
-from . import __version__, cmd, cli, log, job
-from .cfg import CONFIG_FILE
-from .cli import ACTION_CONFIG, ACTION_ENV, ACTION_LOG
+from . import __version__, cmd, cli
 
 logger = logging.getLogger(__name__)
 
-console = Console(stderr=True)
+# Functions moved into the subcommand modules, re-exported lazily (see `__getattr__`) for existing callers
+_MOVED = {
+    'run_job': ('.cmd.job', 'run'),
+    'run_config': ('.cmd.config', 'run'),
+    'run_env': ('.cmd.env', 'run'),
+    'run_log': ('.cmd.log', 'run'),
+    '_build_output_processors': ('.cmd.job', '_build_output_processors'),
+    '_resolve_duplicate_strategy': ('.cmd.job', '_resolve_duplicate_strategy'),
+}
+
+
+def __getattr__(name):
+    """Import the moved functions on first access only, so the startup of other subcommands does not pay for them."""
+    if name not in _MOVED:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+
+    module, attr = _MOVED[name]
+    return getattr(importlib.import_module(module, __name__), attr)
 
 
 def main_cli():
@@ -32,150 +37,78 @@ def main_cli():
 def main(args):
     """Taro CLI app main function.
 
-    Note: Configuration is set up before execution of all commands although not all commands require it.
-          This practice increases safety (in regards with future extensions) and consistency.
-          Performance impact is expected to be negligible.
+    Note: Only the modules required by the executed subcommand are imported. Each subcommand is implemented by
+          a module in the `cmd` package which is loaded on dispatch. Configuration and logging are set up by
+          the subcommands which need them.
 
     :param args: CLI arguments
     """
     try:
         run_app(args)
-    except JobCompletionError as e:
-        logger.warning("Run unsuccessful", extra={"instance": str(e.instance_id), "termination": str(e.termination)})
-        exit(1)
-    except RuntoolsException as e:
-        logger.error("Run job command failed", extra={"reason": str(e)})
-        console.print(Text().append("User error: ", style="bold red").append(str(e)))
-        exit(1)
-    except Exception:
-        logger.exception("run_job_command_error")
-        raise
     except KeyboardInterrupt:
         exit(130)
+    except Exception as e:
+        from runtools.runcore.err import RuntoolsException
+        from runtools.runcore.run import JobCompletionError
+
+        if isinstance(e, JobCompletionError):
+            logger.warning("Run unsuccessful", extra={"instance": str(e.instance_id), "termination": str(e.termination)})
+            exit(1)
+        if isinstance(e, RuntoolsException):
+            from rich.console import Console
+            from rich.text import Text
+
+            logger.error("Run job command failed", extra={"reason": str(e)})
+            Console(stderr=True).print(Text().append("User error: ", style="bold red").append(str(e)))
+            exit(1)
+        logger.exception("run_job_command_error")
+        raise
 
 
 def run_app(args):
+    parse_start = time.perf_counter_ns()
     args_parsed = cli.parse_args(args)
+    if getattr(args_parsed, 'profile', False) or getattr(args_parsed, 'profile_file', None):
+        from . import tracing
 
-    if args_parsed.action == ACTION_CONFIG:
-        run_config(args_parsed)
-    elif args_parsed.action == ACTION_ENV:
-        run_env(args_parsed)
-    elif args_parsed.action == ACTION_LOG:
-        run_log()
-    else:
-        run_job(args_parsed)
-
-
-def run_config(args):
-    if args.config_action == cli.ACTION_CONFIG_PRINT:
-        if getattr(args, 'def_config', False):
-            cfg.print_default_config_file()
-        else:
-            cfg.print_found_config_file()
-    elif args.config_action == cli.ACTION_CONFIG_CREATE:
-        print("Created " + str(cfg.create_config_file(getattr(args, 'path'), overwrite=args.overwrite)))
-
-
-def run_env(args):
-    all_envs = getattr(args, 'all_envs', False)
-    if all_envs:
-        registry = env.load_registry()
-        env_configs = [load_env_config(entry) for entry in registry.values()]
-    else:
-        entry = lookup(getattr(args, 'env', None) or BUILTIN_LOCAL)
-        env_configs = [load_env_config(entry)]
-    for i, env_config in enumerate(env_configs):
-        if all_envs:
-            if i > 0:
-                print()
-            print(f"# Environment: {env_config.id}")
-        print(format_toml(env_config.model_dump(mode='json')))
-        if all_envs:
-            print(f"{'─' * 30}")
-
-
-def run_log():
-    config, _ = cfg.read_default_configuration()
-    try:
-        config, _ = cfg.read_configuration()
-    except ConfigFileNotFoundError:
-        pass
-    log_file_path = config.get('log', {}).get('file', {}).get('path')
-    print(paths.expand_user(log_file_path) or (paths.log_dir() / log.LOG_FILENAME))
-
-
-def _resolve_duplicate_strategy(args):
-    if getattr(args, 'allow_duplicate', False):
-        return DuplicateStrategy.ALLOW
-    if getattr(args, 'suppress_duplicate', False):
-        return DuplicateStrategy.SUPPRESS
-    return DuplicateStrategy.DISALLOW
-
-
-def run_job(args):
-    job_id = args.id or " ".join([args.command.removeprefix('./')] + args.arg)
-    run_id = getattr(args, 'run_id')
-    config = load_config_and_log_setup(InstanceID(job_id, run_id), args)
-    program_args = [args.command] + args.arg
-    checkpoint_id = getattr(args, 'checkpoint')
-
-    output_processors = _build_output_processors(args)
-
-    job.run(
-        job_id, run_id, getattr(args, 'env', None), program_args,
-        bypass_output=args.bypass_output,
-        disable_output=tuple(args.disable_output),
-        excl=args.excl_run,
-        excl_group=getattr(args, 'excl_group'),
-        checkpoint_id=checkpoint_id,
-        serial=args.serial,
-        max_concurrent=args.max_concurrent,
-        concurrency_group=getattr(args, 'concurrency_group', None),
-        timeout=getattr(args, 'timeout', 0.0),
-        timeout_signal=getattr(args, 'timeout_sig'),
-        time_warning=getattr(args, 'time_warn'),
-        output_warning=args.output_warn,
-        output_processors=output_processors,
-        tail_buffer_size=args.tail_buffer_size,
-        duplicate_strategy=_resolve_duplicate_strategy(args),
-    )
+        tracing.start(parse_start).complete('parse_args', parse_start, time.perf_counter_ns())
+    if getattr(args_parsed, 'daemon', False):
+        from . import daemon
 
+        exit_code = daemon.submit(sys.argv[1:] if args is None else args, args_parsed.env)
+        if exit_code is not None:
+            exit(exit_code)
+    cmd.run(args_parsed)
 
-def _build_output_processors(args):
-    """Build output processors with smart parsing. Parsing is on by default, use --no-parse to disable."""
-    if getattr(args, 'no_parse', False):
-        return ()
 
-    aliases = {}
-    for alias_str in getattr(args, 'kv_alias', []):
-        if '=' in alias_str:
-            from_key, to_key = alias_str.split('=', 1)
-            aliases[from_key.strip()] = to_key.strip()
+def load_config_and_log_setup(instance_id, args, *, sync_logging=False):
+    from runtools.runcore import util
+    from runtools.runcore.paths import ConfigFileNotFoundError
+    from runtools.runcore.util import update_nested_dict
+    from . import cfg, tracing
 
-    kv_parser = KVParser(aliases=aliases if aliases else None)
-    return (OutputParser(kv_parser=kv_parser),)
-
-
-def load_config_and_log_setup(instance_id, args):
-    cfg_found = True
-    if getattr(args, 'def_config', False):
-        config, cfg_path = cfg.read_default_configuration()
-    else:
-        if explicit_cfg := getattr(args, 'config', None):
-            config, cfg_path = cfg.read_configuration(explicit_cfg)
+    with tracing.span('config_load'):
+        cfg_found = True
+        if getattr(args, 'def_config', False):
+            config, cfg_path = cfg.read_default_configuration()
         else:
-            try:
-                config, cfg_path = cfg.read_configuration()
-            except ConfigFileNotFoundError as e:
-                if getattr(args, 'config_required', False):
-                    raise e
-                else:
-                    cfg_found = False
-                    config, cfg_path = cfg.read_default_configuration()
-
-    update_nested_dict(config, util.split_params(args.set))  # Override config by `set` args
-    configure_logging(config)
+            if explicit_cfg := getattr(args, 'config', None):
+                config, cfg_path = cfg.read_configuration(explicit_cfg)
+            else:
+                try:
+                    config, cfg_path = cfg.read_configuration()
+                except ConfigFileNotFoundError as e:
+                    if getattr(args, 'config_required', False):
+                        raise e
+                    else:
+                        cfg_found = False
+                        config, cfg_path = cfg.read_default_configuration()
+
+        update_nested_dict(config, util.split_params(args.set))  # Override config by `set` args
+        cfg.cache_env_configs()  # Loaded by the environment node of the subcommands
+
+    with tracing.span('logging_setup'):
+        configure_logging(config, sync=sync_logging)
 
     if cfg_found:
         logger.debug("Configuration loaded", extra={"instance": str(instance_id), "source": str(cfg_path)})
@@ -185,13 +118,29 @@ def load_config_and_log_setup(instance_id, args):
     return config
 
 
-def configure_logging(config):
+def configure_logging(config, *, sync=False):
+    """With `sync`, the file logging is never async (e.g. for processes forking workers, see `daemon`)."""
+    from . import log
+
     log_config = config.get('log', {})
+    file_config = log_config.get('file', {})
+    rate_limit_config = log_config.get('rate_limit', {})
+    log.log_timing = log_config.get('timing', False)
     log.configure(
         log_config.get('enabled', True),
         log_config.get('stdout', {}).get('level', log.DEF_LEVEL_STDOUT),
-        log_config.get('file', {}).get('level', log.DEF_LEVEL_FILE),
-        log_config.get('file', {}).get('path', None),
+        file_config.get('level', log.DEF_LEVEL_FILE),
+        file_config.get('path', None),
+        log_file_async=file_config.get('async', False) and not sync,
+        log_file_queue_size=file_config.get('queue_size', log.DEF_QUEUE_SIZE),
+        log_file_overflow=file_config.get('overflow', log.Overflow.BLOCK.value),
+        log_file_json=file_config.get('json', log.JSON_STDLIB),
+        log_file_max_size=file_config.get('max_size', log.DEF_MAX_BYTES),
+        log_file_backup_count=file_config.get('backup_count', log.DEF_BACKUP_COUNT),
+        log_file_compress=file_config.get('compress', False),
+        rate_limit_burst=rate_limit_config.get('burst'),
+        rate_limit_window=rate_limit_config.get('window', log.DEF_RATE_LIMIT_WINDOW),
+        rate_limit_keys=rate_limit_config.get('keys', log.DEF_RATE_LIMIT_KEYS),
     )
 
 
@@ -0,0 +1,159 @@
+"""
+Load-aware admission of jobs (`--max-load`, `--min-free-mem`, `--max-iowait`).
+
+A job with admission conditions waits before its instance is run until the host conditions allow it to start.
+The conditions are re-checked by sampling `/proc` (a few small reads), starting with a short interval which doubles
+up to `MAX_CHECK_INTERVAL` while the host stays overloaded. Without `/proc` (non-Linux) only the load is checked.
+"""
+import logging
+import os
+import time
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+MIN_CHECK_INTERVAL = 0.5
+MAX_CHECK_INTERVAL = 5.0
+INTERRUPT_CHECK_INTERVAL = 0.1
+IOWAIT_SAMPLE_TIME = 0.2
+
+_MEMINFO = '/proc/meminfo'
+_STAT = '/proc/stat'
+
+
+@dataclass
+class AdmissionConditions:
+    """
+    Attributes:
+        max_load: maximum 1-minute load average
+        min_free_mem: minimum available memory in bytes (`MemAvailable` of `/proc/meminfo`)
+        max_iowait: maximum percentage of CPU time spent waiting for I/O since the previous check
+    """
+    max_load: float = None
+    min_free_mem: int = None
+    max_iowait: float = None
+
+    def __bool__(self):
+        return any(c is not None for c in (self.max_load, self.min_free_mem, self.max_iowait))
+
+
+class HostMonitor:
+
+    def __init__(self, conditions):
+        self.conditions = conditions
+        self._cpu_times = None
+
+    def check(self):
+        """
+        Returns:
+            None if the conditions are met, the description of the first unmet condition otherwise
+        """
+        c = self.conditions
+        if c.max_load is not None:
+            load = os.getloadavg()[0]
+            if load > c.max_load:
+                return f"load {load:.2f} > {c.max_load:g}"
+        if c.min_free_mem is not None:
+            available = available_memory()
+            if available is not None and available < c.min_free_mem:
+                return f"available memory {available} B < {c.min_free_mem} B"
+        if c.max_iowait is not None:
+            iowait = self.iowait()
+            if iowait is not None and iowait > c.max_iowait:
+                return f"iowait {iowait:.1f}% > {c.max_iowait:g}%"
+        return None
+
+    def iowait(self):
+        """Percentage of CPU time spent in iowait since the previous call (a short sample on the first call)."""
+        previous = self._cpu_times or _cpu_times()
+        if not self._cpu_times:
+            time.sleep(IOWAIT_SAMPLE_TIME)
+        self._cpu_times = current = _cpu_times()
+        if not previous or not current:
+            return None
+        total = sum(current) - sum(previous)
+        if total <= 0:
+            return 0.0
+        return (current[4] - previous[4]) * 100 / total  # Fields: user nice system idle iowait ...
+
+
+def available_memory():
+    try:
+        with open(_MEMINFO) as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _cpu_times():
+    try:
+        with open(_STAT) as f:
+            return [int(v) for v in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+
+
+class AdmissionWaiter:
+
+    def __init__(self, conditions, job_id=None):
+        self.monitor = HostMonitor(conditions)
+        self.job_id = job_id
+        self.wait_time = 0.0
+        self._interrupted = False  # Plain flag, set by signal handlers (no locks taken there)
+
+    def wait(self, timeout=None):
+        """
+        Wait until the host conditions are met.
+
+        Args:
+            timeout: maximum waiting time in seconds
+
+        Returns:
+            True when admitted, False when the waiting was interrupted or timed out
+        """
+        start = time.monotonic()
+        interval = MIN_CHECK_INTERVAL
+        reason = self.monitor.check()
+        if reason:
+            logger.info("Waiting for host conditions", extra={"job": self.job_id, "reason": reason})
+        while reason:
+            remaining = None if timeout is None else timeout - (time.monotonic() - start)
+            if remaining is not None and remaining <= 0:
+                break
+            if self._sleep(interval if remaining is None else min(interval, remaining)):
+                break
+            interval = min(interval * 2, MAX_CHECK_INTERVAL)
+            reason = self.monitor.check()
+            logger.debug("Host conditions checked", extra={"job": self.job_id, "reason": reason})
+
+        self.wait_time = time.monotonic() - start
+        if reason:
+            logger.info("Host admission not granted", extra={
+                "job": self.job_id, "reason": reason, "wait_time": self.wait_time,
+                "interrupted": self.interrupted})
+            return False
+        logger.debug("Host admission granted", extra={"job": self.job_id, "wait_time": self.wait_time})
+        return True
+
+    @property
+    def interrupted(self):
+        return self._interrupted
+
+    def interrupt(self):
+        """Stop waiting (can be called from a signal handler or another thread)."""
+        self._interrupted = True
+
+    def _sleep(self, seconds):
+        """
+        Sleep checking the interrupt flag every `INTERRUPT_CHECK_INTERVAL`.
+
+        Returns:
+            True when interrupted
+        """
+        end = time.monotonic() + seconds
+        while not self._interrupted and (remaining := end - time.monotonic()) > 0:
+            time.sleep(min(remaining, INTERRUPT_CHECK_INTERVAL))
+        return self._interrupted
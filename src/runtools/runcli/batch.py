@@ -0,0 +1,372 @@
+"""
+Execution of a batch of jobs defined in a manifest, all in a single process under one environment node connection.
+
+The manifest is either a TOML file with a `jobs` array of tables, or a JSONL file (also used for `-` standard
+input) with one job object per line. Each job supports the same settings as the `run job` command:
+
+    [[jobs]]
+    id = "export-users"                     # Job ID, default: derived from the args
+    args = ["./export.sh", "users"]         # Program and its arguments (required)
+    run_id = "2025-04-25"
+    duplicate = "allow"                     # disallow (default) | allow | suppress
+    bypass_output = false
+    parse = true                            # Output parsing (JSON, log patterns, key-value)
+    parse_prefilter = ["kv"]                # Parse only lines which can contain these formats (kv, json, log)
+    parse_marker = "STATUS:"                # Parse only lines starting with the marker
+    status_interval = "1s"                  # At most one status update per interval
+    kv_alias = { progress = "completed" }
+    output_warn = ["ERR.*"]
+    output_warn_literal = ["Traceback"]
+    timeout = "10m"                         # Durations are seconds or strings with unit (s, m, h, d)
+    time_warn = "5m"
+    checkpoint = "approval"
+    excl = false
+    excl_group = "exports"
+    serial = false
+    max_concurrent = 2
+    concurrency_group = "exports"
+    local_dispatch = false                  # Event-driven local queue for serial/max_concurrent jobs
+    priority = 0                            # Order in the local queue (higher first)
+    priority_aging = "10m"                  # Raise the priority by one level per interval of waiting
+    max_load = 8.0                          # Wait until the host conditions allow the job to start
+    min_free_mem = "2GB"
+    max_iowait = 20.0
+    cache_key = "v1"                        # Skip the job when it already succeeded with the same fingerprint
+    inputs = ["data/*.csv"]                 # Input files included in the fingerprint
+    cache_env = ["DB_HOST"]
+    cache_ttl = "1d"
+    shards = 4                              # Parallel processes of the program ({shard}, RUN_SHARD...)
+
+At most `workers` jobs are run at a time, jobs waiting for admission or in the local queue do not occupy a worker
+(waiting in the queue phase of the instance does, it is a part of the run). Coordination settings (`serial`,
+`max_concurrent`, `excl_group`...) work the same way as for separate `run job` processes.
+"""
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+
+from runtools.runcore.err import RuntoolsException
+from runtools.runcore.job import DuplicateStrategy
+from runtools.runcore.run import StopReason, JobCompletionError
+from runtools.runcore.util.dt import parse_duration_to_sec
+from runtools.runcore.util.files import read_toml_file
+from runtools.runcore.util.text import parse_size_to_bytes
+from runtools.runjob import node
+
+from runtools.runcli.admission import AdmissionConditions
+from runtools.runcli.memo import Memo
+from runtools.runcli.job import create_root_phase, create_output_processors, create_local_dispatcher, \
+    create_output_warning_detector, output_warning_sink, status_coalescer, status_sink, queued_status, \
+    run_cached, wait_for_admission, wait_in_local_queue, arm_timeout, remaining_time
+from runtools.runcli.output import PARSE_FORMATS
+
+logger = logging.getLogger(__name__)
+
+STDIN = '-'
+
+
+@dataclass
+class BatchJob:
+    args: list
+    id: str = None
+    run_id: str = None
+    duplicate: DuplicateStrategy = DuplicateStrategy.DISALLOW
+    bypass_output: bool = False
+    parse: bool = True
+    parse_prefilter: list = None
+    parse_marker: str = None
+    status_interval: float = None
+    kv_alias: dict = field(default_factory=dict)
+    output_warn: list = field(default_factory=list)
+    output_warn_literal: list = field(default_factory=list)
+    timeout: float = 0.0
+    time_warn: float = None
+    checkpoint: str = None
+    excl: bool = False
+    excl_group: str = None
+    serial: bool = False
+    max_concurrent: int = 0
+    concurrency_group: str = None
+    local_dispatch: bool = False
+    priority: int = 0
+    priority_aging: float = None
+    max_load: float = None
+    min_free_mem: int = None
+    max_iowait: float = None
+    cache_key: str = None
+    inputs: list = field(default_factory=list)
+    cache_env: list = field(default_factory=list)
+    cache_ttl: float = None
+    shards: int = 0
+
+    def __post_init__(self):
+        if not self.args or not isinstance(self.args, list):
+            raise InvalidManifestError("Job `args` must be a non-empty list")
+        self.args = [str(arg) for arg in self.args]
+        self.id = self.id or " ".join([self.args[0].removeprefix('./')] + self.args[1:])
+        if isinstance(self.duplicate, str):
+            try:
+                self.duplicate = DuplicateStrategy[self.duplicate.upper()]
+            except KeyError:
+                raise InvalidManifestError(f"Job `{self.id}`: invalid duplicate strategy `{self.duplicate}`")
+        self.timeout = _duration(self.id, 'timeout', self.timeout) or 0.0
+        self.time_warn = _duration(self.id, 'time_warn', self.time_warn)
+        self.status_interval = _duration(self.id, 'status_interval', self.status_interval)
+        self.priority_aging = _duration(self.id, 'priority_aging', self.priority_aging)
+        self.cache_ttl = _duration(self.id, 'cache_ttl', self.cache_ttl)
+        if isinstance(self.min_free_mem, str):
+            try:
+                self.min_free_mem = parse_size_to_bytes(self.min_free_mem)
+            except ValueError as e:
+                raise InvalidManifestError(f"Job `{self.id}`: invalid `min_free_mem` value: {e}")
+        if self.parse_prefilter and set(self.parse_prefilter) - set(PARSE_FORMATS):
+            raise InvalidManifestError(f"Job `{self.id}`: invalid parse prefilter formats {self.parse_prefilter}")
+        _check_int(self.id, 'shards', self.shards, minimum=0)
+        _check_int(self.id, 'max_concurrent', self.max_concurrent, minimum=0)
+        _check_int(self.id, 'priority', self.priority)
+        if self.serial and self.max_concurrent:
+            raise InvalidManifestError(f"Job `{self.id}`: either `serial` or `max_concurrent` can be set")
+
+    @classmethod
+    def from_dict(cls, job_def):
+        if not isinstance(job_def, dict):
+            raise InvalidManifestError(f"Job definition must be a table/object: {job_def!r}")
+        unknown = job_def.keys() - {f.name for f in fields(cls)}
+        if unknown:
+            raise InvalidManifestError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+        return cls(**job_def)
+
+
+def _check_int(job_id, name, value, *, minimum=None):
+    # `bool` is a subclass of `int`, but `true` must not be accepted as 1
+    if not isinstance(value, int) or isinstance(value, bool) or (minimum is not None and value < minimum):
+        bound = f" >= {minimum}" if minimum is not None else ''
+        raise InvalidManifestError(f"Job `{job_id}`: `{name}` must be an integer{bound}, found {value!r}")
+
+
+def _duration(job_id, name, value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    try:
+        return parse_duration_to_sec(value)
+    except ValueError as e:
+        raise InvalidManifestError(f"Job `{job_id}`: invalid `{name}` value: {e}")
+
+
+def load_manifest(path):
+    """
+    Load jobs from a TOML or JSONL manifest. A path ending with `.toml` is read as TOML, anything else
+    (including `-` for standard input) as JSONL.
+
+    Returns:
+        List of `BatchJob` instances in the manifest order
+
+    Raises:
+        InvalidManifestError: when the manifest cannot be read or contains an invalid job definition
+    """
+    try:
+        if path == STDIN:
+            job_defs = _parse_jsonl(sys.stdin)
+        elif Path(path).suffix == '.toml':
+            job_defs = read_toml_file(Path(path)).get('jobs', [])
+        else:
+            with open(path) as f:
+                job_defs = _parse_jsonl(f)
+    except (OSError, ValueError) as e:
+        raise InvalidManifestError(f"Cannot read manifest `{path}`: {e}")
+
+    return [BatchJob.from_dict(job_def) for job_def in job_defs]
+
+
+def _parse_jsonl(lines):
+    return [json.loads(line) for line in lines if line.strip() and not line.lstrip().startswith('#')]
+
+
+@dataclass
+class BatchResult:
+    job: BatchJob
+    success: bool
+    detail: str
+    elapsed: float
+
+
+class Batch:
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self._instances = []
+        self._interrupts = _Interrupts()  # Interruptible waiting before the instance run (admission, local queue)
+        self._workers = 0
+        self._running = 0
+        self._stopped = False
+        self._lock = threading.Condition()
+
+    def run(self, env_id, *, workers=None, disable_output=(), tail_buffer_size=None):
+        """
+        Run all jobs of the batch, at most `workers` of them at a time (default: number of CPUs + 4, at most 32).
+        Jobs waiting before the run (admission, local queue) do not occupy a worker. On `KeyboardInterrupt`
+        the running instances are stopped and the jobs not started yet are cancelled.
+
+        Returns:
+            List of `BatchResult` instances in the order of the jobs
+        """
+        self._workers = workers or min(32, (os.cpu_count() or 1) + 4)
+        waiting = sum(1 for job in self.jobs if _waits_before_run(job))
+        with node.connect(env_id, disable_output=disable_output, tail_buffer_size=tail_buffer_size) as env_node:
+            signal.signal(signal.SIGTERM, self.terminate)
+            executor = ThreadPoolExecutor(max_workers=self._workers + waiting, thread_name_prefix='batch')
+            try:
+                futures = [executor.submit(self._run_job, env_id, env_node, job) for job in self.jobs]
+                return [f.result() for f in futures]
+            except KeyboardInterrupt:
+                self.terminate()
+                raise
+            finally:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+    def _run_job(self, env_id, env_node, job):
+        if self._stopped:
+            return BatchResult(job, False, 'NOT_STARTED', 0.0)
+
+        start = time.monotonic()
+        try:
+            memo = Memo.create(job.id, job.args, cache_key=job.cache_key, inputs=job.inputs, env_vars=job.cache_env,
+                               ttl=job.cache_ttl)
+            if memo and (cached := memo.cached_result()):
+                run_cached(env_node, job.id, job.run_id, cached, job.duplicate)
+                return BatchResult(job, True, 'CACHED', time.monotonic() - start)
+            local_queue = _local_queue(job)
+            waits_before_run = _waits_before_run(job)  # The timeout is then armed by the wrapper
+            root_phase = create_root_phase(
+                job.id, job.args, job.bypass_output, job.excl, job.excl_group, job.checkpoint, job.serial,
+                job.max_concurrent, job.concurrency_group, 0.0 if waits_before_run else job.timeout, job.time_warn,
+                shards=job.shards, local_queue=local_queue)
+            output_processors = create_output_processors(
+                job.parse, job.kv_alias, parse_prefilter=job.parse_prefilter, parse_marker=job.parse_marker,
+                status_interval=job.status_interval)
+            if warning_detector := create_output_warning_detector(job.output_warn, job.output_warn_literal):
+                output_processors += (warning_detector,)
+            with ExitStack() as stack:
+                inst = env_node.create_instance(
+                    job.id, job.run_id, root_phase, output_processors=output_processors,
+                    duplicate_strategy=job.duplicate)
+                if coalescer := status_coalescer(output_processors):
+                    stack.callback(coalescer.close)  # Pending status fields emitted at the end of the instance
+                    coalescer.sink = status_sink(inst)
+                if warning_detector:
+                    warning_detector.on_warning = output_warning_sink(inst)
+                with self._lock:
+                    self._instances.append(inst)
+                    if self._stopped:
+                        inst.stop(StopReason.SIGNAL)
+                deadline = arm_timeout(stack, inst, job.timeout) if job.timeout and waits_before_run else None
+                admission = AdmissionConditions(job.max_load, job.min_free_mem, job.max_iowait)
+                if admission and not wait_for_admission(
+                        inst, self._interrupts, admission, job.id, remaining_time(deadline)):
+                    return BatchResult(job, False, 'NOT_STARTED', time.monotonic() - start)
+                if local_queue:
+                    dispatcher = create_local_dispatcher(
+                        job.id, job.max_concurrent, job.concurrency_group, job.priority, job.priority_aging,
+                        env_id=env_id, on_waiting=queued_status(inst, job.concurrency_group or job.id))
+                    if not wait_in_local_queue(
+                            stack, inst, self._interrupts, dispatcher, job.id, remaining_time(deadline)):
+                        return BatchResult(job, False, 'NOT_STARTED', time.monotonic() - start)
+                if not self._acquire_worker():
+                    return BatchResult(job, False, 'NOT_STARTED', time.monotonic() - start)
+                try:
+                    inst.run()
+                finally:
+                    self._release_worker()
+            if memo:
+                memo.store(inst.run_id)
+        except JobCompletionError as e:
+            return BatchResult(job, False, str(e.termination), time.monotonic() - start)
+        except Exception as e:
+            logger.exception("Batch job failed", extra={"job": job.id})
+            return BatchResult(job, False, f"ERROR: {e}", time.monotonic() - start)
+
+        return BatchResult(job, True, 'COMPLETED', time.monotonic() - start)
+
+    def _acquire_worker(self):
+        """
+        Returns:
+            True when the job can be run, False when the batch was stopped while waiting for a free worker
+        """
+        with self._lock:
+            while self._running >= self._workers and not self._stopped:
+                self._lock.wait()
+            if self._stopped:
+                return False
+            self._running += 1
+            return True
+
+    def _release_worker(self):
+        with self._lock:
+            self._running -= 1
+            self._lock.notify()
+
+    def terminate(self, _=None, __=None):
+        with self._lock:
+            self._stopped = True
+            instances = list(self._instances)
+            self._lock.notify_all()
+        self._interrupts.interrupt_all()
+        for inst in instances:
+            inst.stop(StopReason.SIGNAL)  # Log records are flushed on exit, not in the signal handler
+
+
+def _local_queue(job):
+    return job.local_dispatch and (job.serial or job.max_concurrent)
+
+
+def _waits_before_run(job):
+    return bool(_local_queue(job) or AdmissionConditions(job.max_load, job.min_free_mem, job.max_iowait))
+
+
+class _Interrupts:
+    """
+    Interrupts of the waiting jobs of a batch, used as `interrupts` of the waiting functions of `job`.
+    An interrupt appended after the batch was stopped is called immediately.
+    """
+
+    def __init__(self):
+        self._interrupts = []
+        self._interrupted = False
+        self._lock = threading.Lock()
+
+    def append(self, interrupt):
+        with self._lock:
+            self._interrupts.append(interrupt)
+            interrupted = self._interrupted
+        if interrupted:
+            interrupt()
+
+    def interrupt_all(self):
+        with self._lock:
+            self._interrupted = True
+            interrupts = list(self._interrupts)
+        for interrupt in interrupts:
+            interrupt()
+
+
+def print_report(results, elapsed):
+    labels = [r.job.id + (f" ({r.job.run_id})" if r.job.run_id else '') for r in results]
+    width = max(map(len, labels), default=0)
+    for label, r in zip(labels, results):
+        print(f"{label:<{width}}  {'OK  ' if r.success else 'FAIL'}  {r.elapsed:8.2f}s  {r.detail}")
+
+    failed = sum(1 for r in results if not r.success)
+    throughput = len(results) / elapsed if elapsed else 0.0
+    print(f"{len(results)} jobs in {elapsed:.2f}s ({throughput:.2f} jobs/s), {failed} failed")
+
+
+class InvalidManifestError(RuntoolsException):
+    pass
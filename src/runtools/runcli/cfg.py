@@ -1,7 +1,17 @@
 """
 Config util
 For more information read: https://github.com/tarotools/taro-core/blob/master/docs/CONFIG.md
+
+Parsed configuration files are stored in a compiled (marshalled) cache in the cache directory of the user
+(`$XDG_CACHE_HOME/runtools`, default `~/.cache/runtools`). A cached configuration is used only while the path,
+modification time and size of its source file match the cached ones, so loading an unchanged configuration costs
+a `stat` call instead of TOML parsing.
+
+Cached are the runcli configuration files (the default and the found/explicit `runcli.toml`) and, after
+`cache_env_configs()` is called, the TOML files read by `runcore.env` (the environment registry and configurations).
 """
+import marshal
+import os
 from pathlib import Path
 
 from runtools.runcli import config
@@ -10,6 +20,9 @@ from runtools.runcore.paths import expand_user, ConfigFileNotFoundError
 from runtools.runcore.util.files import print_file, copy_config_to_path, copy_config_to_search_path, read_toml_file
 
 CONFIG_FILE = 'runcli.toml'
+CACHE_DIR_NAME = 'runtools'
+CACHE_FILE = 'runcli-config.cache'
+CACHE_VERSION = 1
 
 
 def print_default_config_file():
@@ -33,7 +46,7 @@ def create_config_file(path=None, *, overwrite=False):
 
 def read_default_configuration():
     path = _packed_config_path()
-    return read_toml_file(path), path
+    return _read_toml_cached(path), path
 
 
 def read_configuration(explicit_path=None):
@@ -43,6 +56,110 @@ def read_configuration(explicit_path=None):
         path = paths.lookup_file_in_config_path(CONFIG_FILE)
 
     try:
-        return read_toml_file(path), path
+        return _read_toml_cached(path), path
     except FileNotFoundError:
         raise ConfigFileNotFoundError(explicit_path or path)
+
+
+def cache_env_configs():
+    """
+    Read the environment registry and configurations through the compiled cache. `runcore.env` reads them with
+    `read_toml_file` imported into its module, the cached reader is installed in its place.
+    """
+    from runtools.runcore import env
+    if hasattr(env, 'read_toml_file'):
+        env.read_toml_file = _read_toml_cached
+
+
+def cache_dir():
+    """
+    Returns:
+        `$XDG_CACHE_HOME/runtools`, or `~/.cache/runtools` when `XDG_CACHE_HOME` is not set
+    """
+    xdg_cache_home = os.environ.get('XDG_CACHE_HOME')
+    return (Path(xdg_cache_home) if xdg_cache_home else Path.home() / '.cache') / CACHE_DIR_NAME
+
+
+def cache_path():
+    return cache_dir() / CACHE_FILE
+
+
+_cache = None
+
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        try:
+            version, entries = marshal.loads(cache_path().read_bytes())
+            _cache = entries if version == CACHE_VERSION else {}
+        except (OSError, ValueError, EOFError, TypeError):
+            _cache = {}
+    return _cache
+
+
+def _file_key(stat):
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_toml_cached(path):
+    """
+    Read the TOML file using the compiled cache. A fresh copy of the content is returned on each call.
+
+    Raises:
+        FileNotFoundError: if the file does not exist
+    """
+    path = Path(path)
+    key = _file_key(path.stat())
+    cache = _load_cache()
+    entry = cache.get(str(path))
+    if entry and entry[0] == key:
+        return marshal.loads(entry[1])
+
+    content = read_toml_file(path)
+    try:
+        cache[str(path)] = (key, marshal.dumps(content))
+    except ValueError:  # Unmarshallable values (e.g. TOML dates) are not cached
+        return content
+    _write_cache(cache)
+    return content
+
+
+def _write_cache(entries):
+    path = cache_path()
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path.write_bytes(marshal.dumps((CACHE_VERSION, entries)))
+        os.replace(tmp_path, path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+
+
+def cache_status():
+    """
+    Returns:
+        List of (source path, state) tuples for all cached files, where state is `valid`, `stale` or `missing`
+    """
+    result = []
+    for source, (key, _) in _load_cache().items():
+        try:
+            state = 'valid' if _file_key(os.stat(source)) == key else 'stale'
+        except FileNotFoundError:
+            state = 'missing'
+        result.append((source, state))
+    return result
+
+
+def clear_cache():
+    """
+    Returns:
+        True if the cache file existed and was removed
+    """
+    global _cache
+    _cache = None
+    try:
+        cache_path().unlink()
+        return True
+    except FileNotFoundError:
+        return False
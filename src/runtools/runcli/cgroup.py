@@ -0,0 +1,262 @@
+"""
+cgroup v2 resource limits of the executed program (`--cpu-max`, `--memory-max`, `--io-weight`, `--pids-max`).
+
+The program is executed in a dedicated leaf cgroup `runtools/<job>@<run>.<pid>` created under a delegated subtree.
+The subtree root is the `cgroup.root` config value if set, otherwise the first usable of:
+    - the systemd user service (`user@UID.service`) containing the cgroup of this process (delegated by systemd)
+    - the parent of the cgroup of this process
+    - the root of the cgroup v2 hierarchy (requires root privileges)
+The program phase executes the program through the launcher (`launch`) which moves itself into the leaf
+before executing the program, so all processes of the program are limited from the start.
+
+When cgroup v2, the required controllers or the permissions are not available, the job runs without limits
+and a warning is logged. After the run the limit events (OOM kills, CPU throttling, hits of the memory and
+pids limits) are read from the leaf, and the leaf is removed (remaining processes are killed).
+"""
+import errno
+import logging
+import os
+import re
+import signal
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from runtools.runcore.err import RuntoolsException
+
+logger = logging.getLogger(__name__)
+
+BASE_NAME = 'runtools'
+CPU_PERIOD_US = 100_000
+REMOVE_TIMEOUT = 2.0
+
+_MOUNTINFO = '/proc/self/mountinfo'
+_PROC_CGROUP = '/proc/self/cgroup'
+_DEF_MOUNT = Path('/sys/fs/cgroup')
+
+
+@dataclass
+class CgroupLimits:
+    """
+    Attributes:
+        cpu_max: CPU bandwidth limit in number of CPUs (e.g. 1.5)
+        memory_max: memory limit in bytes, the program is OOM killed when exceeded
+        io_weight: proportional I/O weight (1-10000, default of the system is 100)
+        pids_max: maximum number of processes and threads
+    """
+    cpu_max: float = None
+    memory_max: int = None
+    io_weight: int = None
+    pids_max: int = None
+
+    def __bool__(self):
+        return any(v is not None for v in (self.cpu_max, self.memory_max, self.io_weight, self.pids_max))
+
+    def controllers(self):
+        used = {'cpu': self.cpu_max, 'memory': self.memory_max, 'io': self.io_weight, 'pids': self.pids_max}
+        return [c for c, v in used.items() if v is not None]
+
+    def settings(self):
+        """
+        Returns:
+            Dictionary of cgroup interface files and the values to be written into them
+        """
+        settings = {}
+        if self.cpu_max is not None:
+            settings['cpu.max'] = f"{max(1000, round(self.cpu_max * CPU_PERIOD_US))} {CPU_PERIOD_US}"
+        if self.memory_max is not None:
+            settings['memory.max'] = str(self.memory_max)
+            settings['memory.oom.group'] = '1'  # OOM kills the whole program, not just one of its processes
+        if self.io_weight is not None:
+            settings['io.weight'] = f"default {self.io_weight}"
+        if self.pids_max is not None:
+            settings['pids.max'] = str(self.pids_max)
+        return settings
+
+
+class Cgroup:
+    """Leaf cgroup of one job execution."""
+
+    def __init__(self, path, limits):
+        self.path = path
+        self.limits = limits
+
+    def limit_events(self):
+        """
+        Returns:
+            Dictionary of the limit events of the used controllers: `oom_kills`, `memory_max_hits`,
+            `throttled_count`, `throttled_time` (seconds) and `pids_max_hits`
+        """
+        events = {}
+        if self.limits.memory_max is not None:
+            memory = _read_keyed(self.path / 'memory.events')
+            events['oom_kills'] = memory.get('oom_kill', 0)
+            events['memory_max_hits'] = memory.get('max', 0)
+        if self.limits.cpu_max is not None:
+            cpu = _read_keyed(self.path / 'cpu.stat')
+            events['throttled_count'] = cpu.get('nr_throttled', 0)
+            events['throttled_time'] = cpu.get('throttled_usec', 0) / 1_000_000
+        if self.limits.pids_max is not None:
+            events['pids_max_hits'] = _read_keyed(self.path / 'pids.events').get('max', 0)
+        if events.get('oom_kills'):
+            logger.warning("Program killed by OOM killer, memory limit exceeded", extra={
+                "cgroup": str(self.path), "memory_max": self.limits.memory_max, "oom_kills": events['oom_kills']})
+        return events
+
+    def memory_peak(self):
+        """
+        Returns:
+            Peak memory usage of the leaf in bytes (`memory.peak`, since Linux 5.19), None when the memory controller
+            is not used or the peak is not available
+        """
+        if self.limits.memory_max is None:
+            return None
+        try:
+            return int((self.path / 'memory.peak').read_text())
+        except (OSError, ValueError):
+            return None
+
+    def remove(self):
+        """Remove the leaf, processes left in it are killed."""
+        deadline = time.monotonic() + REMOVE_TIMEOUT
+        killed = False
+        while True:
+            try:
+                self.path.rmdir()
+                return
+            except FileNotFoundError:
+                return
+            except OSError as e:
+                if e.errno != errno.EBUSY or time.monotonic() > deadline:
+                    logger.warning("Cgroup not removed", extra={"cgroup": str(self.path), "error": str(e)})
+                    return
+            if not killed:
+                killed = True
+                _kill(self.path)
+            time.sleep(0.05)
+
+
+def create_cgroup(job_id, run_id, limits, root=None):
+    """
+    Create the leaf cgroup with the limits applied.
+
+    Args:
+        job_id: ID of the job
+        run_id: run ID of the job (optional)
+        limits: `CgroupLimits` to apply
+        root: root of the delegated subtree, default: detected
+
+    Returns:
+        `Cgroup` of the created leaf, None if cgroups are not available (a warning is logged)
+    """
+    errors = []
+    try:
+        candidates = [Path(root)] if root else _candidate_roots()
+    except CgroupUnavailableError as e:
+        candidates, errors = [], [str(e)]
+    for candidate in candidates:
+        try:
+            return _create_leaf(candidate, job_id, run_id, limits)
+        except (CgroupUnavailableError, OSError) as e:
+            errors.append(f"{candidate}: {e}")
+    logger.warning("Resource limits not applied, cgroup not available", extra={"job": job_id, "errors": errors})
+    return None
+
+
+def _create_leaf(root, job_id, run_id, limits):
+    controllers = limits.controllers()
+    missing = set(controllers) - set(_read_words(root / 'cgroup.controllers'))
+    if missing:
+        raise CgroupUnavailableError(f"controllers not available: {', '.join(sorted(missing))}")
+    _enable_controllers(root, controllers)
+    base = root / BASE_NAME
+    base.mkdir(exist_ok=True)
+    _enable_controllers(base, controllers)
+
+    name = re.sub(r'[^\w.@-]+', '_', f"{job_id}@{run_id}" if run_id else job_id)
+    leaf = base / f"{name}.{os.getpid()}"
+    leaf.mkdir()
+    cgroup = Cgroup(leaf, limits)
+    try:
+        for file, value in limits.settings().items():
+            (leaf / file).write_text(value)
+    except OSError:
+        cgroup.remove()
+        raise
+    logger.debug("Cgroup created", extra={"job": job_id, "cgroup": str(leaf), "settings": limits.settings()})
+    return cgroup
+
+
+def _enable_controllers(cgroup, controllers):
+    enabled = set(_read_words(cgroup / 'cgroup.subtree_control'))
+    if to_enable := [c for c in controllers if c not in enabled]:
+        (cgroup / 'cgroup.subtree_control').write_text(' '.join(f"+{c}" for c in to_enable))
+
+
+def _candidate_roots():
+    mount = _cgroup2_mount()
+    if not mount:
+        raise CgroupUnavailableError("cgroup v2 hierarchy is not mounted")
+    own = mount / _own_cgroup().lstrip('/')
+    candidates = [p for p in own.parents if p.name.startswith('user@') and p.name.endswith('.service')]
+    if own != mount:
+        candidates.append(own.parent)
+    candidates.append(mount)
+    return list(dict.fromkeys(candidates))  # Keep the order, remove duplicates
+
+
+def _cgroup2_mount():
+    try:
+        with open(_MOUNTINFO) as f:
+            for line in f:
+                fields = line.split()
+                # Optional fields are terminated by `-`, followed by the file system type
+                if fields[fields.index('-') + 1] == 'cgroup2':
+                    return Path(fields[4])
+    except (OSError, ValueError, IndexError):
+        pass
+    return _DEF_MOUNT if (_DEF_MOUNT / 'cgroup.controllers').exists() else None
+
+
+def _own_cgroup():
+    try:
+        with open(_PROC_CGROUP) as f:
+            for line in f:
+                if line.startswith('0::'):
+                    return line[3:].strip()
+    except OSError:
+        pass
+    return '/'
+
+
+def _kill(path):
+    try:
+        (path / 'cgroup.kill').write_text('1')  # Linux 5.14+
+    except OSError:
+        for pid in _read_words(path / 'cgroup.procs'):
+            try:
+                os.kill(int(pid), signal.SIGKILL)
+            except (ProcessLookupError, ValueError):
+                pass
+
+
+def _read_words(file):
+    try:
+        return file.read_text().split()
+    except OSError:
+        return []
+
+
+def _read_keyed(file):
+    values = {}
+    try:
+        for line in file.read_text().splitlines():
+            key, _, value = line.partition(' ')
+            values[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return values
+
+
+class CgroupUnavailableError(RuntoolsException):
+    pass
@@ -1,25 +1,85 @@
+"""
+Command line arguments parsing.
+
+This module is imported on every invocation, so it deliberately avoids importing anything heavier than `argparse`
+at module level. Rich help formatting is imported only when help or usage is actually rendered, and only the parser
+of the requested subcommand is built.
+"""
 import argparse
+import importlib
 import sys
 import textwrap
 
-from rich_argparse import RichHelpFormatter
-from rich_argparse.contrib import ParagraphRichHelpFormatter
-
-from runtools.runcore.run import TerminationStatus
-from runtools.runcore.util.dt import parse_duration_to_sec
-from runtools.runcore.util.text import parse_size_to_bytes
 from . import __version__
+from .output import PARSE_FORMATS, OUTPUT_MODES, OUTPUT_MODE_LINES, COMPRESS_FORMATS, COMPRESS_NONE
 
 ACTION_JOB = 'job'
 ACTION_CONFIG = 'config'
 ACTION_CONFIG_PRINT = 'print'
 ACTION_CONFIG_CREATE = 'create'
+ACTION_CONFIG_CACHE = 'cache'
+ACTION_CONFIG_CACHE_CLEAR = 'clear'
+ACTION_CONFIG_CACHE_STATUS = 'status'
 ACTION_ENV = 'env'
 ACTION_LOG = 'log'
+ACTION_BATCH = 'batch'
+ACTION_TAIL = 'tail'
+ACTION_QUEUE = 'queue'
+
+DEF_PROFILE_FILE = 'run-profile.json'
+ACTION_DAEMON = 'daemon'
+ACTION_DAEMON_START = 'start'
+ACTION_DAEMON_STOP = 'stop'
+ACTION_DAEMON_STATUS = 'status'
+
+
+class LazyFormatter:
+    """Formatter factory importing the formatter class only when the first formatter is created."""
+
+    def __init__(self, module, name):
+        self.module = module
+        self.name = name
+
+    def __call__(self, prog, **kwargs):
+        formatter_class = getattr(importlib.import_module(self.module), self.name)
+        return formatter_class(prog, **kwargs)
+
+
+RichHelpFormatter = LazyFormatter('rich_argparse', 'RichHelpFormatter')
+ParagraphRichHelpFormatter = LazyFormatter('rich_argparse.contrib', 'ParagraphRichHelpFormatter')
+
+
+class ArgumentParser(argparse.ArgumentParser):
+    """
+    Argument parser using a `LazyFormatter` only for rendering of help and usage.
+
+    Argparse creates a formatter also for validation of every added argument, for which the default formatter is
+    sufficient. This way the rich formatting is loaded only when help or usage is actually printed.
+    """
+
+    _rendering = False
+
+    def format_usage(self):
+        return self._render(super().format_usage)
+
+    def format_help(self):
+        return self._render(super().format_help)
+
+    def _render(self, format_func):
+        self._rendering = True
+        try:
+            return format_func()
+        finally:
+            self._rendering = False
+
+    def _get_formatter(self):
+        if not self._rendering and isinstance(self.formatter_class, LazyFormatter):
+            return argparse.HelpFormatter(prog=self.prog)
+        return super()._get_formatter()
 
 
 def parse_args(args):
-    parser = argparse.ArgumentParser(
+    parser = ArgumentParser(
         prog='run',
         description='Run managed job',
         formatter_class=RichHelpFormatter)
@@ -30,13 +90,9 @@ def parse_args(args):
         help="Show version of this app and exit",
         version=__version__.__version__)
 
-    parent = init_cfg_parent_parser()
     subparser = parser.add_subparsers(dest='action')  # command/action
-
-    _init_config_parser(subparser)
-    _init_env_parser(subparser)
-    _init_log_parser(subparser)
-    _init_job_parser(parent, subparser)
+    for init_parser in _subcommand_parsers(args):
+        init_parser(subparser)
 
     parsed = parser.parse_args(args)
     if not getattr(parsed, 'action'):
@@ -48,6 +104,18 @@ def parse_args(args):
     return parsed
 
 
+def _subcommand_parsers(args):
+    """
+    Returns:
+        Init functions of the subcommand parsers to build. Only the requested subcommand parser is built when
+        the subcommand can be determined from the first argument, all of them otherwise (e.g. for the main help).
+    """
+    args = sys.argv[1:] if args is None else args
+    if args and args[0] in _SUBCOMMAND_PARSERS:
+        return [_SUBCOMMAND_PARSERS[args[0]]]
+    return list(_SUBCOMMAND_PARSERS.values())
+
+
 def init_cfg_parent_parser():
     """
     Return:
@@ -90,17 +158,16 @@ def _init_log_parser(subparser):
         formatter_class=RichHelpFormatter)
 
 
-def _init_job_parser(parent, subparser):
+def _init_job_parser(subparser):
     """
     Creates parser for `job` command with options organized in logical groups.
 
     Args:
-        parent: parent parser (config options)
         subparser: sub-parser for job parser to be added to
     """
     job_parser = subparser.add_parser(
         ACTION_JOB,
-        parents=[parent],
+        parents=[init_cfg_parent_parser()],
         description='Execute managed batch or long-running job',
         help='Execute managed batch or long-running job',
         formatter_class=ParagraphRichHelpFormatter,
@@ -119,6 +186,10 @@ def _init_job_parser(parent, subparser):
     # Environment option
     job_parser.add_argument('-e', '--env', type=str,
                             help="Environment ID where job will run. Uses default from config if not specified.")
+    job_parser.add_argument('--daemon', action='store_true', default=False,
+                            help="Submit the job to the runner daemon of the environment (see `run daemon start`) "
+                                 "to avoid the startup overhead. The job runs in this process if the daemon "
+                                 "is not running.")
 
     # Identification & Metadata group
     id_group = job_parser.add_argument_group("Identification & Metadata")
@@ -146,6 +217,11 @@ def _init_job_parser(parent, subparser):
                               help='Disable output capturing. Program output goes directly to stdout/stderr. '
                                    'Improves compatibility with interactive programs using terminal control codes. '
                                    'Note: Disables output-based features like parsing and tracking.')
+    output_group.add_argument('--output-mode', choices=OUTPUT_MODES, default=OUTPUT_MODE_LINES,
+                              help='`lines` (default) captures and processes the output line by line. `raw` copies '
+                                   'stdout/stderr in large byte chunks to the terminal, the output file and the '
+                                   'memory-mapped tail buffer (`--tail-buffer-mmap`) without decoding, parsing or '
+                                   'warning checks. Best for high-volume output.')
     output_group.add_argument('--disable-output', type=str, metavar='TYPE', action='append', default=[],
                               help='Disable output storage by type (e.g. file, s3, all). Repeatable.')
     output_group.add_argument('--output-warn', type=str, metavar='REGEX', action='append', default=[],
@@ -153,10 +229,25 @@ def _init_job_parser(parent, subparser):
                                    'matches regex specified by the value of this option. For example `--warn-output '
                                    '"ERR*"` triggers output warning each time an output line contains a word starting '
                                    'with ERR.')
+    output_group.add_argument('--output-warn-literal', type=str, metavar='TEXT', action='append', default=[],
+                              help='Like `--output-warn` but TEXT is matched as a plain substring. All warning '
+                                   'patterns and texts are combined into a single matcher, so the cost per output '
+                                   'line stays nearly constant with the number of patterns.')
     output_group.add_argument('--tail-buffer-size', type=_size_type, metavar='SIZE', default=None,
                               help='Size of the in-memory tail buffer for recent output. '
                                    'Accepts bytes (e.g. 1048576) or human-readable units (e.g. 512KB, 2MB, 1GB). '
                                    'Default: from env config (2MB).')
+    output_group.add_argument('--output-compress', choices=COMPRESS_FORMATS + (COMPRESS_NONE,), metavar='FORMAT',
+                              help='Compress the stored output incrementally: ' + '|'.join(COMPRESS_FORMATS) +
+                                   ' (zstd and lz4 require the `zstandard` and `lz4` packages). Captured output is '
+                                   'stored by the node as usual and also as a compressed JSON lines copy, raw output '
+                                   'only compressed. The file is flushed periodically, so it stays readable (zcat, '
+                                   'zstdcat, lz4cat) during the run. `none` overrides the `output.compress` config '
+                                   'value.')
+    output_group.add_argument('--tail-buffer-mmap', action='store_true',
+                              help='Keep the tail buffer also in a memory-mapped ring buffer file in the runtime '
+                                   'directory, so other processes can read the recent output of the running job '
+                                   'with `run tail`. The file is removed when the job ends.')
 
     # Status Tracking group
     status_group = job_parser.add_argument_group("Status Tracking")
@@ -166,6 +257,16 @@ def _init_job_parser(parent, subparser):
                               dest='no_parse', help=argparse.SUPPRESS)
     status_group.add_argument('--kv-alias', type=str, action='append', default=[],
                               help='Mapping of output keys to common fields.')
+    status_group.add_argument('--parse-prefilter', type=_parse_formats_type, metavar='FORMATS',
+                              help='Comma separated output formats: ' + ','.join(PARSE_FORMATS) + '. Only lines which '
+                                   'can contain any of the formats (by a fast check, e.g. `=[` for kv or leading `{` '
+                                   'for json) are parsed, the others skip parsing completely. The passed lines are '
+                                   'parsed for all the formats. Default: every line parsed.')
+    status_group.add_argument('--parse-marker', type=str, metavar='PREFIX',
+                              help='Parse only output lines starting with PREFIX.')
+    status_group.add_argument('--status-interval', type=_duration_type, metavar='DURATION',
+                              help='Emit at most one status update per interval. Fields parsed in the meantime are '
+                                   'merged into the next update. A `result` field is always emitted immediately.')
 
     # Timeout Control group
     timeout_group = job_parser.add_argument_group("Timeout Control")
@@ -202,6 +303,100 @@ def _init_job_parser(parent, subparser):
     concurrency_group.add_argument('-g', '--concurrency-group', type=str,
                                    help='Set concurrency group ID. Default: job ID. '
                                         'Used with --serial or --max-concurrent to limit concurrency across different jobs.')
+    concurrency_group.add_argument('--max-load', type=float, metavar='LOAD',
+                                   help='Start the job only when the 1-minute load average of the host is at most '
+                                        'LOAD. The job waits until the condition is met (within --timeout if set).')
+    concurrency_group.add_argument('--min-free-mem', type=_size_type, metavar='SIZE',
+                                   help='Start the job only when at least SIZE of memory is available (e.g. 2GB).')
+    concurrency_group.add_argument('--max-iowait', type=float, metavar='PERCENT',
+                                   help='Start the job only when the CPU time spent waiting for I/O is at most '
+                                        'PERCENT.')
+    concurrency_group.add_argument('-p', '--priority', type=int, default=0, metavar='N',
+                                   help='Priority of the job in the local queue (--local-dispatch). '
+                                        'Waiting jobs are ordered by priority (higher first), then by arrival. '
+                                        'Default: 0.')
+    concurrency_group.add_argument('--priority-aging', type=_duration_type, metavar='DURATION',
+                                   help='Raise the effective priority of this job by one level per DURATION of '
+                                        'waiting, so it is not starved by jobs of higher priority.')
+    concurrency_group.add_argument('--local-dispatch', action='store_true', default=False,
+                                   help='Dispatch --serial/--max-concurrent jobs by the event-driven local queue of '
+                                        'this host instead of the execution queue of the environment. The limit then '
+                                        'applies only to the jobs of the group using the local queue on this host, '
+                                        'so it must be used by all jobs of the concurrency group, all on this host.')
+
+    # Parallel Execution group
+    parallel_group = job_parser.add_argument_group("Parallel Execution")
+    parallel_group.add_argument('--shards', type=_positive_int_type, metavar='N', default=0,
+                                help='Execute the program in N parallel processes within one job instance. '
+                                     'Placeholders `{shard}` (0 to N-1) and `{shards}` in the arguments and environment '
+                                     'variables RUN_SHARD and RUN_SHARDS tell each process its shard. Output lines are '
+                                     'prefixed with `[shard i]`. When a shard fails, the other shards are stopped '
+                                     'and the job fails.')
+
+    # Resource Limits group
+    limits_group = job_parser.add_argument_group("Resource Limits")
+    limits_group.add_argument('--cpu-max', type=_positive_float_type, metavar='CPUS',
+                              help='Limit the CPU time of the program to CPUS (e.g. 0.5 or 2). The program is '
+                                   'throttled when the limit is reached.')
+    limits_group.add_argument('--memory-max', type=_size_type, metavar='SIZE',
+                              help='Limit the memory of the program to SIZE (e.g. 512MB, 4GB). The program is killed '
+                                   'by the OOM killer when the limit is exceeded.')
+    limits_group.add_argument('--io-weight', type=_io_weight_type, metavar='WEIGHT',
+                              help='Proportional I/O weight of the program (1-10000, default of the system: 100).')
+    limits_group.add_argument('--pids-max', type=_positive_int_type, metavar='N',
+                              help='Limit the number of processes and threads of the program.')
+    # The limits are applied by a cgroup v2 leaf, see the `cgroup.root` config value
+
+    # CPU & I/O Scheduling group
+    sched_group = job_parser.add_argument_group("CPU & I/O Scheduling")
+    sched_group.add_argument('--cpus', type=_cpus_type, metavar='LIST',
+                             help='Run the program only on the listed CPUs (e.g. 0-3,8). `auto` spreads the jobs of '
+                                  'the concurrency group (--serial/--max-concurrent) across distinct CPU sets: '
+                                  'the CPUs are split into one set per concurrently running job.')
+    sched_group.add_argument('--nice', type=int, metavar='N',
+                             help='Niceness increment of the program (like `nice -n`, negative values require '
+                                  'privileges).')
+    sched_group.add_argument('--ionice', type=_ionice_type, metavar='CLASS[:LEVEL]',
+                             help='I/O scheduling class (realtime, best-effort, idle or 0-3) and level (0-7, '
+                                  'default 4) of the program, e.g. `best-effort:7` or `idle`.')
+    sched_group.add_argument('--numa-node', type=int, metavar='N',
+                             help='Run the program on the CPUs of NUMA node N and prefer memory of the node.')
+
+    # Result Caching group
+    cache_group = job_parser.add_argument_group("Result Caching")
+    cache_group.add_argument('--cache-key', type=str, metavar='KEY',
+                             help='Skip the job if it has already completed successfully with the same key, program, '
+                                  'arguments, --cache-env values and --inputs content.')
+    cache_group.add_argument('--inputs', type=str, metavar='GLOB', action='append', default=[],
+                             help='Input files of the job included in the cache fingerprint (`**` matches any '
+                                  'directories). Enables result caching. Repeatable.')
+    cache_group.add_argument('--cache-env', type=str, metavar='VAR', action='append', default=[],
+                             help='Environment variable included in the cache fingerprint. Repeatable.')
+    cache_group.add_argument('--cache-ttl', type=_duration_type, metavar='DURATION',
+                             help='Use a cached result only if it is not older than DURATION. Default: no expiration.')
+
+    # Diagnostics group
+    diag_group = job_parser.add_argument_group("Diagnostics")
+    diag_group.add_argument('--profile', action='store_true', default=False,
+                            help='Record timing trace of the wrapper (argument parsing, config load, logging setup, '
+                                 'node connection, instance creation, run and output processing) and write it '
+                                 f'in the Chrome trace format. Default file: {DEF_PROFILE_FILE}')
+    diag_group.add_argument('--profile-file', type=str, metavar='FILE',
+                            help='Enables `--profile` and sets the trace file. Not supported with `--daemon`.')
+    diag_group.add_argument('--metrics-dir', type=str, metavar='DIR',
+                            help='Write Prometheus metrics of the run (duration, wait times, output rate, parse hits, '
+                                 'warnings, CPU and memory) to DIR when the run ends, for the textfile collector of '
+                                 'node exporter. Default: `metrics.textfile_dir` config value.')
+    diag_group.add_argument('--metrics-socket', type=str, metavar='PATH',
+                            help='Serve current Prometheus metrics of the running job over HTTP on the Unix socket '
+                                 'PATH (e.g. `curl --unix-socket PATH http://localhost/metrics`).')
+    diag_group.add_argument('--resource-sample-interval', type=_duration_type, metavar='DURATION',
+                            help='Sample CPU time, memory and storage I/O of the program process tree from /proc '
+                                 'each DURATION and log the samples. The resource usage summary logged at the end '
+                                 'of the run then includes the peak memory of the whole process tree.')
+    diag_group.add_argument('--resource-summary', action='store_true', default=False,
+                            help='Show the resource usage summary of the run on the terminal (logged at the info '
+                                 'level). Default: the summary is logged only at the debug level (log file).')
 
     # Command and arguments
     job_parser.add_argument('command', type=str, metavar='COMMAND', help='Program to execute')
@@ -209,6 +404,90 @@ def _init_job_parser(parent, subparser):
 
 
 
+def _init_batch_parser(subparser):
+    """Creates parser for `batch` command executing jobs from a manifest in one process."""
+    batch_parser = subparser.add_parser(
+        ACTION_BATCH,
+        parents=[init_cfg_parent_parser()],
+        description='Execute all jobs defined in a manifest in a single process. The manifest is a TOML file '
+                    'with a `jobs` array of tables or a JSONL file with one job object per line. Job fields match '
+                    'the `run job` options: id, args, run_id, duplicate, bypass_output, parse, parse_prefilter, '
+                    'parse_marker, status_interval, kv_alias, output_warn, output_warn_literal, timeout, time_warn, '
+                    'checkpoint, excl, excl_group, serial, max_concurrent, concurrency_group.',
+        help='Execute jobs defined in a manifest',
+        formatter_class=RichHelpFormatter,
+        add_help=False)
+    batch_parser.add_argument('-e', '--env', type=str,
+                              help="Environment ID where the jobs will run. Uses default from config if not specified.")
+    batch_parser.add_argument('-w', '--workers', type=int, default=None,
+                              help='Maximum number of jobs executed at the same time. '
+                                   'Default: number of CPUs + 4, at most 32.')
+    batch_parser.add_argument('--disable-output', type=str, metavar='TYPE', action='append', default=[],
+                              help='Disable output storage by type (e.g. file, s3, all). Repeatable.')
+    batch_parser.add_argument('--tail-buffer-size', type=_size_type, metavar='SIZE', default=None,
+                              help='Size of the in-memory tail buffer for recent output of each job.')
+    batch_parser.add_argument('manifest', type=str, metavar='MANIFEST',
+                              help='Path to the manifest file (.toml, otherwise JSONL). Use `-` for JSONL from stdin.')
+
+
+def _init_tail_parser(subparser):
+    """Creates parser for `tail` command."""
+    tail_parser = subparser.add_parser(
+        ACTION_TAIL,
+        description='Print recent output of running jobs started with `--tail-buffer-mmap`. '
+                    'Without INSTANCE the tail buffers of all such running jobs are listed.',
+        help='Print recent output of running jobs',
+        formatter_class=RichHelpFormatter)
+    tail_parser.add_argument('instance', type=str, nargs='?', metavar='INSTANCE',
+                             help='Job ID or `job_id@run_id` of the running job')
+    tail_parser.add_argument('-f', '--follow', action='store_true',
+                             help='Keep printing new output until the job ends')
+    size_group = tail_parser.add_mutually_exclusive_group()
+    size_group.add_argument('-c', '--bytes', type=_size_type, metavar='SIZE',
+                            help='Print at most the last SIZE of the buffered output (e.g. 4096, 64KB)')
+    size_group.add_argument('-n', '--lines', type=_positive_int_type, metavar='N',
+                            help='Print at most the last N lines of the buffered output')
+
+
+def _init_queue_parser(subparser):
+    """Creates parser for `queue` command."""
+    queue_parser = subparser.add_parser(
+        ACTION_QUEUE,
+        description='Show jobs waiting in the local queues of concurrency groups (`--serial`, `--max-concurrent`) '
+                    'with their position, priority and wait time.',
+        help='Show local queues of concurrency groups',
+        formatter_class=RichHelpFormatter)
+    queue_parser.add_argument('-e', '--env', type=str,
+                              help='Environment ID of the jobs. Uses default if not specified.')
+    queue_parser.add_argument('group', type=str, nargs='?', metavar='GROUP',
+                              help='Concurrency group (default: job ID of the queued job). All groups if omitted.')
+
+
+def _init_daemon_parser(subparser):
+    """Creates parsers for `daemon` command and its subcommands."""
+    daemon_parser = subparser.add_parser(
+        ACTION_DAEMON,
+        description='Manage local runner daemon executing jobs submitted by `run job --daemon`',
+        help='Manage local runner daemon',
+        formatter_class=RichHelpFormatter)
+
+    daemon_subparser = daemon_parser.add_subparsers(dest='daemon_action', required=True)
+
+    start_parser = daemon_subparser.add_parser(
+        ACTION_DAEMON_START,
+        parents=[init_cfg_parent_parser()],
+        help='Start the daemon in the foreground',
+        description='Start the daemon in the foreground. Use a service manager or `&` to run it in the background.',
+        formatter_class=RichHelpFormatter,
+        add_help=False)
+    stop_parser = daemon_subparser.add_parser(
+        ACTION_DAEMON_STOP, help='Stop the daemon', formatter_class=RichHelpFormatter)
+    status_parser = daemon_subparser.add_parser(
+        ACTION_DAEMON_STATUS, help='Show whether the daemon is running', formatter_class=RichHelpFormatter)
+    for parser in (start_parser, stop_parser, status_parser):
+        parser.add_argument('-e', '--env', type=str, help='Environment ID of the daemon. Uses default if not specified.')
+
+
 def _init_config_parser(subparser):
     """
     Creates parsers for `config` command and its subcommands.
@@ -239,9 +518,35 @@ def _init_config_parser(subparser):
     create_config_parser.add_argument('-o', '--overwrite', action='store_true', help='Overwrite if config file exists.')
     create_config_parser.add_argument('-p', '--path', type=str, help='Specify path for created config file.')
 
+    cache_config_parser = config_subparser.add_parser(
+        ACTION_CONFIG_CACHE,
+        help='Manage compiled config cache',
+        description='Manage the cache of parsed config files. Cached content is used only while the source file '
+                    'is unchanged (same path, modification time and size).',
+        formatter_class=RichHelpFormatter)
+    cache_subparser = cache_config_parser.add_subparsers(dest='cache_action', required=True)
+    cache_subparser.add_parser(
+        ACTION_CONFIG_CACHE_CLEAR, help='Remove the cache file', formatter_class=RichHelpFormatter)
+    cache_subparser.add_parser(
+        ACTION_CONFIG_CACHE_STATUS, help='Show the cache file and state of cached files',
+        formatter_class=RichHelpFormatter)
+
+
+_SUBCOMMAND_PARSERS = {
+    ACTION_CONFIG: _init_config_parser,
+    ACTION_ENV: _init_env_parser,
+    ACTION_LOG: _init_log_parser,
+    ACTION_DAEMON: _init_daemon_parser,
+    ACTION_JOB: _init_job_parser,
+    ACTION_BATCH: _init_batch_parser,
+    ACTION_TAIL: _init_tail_parser,
+    ACTION_QUEUE: _init_queue_parser,
+}
+
 
 # TODO Consider: change to str (like SortCriteria case) and remove this function
 def _str2_term_status(v):
+    from runtools.runcore.run import TerminationStatus
     try:
         return TerminationStatus[v.upper()]
     except KeyError:
@@ -250,19 +555,78 @@ def _str2_term_status(v):
 
 
 def _duration_type(arg_value):
+    from runtools.runcore.util.dt import parse_duration_to_sec
     try:
         return parse_duration_to_sec(arg_value)
     except ValueError as e:
         raise argparse.ArgumentTypeError(str(e))
 
 
+def _positive_int_type(arg_value):
+    try:
+        value = int(arg_value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer value: {arg_value!r}")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: {arg_value!r}")
+    return value
+
+
+def _positive_float_type(arg_value):
+    try:
+        value = float(arg_value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number: {arg_value!r}")
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0: {arg_value!r}")
+    return value
+
+
+def _io_weight_type(arg_value):
+    try:
+        value = int(arg_value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer value: {arg_value!r}")
+    if not 1 <= value <= 10000:
+        raise argparse.ArgumentTypeError(f"must be between 1 and 10000: {arg_value!r}")
+    return value
+
+
+def _cpus_type(arg_value):
+    from .launch import parse_cpu_list, CPUS_AUTO
+    if arg_value == CPUS_AUTO:
+        return arg_value
+    try:
+        return parse_cpu_list(arg_value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _ionice_type(arg_value):
+    from .launch import parse_ionice
+    try:
+        return parse_ionice(arg_value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
 def _size_type(arg_value):
+    from runtools.runcore.util.text import parse_size_to_bytes
     try:
         return parse_size_to_bytes(arg_value)
     except ValueError as e:
         raise argparse.ArgumentTypeError(str(e))
 
 
+def _parse_formats_type(arg_value):
+    formats = [f.strip() for f in arg_value.split(',') if f.strip()]
+    invalid = [f for f in formats if f not in PARSE_FORMATS]
+    if not formats or invalid:
+        raise argparse.ArgumentTypeError(
+            f"invalid parse formats: {arg_value!r} (choose from {', '.join(PARSE_FORMATS)})")
+    return formats
+
+
 def _check_conditions(parser, parsed):
     _check_config_option_conflicts(parser, parsed)
 
@@ -284,7 +648,25 @@ def _check_config_option_conflicts(parser, parsed):
     """
     _check_mutual_exclusion(parser, parsed, 'def_config', 'config_required', 'config')
     _check_mutual_exclusion(parser, parsed, 'serial', 'max_concurrent')
+    _check_mutual_exclusion(parser, parsed, 'no_parse', 'parse')
+    _check_mutual_exclusion(parser, parsed, 'no_parse', 'parse_marker')
+    _check_mutual_exclusion(parser, parsed, 'no_parse', 'status_interval')
+    # The trace of a daemon job would cover only the client, the wrapper overhead is in the daemon worker
+    _check_mutual_exclusion(parser, parsed, 'daemon', 'profile')
+    _check_mutual_exclusion(parser, parsed, 'daemon', 'profile_file')
+    if getattr(parsed, 'output_mode', None) == 'raw':
+        _check_mutual_exclusion(parser, parsed, 'output_mode', 'bypass_output')
+        for option in ('parse', 'parse_marker', 'status_interval', 'output_warn', 'output_warn_literal'):
+            _check_mutual_exclusion(parser, parsed, 'output_mode', option)
 
     # Check dependent options
+    if (getattr(parsed, 'cache_ttl') or getattr(parsed, 'cache_env')) and not (
+            getattr(parsed, 'cache_key') or getattr(parsed, 'inputs')):
+        parser.error("`--cache-ttl` and `--cache-env` must be used with either `--cache-key` or `--inputs`")
+    if (getattr(parsed, 'priority') or getattr(parsed, 'priority_aging')) and not (
+            getattr(parsed, 'serial') or getattr(parsed, 'max_concurrent')):
+        parser.error("`--priority` and `--priority-aging` must be used with either `--serial` or `--max-concurrent`")
+    if getattr(parsed, 'cpus', None) == 'auto' and not (getattr(parsed, 'serial') or getattr(parsed, 'max_concurrent')):
+        parser.error("`--cpus auto` must be used with either `--serial` or `--max-concurrent`")
     if getattr(parsed, 'concurrency_group') and not (getattr(parsed, 'serial') or getattr(parsed, 'max_concurrent')):
         parser.error("`--concurrency-group` must be used with either `--serial` or `--max-concurrent`")
@@ -0,0 +1,19 @@
+import time
+
+from runtools.runcli import batch, load_config_and_log_setup
+
+
+def run(args):
+    load_config_and_log_setup(f"batch:{args.manifest}", args)
+    jobs = batch.load_manifest(args.manifest)
+
+    start = time.monotonic()
+    results = batch.Batch(jobs).run(
+        getattr(args, 'env', None),
+        workers=args.workers,
+        disable_output=tuple(args.disable_output),
+        tail_buffer_size=args.tail_buffer_size)
+    batch.print_report(results, time.monotonic() - start)
+
+    if not all(r.success for r in results):
+        exit(1)
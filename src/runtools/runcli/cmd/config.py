@@ -0,0 +1,22 @@
+from runtools.runcli import cfg, cli
+
+
+def run(args):
+    if args.config_action == cli.ACTION_CONFIG_PRINT:
+        if getattr(args, 'def_config', False):
+            cfg.print_default_config_file()
+        else:
+            cfg.print_found_config_file()
+    elif args.config_action == cli.ACTION_CONFIG_CREATE:
+        print("Created " + str(cfg.create_config_file(getattr(args, 'path'), overwrite=args.overwrite)))
+    elif args.config_action == cli.ACTION_CONFIG_CACHE:
+        _run_cache(args)
+
+
+def _run_cache(args):
+    if args.cache_action == cli.ACTION_CONFIG_CACHE_CLEAR:
+        print(("Removed " if cfg.clear_cache() else "No cache at ") + str(cfg.cache_path()))
+    elif args.cache_action == cli.ACTION_CONFIG_CACHE_STATUS:
+        print(f"Cache file: {cfg.cache_path()}")
+        for source, state in cfg.cache_status():
+            print(f"  {state:<8} {source}")
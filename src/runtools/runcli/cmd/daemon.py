@@ -0,0 +1,19 @@
+from runtools.runcli import cli, daemon, load_config_and_log_setup
+
+
+def run(args):
+    env_id = getattr(args, 'env', None)
+    if args.daemon_action == cli.ACTION_DAEMON_START:
+        # No logging thread may be running when the workers are forked
+        load_config_and_log_setup(f"daemon@{env_id or 'default'}", args, sync_logging=True)
+        daemon.serve(env_id)
+    elif args.daemon_action == cli.ACTION_DAEMON_STOP:
+        if daemon.stop(env_id):
+            print("Daemon stopped")
+        else:
+            print("Daemon is not running")
+    elif args.daemon_action == cli.ACTION_DAEMON_STATUS:
+        if daemon.is_running(env_id):
+            print(f"Daemon is running (pid {daemon.daemon_pid(env_id)}) on {daemon.socket_path(env_id)}")
+        else:
+            print("Daemon is not running")
@@ -0,0 +1,24 @@
+from runtools.runcore import env
+from runtools.runcore.env import lookup, load_env_config, BUILTIN_LOCAL
+from runtools.runcore.util.files import format_toml
+
+from runtools.runcli import cfg
+
+
+def run(args):
+    cfg.cache_env_configs()
+    all_envs = getattr(args, 'all_envs', False)
+    if all_envs:
+        registry = env.load_registry()
+        env_configs = [load_env_config(entry) for entry in registry.values()]
+    else:
+        entry = lookup(getattr(args, 'env', None) or BUILTIN_LOCAL)
+        env_configs = [load_env_config(entry)]
+    for i, env_config in enumerate(env_configs):
+        if all_envs:
+            if i > 0:
+                print()
+            print(f"# Environment: {env_config.id}")
+        print(format_toml(env_config.model_dump(mode='json')))
+        if all_envs:
+            print(f"{'─' * 30}")
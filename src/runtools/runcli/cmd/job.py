@@ -0,0 +1,116 @@
+import logging
+
+from runtools.runcli import cli, job, load_config_and_log_setup, tracing
+from runtools.runcli.admission import AdmissionConditions
+from runtools.runcli.cgroup import CgroupLimits
+from runtools.runcli.memo import Memo
+from runtools.runcli.output import COMPRESS_FORMATS, COMPRESS_NONE
+from runtools.runcore.job import InstanceID, DuplicateStrategy
+
+logger = logging.getLogger(__name__)
+
+
+def run(args):
+    try:
+        _run_job(args)
+    finally:
+        if tracer := tracing.stop():
+            tracer.write(args.profile_file or cli.DEF_PROFILE_FILE)
+
+
+def _run_job(args):
+    job_id = args.id or " ".join([args.command.removeprefix('./')] + args.arg)
+    run_id = getattr(args, 'run_id')
+    config = load_config_and_log_setup(InstanceID(job_id, run_id), args)
+    program_args = [args.command] + args.arg
+    checkpoint_id = getattr(args, 'checkpoint')
+
+    output_processors = tracing.trace_output_processors(_build_output_processors(args))
+    output_compress, compress_flush_interval = _resolve_output_compress(args, config)
+
+    job.run(
+        job_id, run_id, getattr(args, 'env', None), program_args,
+        bypass_output=args.bypass_output,
+        output_mode=args.output_mode,
+        disable_output=tuple(args.disable_output),
+        excl=args.excl_run,
+        excl_group=getattr(args, 'excl_group'),
+        checkpoint_id=checkpoint_id,
+        serial=args.serial,
+        max_concurrent=args.max_concurrent,
+        concurrency_group=getattr(args, 'concurrency_group', None),
+        timeout=getattr(args, 'timeout', 0.0),
+        timeout_signal=getattr(args, 'timeout_sig'),
+        time_warning=getattr(args, 'time_warn'),
+        output_warning=args.output_warn,
+        output_warning_literal=args.output_warn_literal,
+        output_processors=output_processors,
+        tail_buffer_size=args.tail_buffer_size,
+        tail_buffer_mmap=args.tail_buffer_mmap,
+        output_compress=output_compress,
+        output_compress_flush_interval=compress_flush_interval,
+        local_dispatch=args.local_dispatch,
+        priority=args.priority,
+        priority_aging=args.priority_aging,
+        admission=AdmissionConditions(args.max_load, args.min_free_mem, args.max_iowait),
+        memo=Memo.create(job_id, program_args, cache_key=args.cache_key, inputs=args.inputs,
+                         env_vars=args.cache_env, ttl=args.cache_ttl),
+        shards=args.shards,
+        resource_sample_interval=args.resource_sample_interval,
+        resource_summary=args.resource_summary,
+        cgroup_limits=CgroupLimits(args.cpu_max, args.memory_max, args.io_weight, args.pids_max),
+        cgroup_root=config.get('cgroup', {}).get('root'),
+        cpus=args.cpus,
+        nice=args.nice,
+        ionice=args.ionice,
+        numa_node=args.numa_node,
+        metrics_dir=args.metrics_dir or config.get('metrics', {}).get('textfile_dir'),
+        metrics_socket=args.metrics_socket,
+        duplicate_strategy=_resolve_duplicate_strategy(args),
+    )
+
+
+def _resolve_duplicate_strategy(args):
+    if getattr(args, 'allow_duplicate', False):
+        return DuplicateStrategy.ALLOW
+    if getattr(args, 'suppress_duplicate', False):
+        return DuplicateStrategy.SUPPRESS
+    return DuplicateStrategy.DISALLOW
+
+
+def _resolve_output_compress(args, config):
+    """Output compression from the `--output-compress` option, or from the `[output]` config table."""
+    from runtools.runcore.util.dt import parse_duration_to_sec
+
+    output_config = config.get('output', {})
+    compression = args.output_compress or output_config.get('compress')
+    if not compression or compression == COMPRESS_NONE:
+        return None, None
+    if compression not in COMPRESS_FORMATS:
+        logger.warning("Invalid output compression", extra={"compression": compression, "valid": COMPRESS_FORMATS})
+        return None, None
+    from runtools.runcli.compress import create_compressor
+    create_compressor(compression)  # Fail before the job starts when the compression library is missing
+
+    flush_interval = output_config.get('compress_flush_interval')
+    if isinstance(flush_interval, str):
+        try:
+            flush_interval = parse_duration_to_sec(flush_interval)
+        except ValueError:
+            logger.warning("Invalid output compression flush interval", extra={"value": flush_interval})
+            flush_interval = None
+    return compression, flush_interval
+
+
+def _build_output_processors(args):
+    """Build output processors with smart parsing. Parsing is on by default, use --no-parse to disable."""
+    aliases = {}
+    for alias_str in getattr(args, 'kv_alias', []):
+        if '=' in alias_str:
+            from_key, to_key = alias_str.split('=', 1)
+            aliases[from_key.strip()] = to_key.strip()
+
+    return job.create_output_processors(
+        not getattr(args, 'no_parse', False), aliases,
+        parse_prefilter=getattr(args, 'parse_prefilter', None), parse_marker=getattr(args, 'parse_marker', None),
+        status_interval=getattr(args, 'status_interval', None))
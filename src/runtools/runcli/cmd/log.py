@@ -0,0 +1,13 @@
+from runtools.runcli import cfg, log
+from runtools.runcore import paths
+from runtools.runcore.paths import ConfigFileNotFoundError
+
+
+def run(args=None):
+    config, _ = cfg.read_default_configuration()
+    try:
+        config, _ = cfg.read_configuration()
+    except ConfigFileNotFoundError:
+        pass
+    log_file_path = config.get('log', {}).get('file', {}).get('path')
+    print(paths.expand_user(log_file_path) or (paths.log_dir() / log.LOG_FILENAME))
@@ -0,0 +1,19 @@
+import time
+
+from runtools.runcli import dispatch
+
+
+def run(args):
+    directories = [dispatch.queue_dir(args.group, args.env)] if args.group else dispatch.list_groups(args.env)
+    directories = [d for d in directories if d.exists()]
+    if not directories:
+        print("No local queue found" + (f" for group `{args.group}`" if args.group else ""))
+        return
+
+    now = time.time()
+    for directory in directories:
+        running, waiting = dispatch.group_status(directory)
+        print(f"{directory.name}: {len(running)} running, {len(waiting)} waiting")
+        for position, entry in enumerate(waiting, start=1):
+            print(f"  {position:>4}  pid {entry.pid:<8} priority {entry.priority:>3} "
+                  f"(effective {entry.effective_priority(now):6.2f})  waiting {now - entry.enqueued:8.1f}s")
@@ -0,0 +1,33 @@
+import sys
+
+from runtools.runcli import tailbuffer
+
+
+def run(args):
+    files = tailbuffer.find_tail_files(args.instance)
+    if not args.instance:
+        for file in files:
+            print(file.stem)
+        return
+    if not files:
+        print(f"No running job with tail buffer found: {args.instance}", file=sys.stderr)
+        exit(1)
+    if len(files) > 1:
+        print(f"Multiple running jobs match `{args.instance}`, use `job_id@run_id`:", file=sys.stderr)
+        for file in files:
+            print(f"  {file.stem}", file=sys.stderr)
+        exit(1)
+
+    out = sys.stdout.buffer
+    with tailbuffer.TailReader(files[0]) as reader:
+        data, offset = reader.read()
+        if args.bytes:
+            data = data[-args.bytes:]
+        elif args.lines:
+            data = tailbuffer.last_lines(data, args.lines)
+        out.write(data)
+        out.flush()
+        if args.follow:
+            for chunk in reader.follow_from(offset):
+                out.write(chunk)
+                out.flush()
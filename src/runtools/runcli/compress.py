@@ -0,0 +1,184 @@
+"""
+Streaming compression of the job output stored by the `run` wrapper (`--output-compress`).
+
+Output is compressed incrementally as it is written. At flush points (once per flush interval when data were written
+since the last one, also when the output pauses) all data written so far are flushed from the compressor to the file,
+so the output stays readable by standard tools (`zcat`, `zstdcat`, `lz4cat`) while the job is running:
+    gzip: zlib sync flush (a reader reports an unexpected end of the stream, but outputs all flushed data)
+    zstd: end of the zstd block (requires the `zstandard` package)
+    lz4:  end of the lz4 frame, the next data start a new frame (requires the `lz4` package)
+
+Captured output lines are stored as JSON lines of the output line records (message, ordinal, stream, parsed fields...)
+in the output directory of the environment (see `rawoutput.output_path`), a compressed copy next to the output file
+of the node file storage. Raw output (see `rawoutput`) is stored as it is, only compressed.
+"""
+import dataclasses
+import json
+import threading
+import zlib
+
+from runtools.runcore.err import RuntoolsException
+
+from runtools.runcli.output import COMPRESS_GZIP, COMPRESS_ZSTD, COMPRESS_LZ4, COMPRESS_FORMATS
+
+SUFFIXES = {
+    COMPRESS_GZIP: '.gz',
+    COMPRESS_ZSTD: '.zst',
+    COMPRESS_LZ4: '.lz4',
+}
+
+DEF_FLUSH_INTERVAL = 1.0
+
+
+class _GzipCompressor:
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # 16+: gzip header and trailer
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _ZstdCompressor:
+
+    def __init__(self):
+        try:
+            import zstandard
+        except ImportError:
+            raise CompressionUnavailableError("zstd output compression requires the `zstandard` package")
+        self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(self._flush_block)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _Lz4Compressor:
+
+    def __init__(self):
+        try:
+            import lz4.frame
+        except ImportError:
+            raise CompressionUnavailableError("lz4 output compression requires the `lz4` package")
+        self._compressor = lz4.frame.LZ4FrameCompressor()
+        self._in_frame = False
+
+    def compress(self, data):
+        if self._in_frame:
+            return self._compressor.compress(data)
+        self._in_frame = True
+        return self._compressor.begin() + self._compressor.compress(data)
+
+    def flush(self):
+        if not self._in_frame:
+            return b''
+        self._in_frame = False
+        return self._compressor.flush()  # Ends the frame, concatenated frames are decompressed as one stream
+
+    def finish(self):
+        return self.flush()
+
+
+_COMPRESSORS = {
+    COMPRESS_GZIP: _GzipCompressor,
+    COMPRESS_ZSTD: _ZstdCompressor,
+    COMPRESS_LZ4: _Lz4Compressor,
+}
+
+
+def create_compressor(compression):
+    """
+    Raises:
+        ValueError: for unknown compression format
+        CompressionUnavailableError: when the library required by the format is not installed
+    """
+    try:
+        return _COMPRESSORS[compression]()
+    except KeyError:
+        raise ValueError(f"Unknown compression format: {compression} (choose from {', '.join(COMPRESS_FORMATS)})")
+
+
+class CompressedWriter:
+    """
+    Binary writer compressing written data into a file, safe to be used from multiple threads. The compressor is flushed
+    to the file by a background thread every `flush_interval` seconds when data were written since the last flush
+    point, the rest is written on `close`.
+    """
+
+    def __init__(self, path, compression, flush_interval=DEF_FLUSH_INTERVAL):
+        self._compressor = create_compressor(compression)
+        self._file = open(path, 'ab', buffering=0)
+        self.flush_interval = flush_interval
+        self._unflushed = False
+        self._lock = threading.Lock()
+        self._closing = threading.Event()
+        self._flusher = threading.Thread(target=self._run_flusher, name='output-flusher', daemon=True)
+        self._flusher.start()
+
+    def write(self, data):
+        with self._lock:
+            if compressed := self._compressor.compress(data):
+                self._file.write(compressed)
+            self._unflushed = True
+
+    def flush(self):
+        with self._lock:
+            if self._unflushed and not self._file.closed:
+                self._file.write(self._compressor.flush())
+                self._unflushed = False
+
+    def _run_flusher(self):
+        while not self._closing.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        self._closing.set()
+        self._flusher.join()
+        with self._lock:
+            if self._file.closed:
+                return
+            try:
+                self._file.write(self._compressor.finish())
+            finally:
+                self._file.close()
+
+
+def open_output(path, compression=None, flush_interval=DEF_FLUSH_INTERVAL):
+    """Open the output file for binary writing, compressed by the given format if specified."""
+    if not compression:
+        return open(path, 'ab', buffering=0)
+    return CompressedWriter(path, compression, flush_interval)
+
+
+class CompressedOutputWriter:
+    """
+    Output processor storing the captured output lines as JSON lines into a compressed file. All attributes
+    of the line with a value are stored. Lines are returned unchanged.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def __call__(self, output_line):
+        record = {f.name: v for f in dataclasses.fields(output_line) if (v := getattr(output_line, f.name)) is not None}
+        self.writer.write(json.dumps(record, default=str, ensure_ascii=False).encode() + b'\n')
+        return output_line
+
+    def close(self):
+        self.writer.close()
+
+
+class CompressionUnavailableError(RuntoolsException):
+    pass
@@ -0,0 +1,279 @@
+"""
+Local runner daemon and its thin client.
+
+The daemon is a long-lived process listening on a Unix socket (one per user and environment). It has all modules
+required for running jobs already imported, so a job submitted by the client is executed by a worker forked from
+the daemon without paying for the interpreter start and imports again.
+
+The client (`run job --daemon ...`) sends the command line arguments, environment variables and working directory
+to the daemon together with its stdin, stdout and stderr file descriptors (using `SCM_RIGHTS`). The forked worker
+takes over these descriptors, runs the job exactly like `run job` would and sends back the exit code, which
+the client uses as its own exit code. Signals SIGTERM and SIGINT received by the client are forwarded to the worker.
+The configuration files are loaded once by the daemon, a worker only checks that they have not changed (see `cfg`).
+The number of workers is not limited, each job is limited by its own options (e.g. `--max-concurrent`).
+
+Protocol (all integers are unsigned, network byte order):
+    client -> daemon: header `!I` (length of the JSON payload) + stdio fds, then the JSON payload
+    client -> daemon: `!I` signal number for each forwarded signal
+    daemon -> client: `!I` exit code of the job
+
+Both sides trust only the processes of the same user: the socket directory must be owned by the user and not
+accessible by others (it is in `/tmp` when `XDG_RUNTIME_DIR` is not set), and the peer of each connection is verified
+by its credentials (`SO_PEERCRED`). The client runs the job in its own process when the daemon is not trusted.
+"""
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+
+from runtools.runcore.err import RuntoolsException
+
+from runtools.runcli.runtime import runtime_dir, check_private_dir, InsecureDirectoryError
+
+logger = logging.getLogger(__name__)
+
+_UINT = struct.Struct('!I')
+_PEERCRED = struct.Struct('3i')  # pid, uid, gid
+
+
+def peer_uid(sock):
+    """
+    Returns:
+        User ID of the process on the other side of the connected Unix socket
+    """
+    return _PEERCRED.unpack(sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, _PEERCRED.size))[1]
+
+
+def socket_path(env_id=None):
+    return runtime_dir() / f"runcli-{env_id or 'default'}.sock"
+
+
+def pid_path(env_id=None):
+    return socket_path(env_id).with_suffix('.pid')
+
+
+_worker = False
+
+
+def submit(argv, env_id=None):
+    """
+    Submit a job to the daemon of the given environment and wait for its completion.
+
+    Args:
+        argv: `run` command line arguments of the job (the same which would be used for in-process execution)
+        env_id: environment of the daemon, default environment if not specified
+
+    Returns:
+        Exit code of the job, or None if the job must run in this process because the daemon is not running
+        or this process is already a daemon worker
+    """
+    if _worker:
+        return None
+
+    path = socket_path(env_id)
+    try:
+        check_private_dir(path.parent)
+    except FileNotFoundError:
+        return None
+    except InsecureDirectoryError as e:
+        logger.warning("Daemon not used, socket directory is not private", extra={"reason": str(e)})
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except (FileNotFoundError, ConnectionRefusedError):
+        sock.close()
+        return None
+
+    with sock:
+        if (uid := peer_uid(sock)) != os.getuid():
+            logger.warning("Daemon not used, socket owned by another user", extra={"socket": str(path), "uid": uid})
+            return None
+        payload = json.dumps({"argv": list(argv), "env": dict(os.environ), "cwd": os.getcwd()}).encode()
+        socket.send_fds(sock, [_UINT.pack(len(payload))], [0, 1, 2])
+        sock.sendall(payload)
+
+        def forward(signum, _):
+            sock.sendall(_UINT.pack(signum))
+
+        previous = {signum: signal.signal(signum, forward) for signum in (signal.SIGTERM, signal.SIGINT)}
+        try:
+            exit_code = _recv_exact(sock, _UINT.size)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        return _UINT.unpack(exit_code)[0] if exit_code else 1
+
+
+def _recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+class _JobRequestHandler(socketserver.BaseRequestHandler):
+    """Executed in the forked worker process, one worker per submitted job."""
+
+    def handle(self):
+        global _worker
+        _worker = True
+        self.server.socket.close()
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+        header, fds, _, _ = socket.recv_fds(self.request, _UINT.size, 3)
+        if len(header) < _UINT.size or len(fds) != 3:
+            return
+        payload = _recv_exact(self.request, _UINT.unpack(header)[0])
+        if payload is None:
+            return
+        job_request = json.loads(payload)
+
+        for target_fd, fd in enumerate(fds):
+            os.dup2(fd, target_fd)
+            os.close(fd)
+        os.chdir(job_request['cwd'])
+        os.environ.clear()
+        os.environ.update(job_request['env'])
+
+        threading.Thread(target=self._forward_signals, daemon=True).start()
+        exit_code = self._run(job_request['argv'])
+        # The worker ends by `os._exit` (see `ForkingMixIn`), the exit handlers flushing the logging are not run
+        from runtools.runcli import log
+        log.shutdown()
+        self.request.sendall(_UINT.pack(exit_code))
+
+    def _forward_signals(self):
+        while signum := _recv_exact(self.request, _UINT.size):
+            os.kill(os.getpid(), _UINT.unpack(signum)[0])
+
+    @staticmethod
+    def _run(argv):
+        from runtools.runcli import main
+
+        try:
+            main(argv)
+            exit_code = 0
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except BaseException:
+            logger.exception("Daemon worker failed")
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        return exit_code
+
+
+class _ForkingUnixStreamServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    block_on_close = False  # Running jobs outlive the daemon
+    # Workers of running and queued jobs can be alive for a long time. Reaching the limit (40 by default) would make
+    # `collect_children` block in `waitpid` until a job ends, so no more connections would be accepted. Finished
+    # workers are reaped by the non-blocking `waitpid` of each `collect_children` call.
+    max_children = sys.maxsize
+    request_queue_size = 128  # Listen backlog for bursts of submitted jobs
+
+    def verify_request(self, request, client_address):
+        """Only the processes of the daemon user can submit jobs, checked before a worker is forked."""
+        if (uid := peer_uid(request)) != os.getuid():
+            logger.warning("Connection of another user rejected", extra={"uid": uid})
+            return False
+        return True
+
+
+def serve(env_id=None):
+    """
+    Run the daemon for the given environment until it is stopped by SIGTERM or SIGINT.
+    The workers are forked from the main thread, so the logging of the daemon must not use background threads
+    (see `cmd.daemon`).
+
+    Raises:
+        DaemonAlreadyRunningError: if the daemon of the environment is already running
+        InsecureDirectoryError: if the socket directory is not private to the user
+    """
+    import runtools.runcli.cmd.job  # noqa: F401 Preload everything needed for running jobs in the workers
+    _preload_configuration()
+
+    if is_running(env_id):
+        raise DaemonAlreadyRunningError(env_id)
+
+    runtime_dir(create=True)
+    path = socket_path(env_id)
+    path.unlink(missing_ok=True)
+
+    def shutdown(_, __):
+        raise SystemExit(0)
+
+    with _ForkingUnixStreamServer(str(path), _JobRequestHandler) as server:
+        pid_path(env_id).write_text(str(os.getpid()))
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        logger.info("Daemon started", extra={"env": env_id, "socket": str(path)})
+        try:
+            server.serve_forever()
+        finally:
+            path.unlink(missing_ok=True)
+            pid_path(env_id).unlink(missing_ok=True)
+            logger.info("Daemon stopped", extra={"env": env_id})
+
+
+def _preload_configuration():
+    """
+    Load the runcli configuration files into the in-process config cache (see `cfg`) inherited by the workers.
+    A worker then reads an unchanged configuration by a `stat` call, without reading the cache file or parsing TOML.
+    """
+    from runtools.runcli import cfg
+    from runtools.runcore.paths import ConfigFileNotFoundError
+
+    cfg.read_default_configuration()
+    try:
+        cfg.read_configuration()
+    except ConfigFileNotFoundError:
+        pass
+
+
+def is_running(env_id=None):
+    """Check by the PID file and the socket, without connecting (every connection is served by a forked worker)."""
+    pid = daemon_pid(env_id)
+    if not pid or not socket_path(env_id).exists():
+        return False
+    try:
+        os.kill(pid, 0)
+    except (ProcessLookupError, PermissionError):  # Permission: PID reused by a process of another user
+        return False
+    return True
+
+
+def daemon_pid(env_id=None):
+    try:
+        return int(pid_path(env_id).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def stop(env_id=None):
+    """
+    Returns:
+        True if a running daemon was signalled to stop, False if no daemon was found
+    """
+    if not is_running(env_id):
+        return False
+    os.kill(daemon_pid(env_id), signal.SIGTERM)
+    return True
+
+
+class DaemonAlreadyRunningError(RuntoolsException):
+
+    def __init__(self, env_id):
+        super().__init__(f"Daemon for environment `{env_id or 'default'}` is already running")
+
@@ -0,0 +1,339 @@
+"""
+Event-driven local dispatch of jobs waiting in a concurrency group (`--serial`, `--max-concurrent`).
+
+Jobs of the same concurrency group of an environment executed on this host wait for a free slot in a local queue.
+Waiters are ordered by priority (higher first) and then by arrival. With aging, the effective priority of a waiter
+grows by one level per aging interval of waiting, so low priority jobs are not starved. Instead of re-checking
+the group state periodically, each waiter blocks on its own Unix datagram socket and a job leaving its slot sends
+a notification directly to the next waiter in the queue order. The local queue is opt-in (`--local-dispatch`) and
+replaces the execution queue phase of the instance (`ExecutionQueue`), so all jobs of a group must use it and run
+on this host: the local queue does not see jobs of other hosts or jobs dispatched by the execution queue.
+
+The group state is kept in the `queue/<env>/<group>` subdirectory of the runtime directory (see `runtime`):
+    lock                                exclusive `flock` guarding all state changes, contains the ticket counter
+    waiting/<ticket>.sock               socket of a waiting job
+    running/<ticket>                    marker of a job holding a slot
+where the ticket name `<seq>.<pid>.<priority>.<enqueued ms>.<aging ms>` carries everything needed for ordering.
+Entries of dead processes are removed by the next state change, a waiter re-checks the state after
+`RECHECK_INTERVAL` even without notification, so a crashed job cannot block the queue.
+"""
+import errno
+import fcntl
+import logging
+import os
+import re
+import socket
+import struct
+import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from runtools.runcli.runtime import runtime_dir
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DIR_NAME = 'queue'
+RECHECK_INTERVAL = 5.0
+
+_WAITING = 'waiting'
+_RUNNING = 'running'
+_SOCK_SUFFIX = '.sock'
+_NOTIFICATION = struct.Struct('<d')  # Wall clock time of the notification
+_MAX_ENV_DIR_NAME = 16  # Both limits keep the socket paths under the Unix socket path limit
+_MAX_GROUP_DIR_NAME = 32
+
+
+def _dir_name(name, max_length):
+    dir_name = re.sub(r'[^\w.@-]+', '_', name)
+    if len(dir_name) > max_length:
+        dir_name = f"{dir_name[:max_length - 9]}-{zlib.crc32(name.encode()):08x}"
+    return dir_name
+
+
+def _env_queues_dir(env_id=None, create=False):
+    return runtime_dir(create) / QUEUE_DIR_NAME / _dir_name(env_id or 'default', _MAX_ENV_DIR_NAME)
+
+
+def queue_dir(group, env_id=None, create=False):
+    """
+    Args:
+        group: concurrency group
+        env_id: environment of the jobs, the default environment if not specified
+        create: create the private runtime directory if it does not exist (see `runtime.runtime_dir`)
+    """
+    return _env_queues_dir(env_id, create) / _dir_name(group, _MAX_GROUP_DIR_NAME)
+
+
+def list_groups(env_id=None):
+    """
+    Returns:
+        Directories of the local queues of all concurrency groups of the environment
+    """
+    root = _env_queues_dir(env_id)
+    return sorted(p for p in root.iterdir() if p.is_dir()) if root.exists() else []
+
+
+@dataclass(frozen=True)
+class QueueEntry:
+    """A job waiting in the local queue or holding a slot, parsed from its ticket name."""
+    name: str
+    seq: int
+    pid: int
+    priority: int
+    enqueued: float  # Wall clock time
+    aging: float  # Seconds of waiting per one priority level, 0 for no aging
+
+    @classmethod
+    def parse(cls, name):
+        seq, pid, priority, enqueued_ms, aging_ms = name.split('.')
+        return cls(name, int(seq), int(pid), int(priority), int(enqueued_ms) / 1000, int(aging_ms) / 1000)
+
+    @classmethod
+    def create(cls, seq, priority=0, aging=0.0):
+        enqueued_ms, aging_ms = int(time.time() * 1000), int((aging or 0) * 1000)
+        return cls.parse(f"{seq}.{os.getpid()}.{priority}.{enqueued_ms}.{aging_ms}")
+
+    def effective_priority(self, now):
+        if not self.aging:
+            return self.priority
+        return self.priority + max(0.0, now - self.enqueued) / self.aging
+
+    def order_key(self, now):
+        return -self.effective_priority(now), self.seq
+
+
+@dataclass
+class Ticket:
+    """
+    Position of a job in the local queue.
+
+    Attributes:
+        name: ticket name identifying the job in the queue
+        wait_time: seconds from entering the queue to the admission
+        dispatch_latency: seconds from the notification by the releasing job to the admission,
+            `None` when admitted without notification (a slot was free or found free by a re-check)
+    """
+    name: str
+    wait_time: float = 0.0
+    dispatch_latency: float = None
+
+
+class LocalDispatcher:
+    """
+    Local queue of a concurrency group. While waiting, `on_waiting` (if set) is called with the position
+    in the queue (1 = next to be admitted) and the effective priority level whenever one of them changes.
+    """
+
+    def __init__(self, group, max_concurrent=1, *, env_id=None, priority=0, aging=None, directory=None,
+                 recheck_interval=RECHECK_INTERVAL, on_waiting=None):
+        if max_concurrent < 1:
+            raise ValueError("Max concurrent must be at least 1")
+        if aging is not None and aging < 0:
+            raise ValueError("Priority aging interval must not be negative")
+        self.group = group
+        self.max_concurrent = max_concurrent
+        self.priority = priority
+        self.aging = aging
+        self.directory = Path(directory) if directory else queue_dir(group, env_id, create=True)
+        self.recheck_interval = recheck_interval
+        self.on_waiting = on_waiting
+        self.position = None  # Position in the queue while waiting (1 = next to be admitted)
+        self.effective_priority = priority  # Priority level including aging while waiting
+        self._interrupted = False
+        self._sock_path = None
+        (self.directory / _WAITING).mkdir(parents=True, exist_ok=True, mode=0o700)
+        (self.directory / _RUNNING).mkdir(exist_ok=True, mode=0o700)
+
+    def _locked(self):
+        return _locked(self.directory)
+
+    def acquire(self, timeout=None):
+        """
+        Enter the queue and wait until a slot of the group is free and this job is the first waiter (by priority
+        and arrival).
+
+        Args:
+            timeout: maximum waiting time in seconds
+
+        Returns:
+            Admitted `Ticket` to be passed to `release`, or `None` when the waiting was interrupted or timed out
+        """
+        entered = time.monotonic()
+        deadline = None if timeout is None else entered + timeout
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            with self._locked() as lock_file:
+                name = QueueEntry.create(_next_seq(lock_file), self.priority, self.aging).name
+                self._sock_path = self.directory / _WAITING / f"{name}{_SOCK_SUFFIX}"
+                sock.bind(str(self._sock_path))
+            admitted = False
+            try:
+                notified_at = None
+                reported = None
+                while not self._interrupted:
+                    with self._locked():
+                        if admitted := self._admit(name):
+                            break
+                    if self.position and (self.position, self.effective_priority) != reported:
+                        if reported is None:
+                            logger.debug("Waiting in local queue", extra={
+                                "group": self.group, "ticket": name, "priority": self.priority,
+                                "position": self.position})
+                        reported = self.position, self.effective_priority
+                        if self.on_waiting:
+                            self.on_waiting(self.position, self.effective_priority)
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    notified_at = self._wait_for_notification(sock, remaining)
+            finally:
+                self._sock_path.unlink(missing_ok=True)
+                self._sock_path = None
+                if not admitted:
+                    with self._locked():
+                        # Do not swallow a notification meant for this waiter
+                        self._notify(e.name for e in self._live_entries(_WAITING))
+        finally:
+            sock.close()
+
+        if not admitted:
+            logger.debug("Local queue waiting ended without admission", extra={
+                "group": self.group, "ticket": name, "interrupted": self._interrupted})
+            return None
+
+        ticket = Ticket(name, time.monotonic() - entered)
+        if notified_at is not None:
+            ticket.dispatch_latency = max(0.0, time.time() - notified_at)
+        logger.debug("Local queue slot acquired", extra={
+            "group": self.group, "ticket": name, "priority": self.priority, "wait_time": ticket.wait_time,
+            "dispatch_latency": ticket.dispatch_latency})
+        return ticket
+
+    def _wait_for_notification(self, sock, timeout=None):
+        sock.settimeout(self.recheck_interval if timeout is None else min(self.recheck_interval, timeout))
+        try:
+            return _NOTIFICATION.unpack(sock.recv(_NOTIFICATION.size))[0]
+        except (socket.timeout, struct.error):
+            return None
+
+    def _admit(self, name):
+        """Must be called under the lock."""
+        running = self._live_entries(_RUNNING)
+        entries = self._live_entries(_WAITING)
+        waiting = [e.name for e in entries]
+        self.position = waiting.index(name) + 1 if name in waiting else None
+        if self.position:
+            self.effective_priority = int(entries[self.position - 1].effective_priority(time.time()))
+        if len(running) >= self.max_concurrent:
+            return False
+        if waiting and waiting[0] != name:
+            self._notify(waiting[:1])  # Free slot, but the head has changed (e.g. by aging) since the notification
+            return False
+        (self.directory / _RUNNING / name).touch()
+        if len(running) + 1 < self.max_concurrent and len(waiting) > 1:
+            self._notify(waiting[1:])  # Free slots left, pass the dispatch on
+        return True
+
+    @property
+    def interrupted(self):
+        return self._interrupted
+
+    def interrupt(self):
+        """Stop waiting in `acquire` (can be called from a signal handler or another thread)."""
+        self._interrupted = True
+        if sock_path := self._sock_path:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+                try:
+                    sock.sendto(_NOTIFICATION.pack(time.time()), str(sock_path))
+                except OSError:
+                    pass
+
+    def release(self, ticket):
+        if ticket is None:
+            return
+        with self._locked():
+            (self.directory / _RUNNING / ticket.name).unlink(missing_ok=True)
+            self._notify(e.name for e in self._live_entries(_WAITING))
+
+    @contextmanager
+    def slot(self, timeout=None):
+        """Context manager holding a slot of the group, the ticket is `None` when not admitted (see `acquire`)."""
+        ticket = self.acquire(timeout)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def _notify(self, waiting):
+        """Notify the first reachable waiter, must be called under the lock."""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            for name in waiting:
+                sock_path = self.directory / _WAITING / f"{name}{_SOCK_SUFFIX}"
+                try:
+                    sock.sendto(_NOTIFICATION.pack(time.time()), str(sock_path))
+                    return
+                except OSError as e:
+                    if e.errno == errno.EAGAIN:
+                        return  # Notifications already pending in the waiter socket
+                    sock_path.unlink(missing_ok=True)  # Stale socket
+
+    def _live_entries(self, state):
+        """Entries of live processes in the queue order, entries of dead processes are removed (under the lock)."""
+        return _live_entries(self.directory / state)
+
+
+@contextmanager
+def _locked(directory):
+    with open(directory / 'lock', 'a+') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield lock_file
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _live_entries(directory):
+    entries = []
+    for path in directory.iterdir():
+        try:
+            entry = QueueEntry.parse(path.name.removesuffix(_SOCK_SUFFIX))
+        except ValueError:
+            entry = None  # Unknown or old format
+        if entry and _is_alive(entry.pid):
+            entries.append(entry)
+        else:
+            path.unlink(missing_ok=True)
+    now = time.time()
+    return sorted(entries, key=lambda e: e.order_key(now))
+
+
+def group_status(directory):
+    """
+    Returns:
+        Tuple of (running entries, waiting entries in the queue order) of the local queue in the given directory
+    """
+    with _locked(directory):
+        return _live_entries(directory / _RUNNING), _live_entries(directory / _WAITING)
+
+
+def _next_seq(lock_file):
+    lock_file.seek(0)
+    seq = int(lock_file.read().strip() or 0) + 1
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(str(seq))
+    lock_file.flush()
+    return seq
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
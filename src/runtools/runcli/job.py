@@ -1,20 +1,35 @@
 import logging
 import signal
+import threading
+import time
+from contextlib import ExitStack
 from re import error as PatternError
 
 from runtools.runcore.job import DuplicateStrategy
 from runtools.runcore.run import StopReason
+from runtools.runcore.util.parser import KVParser
 from runtools.runjob import node
 from runtools.runjob.coord import MutualExclusionPhase, CheckpointPhase, ExecutionQueue, ConcurrencyGroup
 from runtools.runjob.phase import TimeoutExtension, SequentialPhase
+from runtools.runjob.output import OutputParser
 from runtools.runjob.program import ProgramPhase
-from runtools.runjob.warning import TimeWarningExtension, OutputWarningExtension
+from runtools.runjob.warning import TimeWarningExtension
+
+from runtools.runcli import log, tracing
+from runtools.runcli.admission import AdmissionWaiter
+from runtools.runcli.resources import ResourceMonitor, OutputCounter
+from runtools.runcli.output import OutputPrefilter, StatusCoalescer, OutputWarningDetector, OutputWarningMatcher, \
+    PARSE_FORMATS, OUTPUT_MODE_LINES, OUTPUT_MODE_RAW
 
 logger = logging.getLogger(__name__)
 
+CACHED_PHASE_ID = 'CACHED'
+
 
+@log.timing('job_run', args_idx=(0,))
 def run(job_id, run_id, env_id, program_args, *,
         bypass_output=False,
+        output_mode=OUTPUT_MODE_LINES,
         disable_output=(),
         excl=False,
         excl_group=None,
@@ -26,30 +41,327 @@ def run(job_id, run_id, env_id, program_args, *,
         timeout_signal=None,
         time_warning=None,
         output_warning=(),
+        output_warning_literal=(),
         output_processors=(),
         tail_buffer_size=None,
+        tail_buffer_mmap=False,
+        output_compress=None,
+        output_compress_flush_interval=None,
+        local_dispatch=False,
+        priority=0,
+        priority_aging=None,
+        admission=None,
+        memo=None,
+        shards=0,
+        resource_sample_interval=None,
+        resource_summary=False,
+        cgroup_limits=None,
+        cgroup_root=None,
+        cpus=None,
+        nice=None,
+        ionice=None,
+        numa_node=None,
+        metrics_dir=None,
+        metrics_socket=None,
         duplicate_strategy=DuplicateStrategy.DISALLOW,
         ):
-    root_phase = create_root_phase(job_id, program_args, bypass_output, excl, excl_group, checkpoint_id, serial,
-                                   max_concurrent, concurrency_group, timeout, time_warning, output_warning)
+    """
+    Returns:
+        `CachedResult` when the job was not executed because of a cached result (see `memo`), None when the instance
+        was stopped before it was run (e.g. timed out in the local queue), otherwise `ResourceUsage` of the executed
+        program (see `resources`)
+    """
+    if memo and (cached := memo.cached_result()):
+        with node.connect(env_id, disable_output=disable_output, tail_buffer_size=tail_buffer_size) as env_node:
+            run_cached(env_node, job_id, run_id, cached, duplicate_strategy)
+        return cached
+
+    raw_output = output_mode == OUTPUT_MODE_RAW
+    if raw_output:
+        # Program output is not captured by the program phase, but pumped by `RawOutputPump` (no line processing)
+        bypass_output, output_warning, output_warning_literal, output_processors = True, (), (), ()
+
+    output_counter = OutputCounter() if raw_output or not bypass_output else None
+    if output_counter and not raw_output:
+        output_processors = add_output_counter(output_processors, output_counter)
+    warning_detector = create_output_warning_detector(output_warning, output_warning_literal)
+    if warning_detector:
+        output_processors = tuple(output_processors) + (warning_detector,)
+    metrics = None
+    if metrics_dir or metrics_socket:
+        from runtools.runcli.metrics import RunMetrics
+        group = (concurrency_group or job_id) if serial or max_concurrent else None
+        metrics = RunMetrics(job_id, group, textfile_dir=metrics_dir, output_counter=output_counter,
+                             warning_detector=warning_detector, time_warning=time_warning)
+
+    local_queue = local_dispatch and (serial or max_concurrent)
+    waits_before_run = bool(admission) or local_queue  # The timeout is then armed by the wrapper, see `arm_timeout`
+    with ExitStack() as stack:
+        cgroup = None
+        if cgroup_limits:
+            from runtools.runcli.cgroup import create_cgroup
+            if cgroup := create_cgroup(job_id, run_id, cgroup_limits, cgroup_root):
+                stack.callback(cgroup.remove)
+        with tracing.span('create_root_phase'):
+            root_phase = create_root_phase(
+                job_id, program_args, bypass_output, excl, excl_group, checkpoint_id, serial, max_concurrent,
+                concurrency_group, 0.0 if waits_before_run else timeout, time_warning, shards=shards,
+                local_queue=local_queue, launch=create_launch_options(job_id, cgroup, cpus, nice, ionice, numa_node, max_concurrent,
+                                             concurrency_group, env_id))
+
+        mmap_tail_buffer = None
+        if tail_buffer_mmap:
+            mmap_tail_buffer = _create_mmap_tail_buffer(job_id, run_id, tail_buffer_size)
+            stack.callback(mmap_tail_buffer.close)
+            if not raw_output:
+                from runtools.runcli.tailbuffer import TailBufferWriter
+                output_processors = tuple(output_processors) + (TailBufferWriter(mmap_tail_buffer),)
+        if output_compress and not raw_output and not {'file', 'all'} & set(disable_output):
+            # The file storage of the node cannot compress, the compressed copy is written next to its output file,
+            # which stays the source of the output readers
+            compressed_writer = _create_compressed_output_writer(
+                env_id, job_id, run_id, output_compress, output_compress_flush_interval)
+            stack.callback(compressed_writer.close)
+            output_processors = tuple(output_processors) + (compressed_writer,)
+        with tracing.span('node_connect', env=env_id):
+            env_node = stack.enter_context(
+                node.connect(env_id, disable_output=disable_output, tail_buffer_size=tail_buffer_size))
+        with tracing.span('create_instance', job=job_id):
+            inst = env_node.create_instance(
+                job_id, run_id, root_phase, output_processors=output_processors, duplicate_strategy=duplicate_strategy)
+        if coalescer := status_coalescer(output_processors):
+            stack.callback(coalescer.close)  # Pending status fields emitted at the end of the instance
+            coalescer.sink = status_sink(inst)
+        if warning_detector:
+            warning_detector.on_warning = output_warning_sink(inst)
+        sig = _set_signal_handlers(inst, timeout_signal)
+        if metrics and metrics_socket:
+            from runtools.runcli.metrics import MetricsServer
+            stack.callback(MetricsServer(metrics_socket, metrics).start().stop)
+        if (priority or priority_aging) and not local_queue:
+            logger.warning("Priority is applied only by the local queue, which is not used for this job",
+                           extra={"job": job_id, "priority": priority})
+        deadline = arm_timeout(stack, inst, timeout) if timeout and waits_before_run else None
+        if admission and not wait_for_admission(
+                inst, sig.interrupts, admission, job_id, remaining_time(deadline), metrics):
+            return None
+        if local_queue:
+            dispatcher = create_local_dispatcher(
+                job_id, max_concurrent, concurrency_group, priority, priority_aging, env_id=env_id,
+                on_waiting=queued_status(inst, concurrency_group or job_id))
+            if not wait_in_local_queue(
+                    stack, inst, sig.interrupts, dispatcher, job_id, remaining_time(deadline), metrics):
+                return None
+        if metrics:
+            stack.enter_context(metrics)  # Exits after the resource monitor, the metrics include the usage
+        monitor = stack.enter_context(ResourceMonitor(
+            job_id, run_id, sample_interval=resource_sample_interval, output_counter=output_counter, cgroup=cgroup,
+            summary=resource_summary))
+        if metrics:
+            metrics.resource_monitor = monitor
+        if raw_output:
+            stack.enter_context(_raw_output_pump(env_id, job_id, run_id, disable_output, mmap_tail_buffer,
+                                                 output_compress, output_compress_flush_interval, output_counter))
+        with tracing.span('instance_run', job=job_id):
+            try:
+                inst.run()
+            finally:
+                log.flush()  # Queued records of the run written in the main thread, not in the signal handlers
+        if memo:
+            memo.store(inst.run_id)  # Not reached when the run failed (`JobCompletionError`)
+    return monitor.usage
+
+
+def arm_timeout(stack, inst, timeout):
+    """
+    Stop the instance with `TIMEOUT` when the timeout elapses, counted from now until the stack exits. Used instead
+    of the timeout extension of the root phase when the wrapper waits before running the instance (admission, local
+    queue), so the timeout covers the waiting and the run together, as it covers the execution queue phase.
+
+    Returns:
+        Deadline (`time.monotonic()`) to be passed to `remaining_time`
+    """
+    timer = threading.Timer(timeout, inst.stop, (StopReason.TIMEOUT,))
+    timer.daemon = True
+    timer.start()
+    stack.callback(timer.cancel)
+    return time.monotonic() + timeout
+
+
+def remaining_time(deadline):
+    """
+    Returns:
+        Seconds remaining to the deadline (at least 0), None when there is no deadline
+    """
+    return None if deadline is None else max(deadline - time.monotonic(), 0.0)
+
+
+def wait_for_admission(inst, interrupts, admission, job_id, timeout, metrics=None):
+    """
+    Wait until the host conditions allow the job to start. The instance is stopped with `TIMEOUT` when the conditions
+    are not met within the timeout (stopped by the signal handler when interrupted by a signal).
+
+    Args:
+        interrupts: List the interrupt of the waiting is appended to (see `Sig.interrupts`)
+        timeout: Maximum waiting time in seconds, None for no limit
+
+    Returns:
+        True when admitted, False when the instance must not be run
+    """
+    waiter = AdmissionWaiter(admission, job_id)
+    interrupts.append(waiter.interrupt)
+    with tracing.span('admission_wait', job=job_id):
+        admitted = waiter.wait(timeout)
+    if metrics:
+        metrics.admission_wait = waiter.wait_time
+    if not admitted:
+        if not waiter.interrupted:
+            inst.stop(StopReason.TIMEOUT)
+        logger.warning("Job not started, stopped while waiting for admission",
+                       extra={"job": job_id, "interrupted": waiter.interrupted})
+    return admitted
+
+
+def wait_in_local_queue(stack, inst, interrupts, dispatcher, job_id, timeout, metrics=None):
+    """
+    Wait for a slot in the local queue, the slot is held until the stack exits. The waiting is limited by the timeout,
+    the instance is then stopped with `TIMEOUT` (stopped by the signal handler when interrupted by a signal).
+
+    Args:
+        interrupts: List the interrupt of the waiting is appended to (see `Sig.interrupts`)
+        timeout: Maximum waiting time in seconds, None for no limit
+
+    Returns:
+        True when admitted, False when the instance must not be run
+    """
+    interrupts.append(dispatcher.interrupt)
+    with tracing.span('local_queue_wait', group=dispatcher.group):
+        ticket = stack.enter_context(dispatcher.slot(timeout))
+    if not ticket:
+        if not dispatcher.interrupted:
+            inst.stop(StopReason.TIMEOUT)
+        logger.warning("Job not started, stopped while waiting in the local queue",
+                       extra={"job": job_id, "group": dispatcher.group, "interrupted": dispatcher.interrupted})
+        return False
+    if metrics:
+        metrics.queue_wait = ticket.wait_time
+    return True
+
+
+def create_launch_options(job_id, cgroup=None, cpus=None, nice=None, ionice=None, numa_node=None, max_concurrent=0,
+                          concurrency_group=None, env_id=None):
+    """
+    Returns:
+        `LaunchOptions` of the program, None when no option is set. With `cpus` set to `auto`, the program takes
+        one of the CPU slots of its concurrency group (one slot per concurrently running job of the group).
+    """
+    if not (cgroup or cpus or nice is not None or ionice or numa_node is not None):
+        return None
+    from runtools.runcli.launch import LaunchOptions, CPUS_AUTO
+
+    options = LaunchOptions(cgroup=cgroup and cgroup.path, nice=nice, ionice=ionice, numa_node=numa_node)
+    if cpus == CPUS_AUTO:
+        from runtools.runcli.dispatch import queue_dir
+        options.cpu_slot_dir = queue_dir(concurrency_group or job_id, env_id, create=True) / 'cpus'
+        options.cpu_slots = max_concurrent or 1
+    else:
+        options.cpus = cpus
+    return options
+
+
+def create_local_dispatcher(job_id, max_concurrent, concurrency_group, priority=0, priority_aging=None, *,
+                            env_id=None, on_waiting=None):
+    from runtools.runcli.dispatch import LocalDispatcher
+
+    return LocalDispatcher(concurrency_group or job_id, max_concurrent or 1, env_id=env_id, priority=priority,
+                           aging=priority_aging, on_waiting=on_waiting)
+
+
+def run_cached(env_node, job_id, run_id, cached, duplicate_strategy=DuplicateStrategy.DISALLOW):
+    """
+    Create the instance of a job skipped because of a cached result (see `memo`) and end it without executing
+    the program, so the skipped run is recorded in the history. The instance has only the empty `CACHED` phase
+    and its status shows `event=[cached]` with the run ID and the age of the cached result.
+    """
+    from runtools.runcore.output import OutputLine
+
+    inst = env_node.create_instance(job_id, run_id, SequentialPhase(CACHED_PHASE_ID, []),
+                                    duplicate_strategy=duplicate_strategy)
+    status_sink(inst)(OutputLine(f"Skipped, result of run `{cached.run_id}` cached", 0, fields={
+        'event': 'cached', 'cached_run': cached.run_id, 'age': round(cached.age, 1)}))
+    inst.run()
+    return inst
+
+
+def queued_status(inst, group):
+    """
+    Returns:
+        Callback of `LocalDispatcher` showing the instance as queued in its status (`event=[queued]`), with
+        the concurrency group, the position in the local queue and the effective priority (including aging)
+    """
+    from runtools.runcore.output import OutputLine
+
+    sink = status_sink(inst)
 
-    with node.connect(env_id, disable_output=disable_output, tail_buffer_size=tail_buffer_size) as env_node:
-        inst = env_node.create_instance(
-            job_id, run_id, root_phase, output_processors=output_processors, duplicate_strategy=duplicate_strategy)
-        _set_signal_handlers(inst, timeout_signal)
-        inst.run()
+    def on_waiting(position, priority):
+        sink(OutputLine(f"Waiting in local queue `{group}` at position {position} with priority {priority}", 0,
+                        fields={'event': 'queued', 'group': group, 'position': position, 'priority': priority}))
+
+    return on_waiting
+
+
+def _create_mmap_tail_buffer(job_id, run_id, tail_buffer_size):
+    from runtools.runcli.tailbuffer import MmapTailBuffer, tail_path, DEF_CAPACITY
+
+    path = tail_path(job_id, run_id, create_dir=True)  # Private runtime directory checked
+    logger.debug("Memory-mapped tail buffer", extra={"file": str(path)})
+    return MmapTailBuffer(path, tail_buffer_size or DEF_CAPACITY)
+
+
+def _create_compressed_output_writer(env_id, job_id, run_id, compression, flush_interval):
+    from runtools.runcli.compress import CompressedOutputWriter, CompressedWriter, SUFFIXES, DEF_FLUSH_INTERVAL
+    from runtools.runcli.rawoutput import output_path, LINES_SUFFIX
+
+    path = output_path(env_id, job_id, run_id, LINES_SUFFIX + SUFFIXES[compression])
+    logger.debug("Compressed output file", extra={"file": str(path), "compression": compression})
+    return CompressedOutputWriter(CompressedWriter(path, compression, flush_interval or DEF_FLUSH_INTERVAL))
+
+
+def _raw_output_pump(env_id, job_id, run_id, disable_output, tail_buffer=None, compression=None, flush_interval=None,
+                     counter=None):
+    from runtools.runcli.compress import SUFFIXES, DEF_FLUSH_INTERVAL
+    from runtools.runcli.rawoutput import RawOutputPump, output_path, RAW_SUFFIX
+
+    output_file = None
+    if not {'file', 'all'} & set(disable_output):
+        output_file = output_path(env_id, job_id, run_id, RAW_SUFFIX + (SUFFIXES[compression] if compression else ''))
+        logger.debug("Raw output file", extra={"file": str(output_file), "compression": compression})
+    return RawOutputPump(output_file, tail_buffer, compression=compression,
+                         flush_interval=flush_interval or DEF_FLUSH_INTERVAL, counter=counter)
 
 
 def create_root_phase(job_id, program_args, bypass_output, excl, excl_group, checkpoint_id, serial, max_concurrent,
-                      concurrency_group, timeout, time_warning, output_warning):
-    """Build the root phase tree from CLI arguments."""
+                      concurrency_group, timeout, time_warning, *, shards=0, launch=None, local_queue=False):
+    """
+    Build the root phase tree from CLI arguments. With `shards`, the program phase executes the program
+    in the given number of parallel shards (see `shard`). With `launch` options (cgroup, CPU affinity...),
+    the program is executed by the launcher applying them (see `launch`). With `local_queue`, the concurrency
+    of serial and max concurrent jobs is limited by the local queue (see `dispatch`) instead of the execution queue
+    (opt-in, the local queue limits only the jobs using it on this host).
+    """
     if serial and max_concurrent:
         raise ValueError("Either `serial` or `max_concurrent` can be set")
 
+    if shards:
+        from runtools.runcli.shard import launcher_args
+        program_args = launcher_args(program_args, shards)
+    if launch:
+        from runtools.runcli.launch import launcher_args as launch_args
+        program_args = launch_args(program_args, launch)
     phase = ProgramPhase('EXEC', *program_args, read_output=not bypass_output)
     if excl or excl_group:
         phase = MutualExclusionPhase('MUTEX_GUARD', phase, exclusion_group=excl_group)
-    if serial or max_concurrent:
+    if (serial or max_concurrent) and not local_queue:
         phase = ExecutionQueue(
             'QUEUE', ConcurrencyGroup(concurrency_group or job_id, max_concurrent or 1), phase)
 
@@ -61,27 +373,103 @@ def create_root_phase(job_id, program_args, bypass_output, excl, excl_group, che
         phase = TimeoutExtension(phase, timeout)
     if time_warning:
         phase = TimeWarningExtension(phase, time_warning)
-    if output_warning:
-        try:
-            phase = OutputWarningExtension(phase, output_warning)
-        except PatternError as e:
-            logger.warning("Invalid output warning pattern", extra={"detail": str(e)})
 
     return phase
 
 
+def create_output_warning_detector(output_warning, output_warning_literal=()):
+    """
+    Output warnings are detected by an output processor reporting the pattern which matched (see `output_warning_sink`)
+    instead of the warning extension of `runjob`, which searches every line by every pattern.
+
+    Returns:
+        `OutputWarningDetector` of the patterns and literals, None when none is set or a pattern is invalid
+    """
+    if not (output_warning or output_warning_literal):
+        return None
+    try:
+        return OutputWarningDetector(OutputWarningMatcher(output_warning, output_warning_literal))
+    except PatternError as e:
+        logger.warning("Invalid output warning pattern", extra={"detail": str(e)})
+        return None
+
+
+def output_warning_sink(inst):
+    """Output warnings detected by `OutputWarningDetector` are added to the status of the instance."""
+
+    def warn(pattern, _):
+        inst.status_tracker.warning(f"Output matches `{pattern}`")
+
+    return warn
+
+
+def create_output_processors(parse=True, kv_aliases=None, *, parse_prefilter=None, parse_marker=None,
+                             status_interval=None):
+    """
+    Create output processors with smart parsing (JSON, log patterns, key-value) unless parsing is disabled.
+    When prefilter formats or a marker are specified, only the lines passing `OutputPrefilter` are parsed
+    (for all the formats, the prefilter only skips the lines which cannot contain any of the selected ones).
+    When status interval is specified, status updates from the parsed fields are coalesced by `StatusCoalescer`.
+    """
+    if not parse:
+        return ()
+    parser = OutputParser(kv_parser=KVParser(aliases=kv_aliases or None))
+    if parse_prefilter or parse_marker:
+        parser = OutputPrefilter(parser, parse_prefilter or PARSE_FORMATS, parse_marker)
+    if status_interval:
+        return parser, StatusCoalescer(status_interval)
+    return (parser,)
+
+
+def add_output_counter(output_processors, output_counter):
+    """Insert the counter before the status coalescer (if any), which removes the withheld fields from the lines."""
+    processors = list(output_processors)
+    index = next((i for i, p in enumerate(processors) if isinstance(_unwrap(p), StatusCoalescer)), len(processors))
+    processors.insert(index, output_counter)
+    return tuple(processors)
+
+
+def status_coalescer(output_processors):
+    """
+    Returns:
+        `StatusCoalescer` among the output processors (also when traced), None if status updates are not coalesced
+    """
+    return next((p for p in map(_unwrap, output_processors) if isinstance(p, StatusCoalescer)), None)
+
+
+def _unwrap(processor):
+    return processor.processor if isinstance(processor, tracing.TracedOutputProcessor) else processor
+
+
+def status_sink(inst):
+    """Status fields released by `StatusCoalescer` without a following output line go to the status of the instance."""
+    return inst.status_tracker.new_output
+
+
 class Sig:
+    """
+    Signal handlers stopping the instance. Queued log records are not flushed here: waiting for the logging thread
+    could block the main thread (e.g. when interrupted inside a blocking `queue.put`), they are written after
+    the instance run returns, at the latest by the exit handler of `log`.
+    """
 
     def __init__(self, job_instance):
         self.job_instance = job_instance
+        self.interrupts = []  # Callables interrupting waiting of the wrapper before the instance is run
 
     def terminate(self, _, __):
+        self._interrupt()
         self.job_instance.stop(StopReason.SIGNAL)
 
     def timeout(self, _, __):
         # self.job_instance.task_tracker.warning('timeout')  TODO
+        self._interrupt()
         self.job_instance.stop(StopReason.TIMEOUT)
 
+    def _interrupt(self):
+        for interrupt in self.interrupts:
+            interrupt()
+
 
 def _set_signal_handlers(job_instance, timeout_signal):
     term = Sig(job_instance)
@@ -97,3 +485,5 @@ def _set_signal_handlers(job_instance, timeout_signal):
             raise SystemExit(f"error: invalid signal: {timeout_signal}")
 
         signal.signal(timeout_signal_number, term.timeout)
+
+    return term
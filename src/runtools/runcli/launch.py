@@ -0,0 +1,293 @@
+"""
+Launcher applying process settings to itself and then executing the program in its place
+(`python -m runtools.runcli.launch [OPTIONS] -- PROGRAM [ARG...]`).
+
+The program phase starts the program process itself, so the settings which must be in effect from the first
+instruction of the program (cgroup, CPU affinity, NUMA memory policy, scheduling and I/O priority) are applied
+by this launcher executed by the program phase instead of the program. The launcher replaces itself with
+the program (`exec`), so the PID, the output streams and the exit code are the program's own.
+
+CPU slots (`--cpus auto`) spread the jobs of one concurrency group across distinct CPU sets: the allowed CPUs are
+split into as many contiguous slots as the group runs jobs at the same time, and each started program takes a free
+slot. A slot is held by the file `<slot>.<pid>` in the slot directory of the group and is freed when the process
+ends. The slot is taken when the program is actually starting, i.e. after the job left the queue of the group.
+
+The module itself imports only the standard library. Executed by `python -m`, it is imported after the package
+`runtools.runcli` (its `__init__` imports the command line parser, but neither the runtools core nor the job
+libraries), so the startup of the launcher includes the import of the package.
+"""
+import fcntl
+import os
+import platform
+import sys
+from dataclasses import dataclass
+
+LAUNCHER_MODULE = 'runtools.runcli.launch'
+CPUS_AUTO = 'auto'
+
+IONICE_CLASSES = {'none': 0, 'realtime': 1, 'best-effort': 2, 'idle': 3}
+
+_IOPRIO_CLASS_SHIFT = 13
+_IOPRIO_WHO_PROCESS = 1
+_MPOL_PREFERRED = 1
+# Syscall numbers by machine: (ioprio_set, set_mempolicy)
+_SYSCALLS = {
+    'x86_64': (251, 238),
+    'aarch64': (30, 237),
+    'riscv64': (30, 237),
+    'ppc64le': (273, 261),
+    's390x': (282, 270),
+    'i686': (289, 276),
+    'armv7l': (314, 321),
+}
+_NODE_CPULIST = '/sys/devices/system/node/node{}/cpulist'
+
+
+@dataclass
+class LaunchOptions:
+    """
+    Attributes:
+        cgroup: path of the cgroup the program is executed in
+        cpus: CPUs the program is allowed to run on
+        cpu_slot_dir: directory of the CPU slots of the concurrency group (`--cpus auto`)
+        cpu_slots: number of CPU slots the allowed CPUs are split into
+        nice: niceness increment
+        ionice: tuple of (I/O scheduling class, level)
+        numa_node: NUMA node preferred for memory allocations, the CPUs are restricted to the CPUs of the node
+    """
+    cgroup: str = None
+    cpus: list = None
+    cpu_slot_dir: str = None
+    cpu_slots: int = None
+    nice: int = None
+    ionice: tuple = None
+    numa_node: int = None
+
+    def args(self):
+        """
+        Returns:
+            Command line options of the launcher
+        """
+        options = []
+        if self.cgroup:
+            options += ['--cgroup', str(self.cgroup)]
+        if self.numa_node is not None:
+            options += ['--numa-node', str(self.numa_node)]
+        if self.cpus:
+            options += ['--cpus', format_cpu_list(self.cpus)]
+        if self.cpu_slot_dir:
+            options += ['--cpu-slot-dir', str(self.cpu_slot_dir), '--cpu-slots', str(self.cpu_slots or 1)]
+        if self.nice is not None:
+            options += ['--nice', str(self.nice)]
+        if self.ionice:
+            options += ['--ionice', f"{self.ionice[0]}:{self.ionice[1]}"]
+        return options
+
+
+def launcher_args(program_args, options=None):
+    """
+    Returns:
+        Arguments of the program phase executing the program by the launcher with the given `LaunchOptions`,
+        the program arguments unchanged when no option is specified
+    """
+    launcher_options = options.args() if options else []
+    if not launcher_options:
+        return list(program_args)
+    return [sys.executable, '-m', LAUNCHER_MODULE, *launcher_options, '--', *program_args]
+
+
+def parse_cpu_list(value):
+    """
+    Parse a CPU list in the format of `taskset -c` and `cpulist` files (e.g. `0-3,8,10-11`).
+
+    Raises:
+        ValueError: for invalid list
+    """
+    cpus = set()
+    for part in value.strip().split(','):
+        first, dash, last = part.strip().partition('-')
+        if not first.isdigit() or (dash and not last.isdigit()):
+            raise ValueError(f"invalid CPU list: {value!r}")
+        if last and int(last) < int(first):
+            raise ValueError(f"invalid CPU range: {part!r}")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return sorted(cpus)
+
+
+def format_cpu_list(cpus):
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def parse_ionice(value):
+    """
+    Parse the I/O scheduling class and level in the `CLASS[:LEVEL]` format, class as a name (realtime, best-effort,
+    idle, none) or a number (0-3), level 0 (highest) - 7 (lowest), default 4.
+
+    Returns:
+        Tuple of (class number, level)
+
+    Raises:
+        ValueError: for invalid value
+    """
+    io_class, _, level = value.partition(':')
+    io_class = IONICE_CLASSES.get(io_class.lower(), io_class)
+    try:
+        io_class, level = int(io_class), int(level or 4)
+    except ValueError:
+        raise ValueError(f"invalid I/O priority: {value!r} (CLASS[:LEVEL], CLASS: {', '.join(IONICE_CLASSES)})")
+    if io_class not in IONICE_CLASSES.values() or not 0 <= level <= 7:
+        raise ValueError(f"invalid I/O priority: {value!r} (class 0-3, level 0-7)")
+    return io_class, level
+
+
+def node_cpus(node):
+    """
+    Returns:
+        CPUs of the NUMA node
+
+    Raises:
+        ValueError: when the node does not exist
+    """
+    try:
+        with open(_NODE_CPULIST.format(node)) as f:
+            return parse_cpu_list(f.read())
+    except OSError:
+        raise ValueError(f"NUMA node {node} not found")
+
+
+def take_cpu_slot(slot_dir, slots, cpus):
+    """
+    Take a free CPU slot of the group for this process.
+
+    Args:
+        slot_dir: directory of the slots of the concurrency group
+        slots: number of slots the CPUs are split into
+        cpus: CPUs to split
+
+    Returns:
+        CPUs of the taken slot (the least used slot when none is free)
+    """
+    cpus = sorted(cpus)
+    slots = max(1, min(slots, len(cpus)))
+    os.makedirs(slot_dir, mode=0o700, exist_ok=True)
+    with open(os.path.join(slot_dir, 'lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        used = [0] * slots
+        for name in os.listdir(slot_dir):
+            slot, _, pid = name.partition('.')
+            if not slot.isdigit() or not pid.isdigit():
+                continue
+            if _is_alive(int(pid)) and int(slot) < slots:
+                used[int(slot)] += 1
+            else:
+                os.unlink(os.path.join(slot_dir, name))
+        slot = used.index(min(used))
+        open(os.path.join(slot_dir, f"{slot}.{os.getpid()}"), 'w').close()
+    size, extra = divmod(len(cpus), slots)  # The first `extra` slots get one more CPU
+    start = slot * size + min(slot, extra)
+    return cpus[start:start + size + (slot < extra)]
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _syscall(index, *args):
+    import ctypes
+
+    numbers = _SYSCALLS.get(platform.machine())
+    if not numbers:
+        raise OSError(f"not supported on {platform.machine()}")
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.syscall(numbers[index], *args) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+
+def set_ionice(io_class, level):
+    _syscall(0, _IOPRIO_WHO_PROCESS, 0, (io_class << _IOPRIO_CLASS_SHIFT) | (level if io_class else 0))
+
+
+def set_preferred_node(node):
+    """Prefer memory allocations on the NUMA node (falls back to other nodes when the node is out of memory)."""
+    import ctypes
+
+    if not 0 <= node < 64:
+        raise ValueError(f"NUMA node {node} is out of supported range 0-63")
+    mask = ctypes.c_ulong(1 << node)
+    _syscall(1, _MPOL_PREFERRED, ctypes.byref(mask), ctypes.c_ulong(ctypes.sizeof(mask) * 8 + 1))
+
+
+def _parse_args(argv):
+    options = {}
+    args = list(argv)
+    while args and args[0] != '--':
+        option = args.pop(0)
+        if not option.startswith('--') or not args:
+            raise ValueError(f"invalid option: {option}")
+        options[option[2:]] = args.pop(0)
+    if len(args) < 2:
+        raise ValueError("missing program")
+    return options, args[1:]
+
+
+def _apply(options):
+    """Apply the settings to this process in the order: cgroup, memory policy, CPU affinity, nice, I/O priority."""
+    if cgroup := options.get('cgroup'):
+        with open(os.path.join(cgroup, 'cgroup.procs'), 'w') as f:
+            f.write('0')  # 0: the writing process
+
+    cpus = set(os.sched_getaffinity(0))
+    if 'cpus' in options:
+        cpus = set(parse_cpu_list(options['cpus']))
+    if 'numa-node' in options:
+        node = int(options['numa-node'])
+        cpus &= set(node_cpus(node))
+        if not cpus:
+            raise ValueError(f"no allowed CPU on NUMA node {node}")
+        set_preferred_node(node)
+    if 'cpu-slot-dir' in options:
+        cpus = take_cpu_slot(options['cpu-slot-dir'], int(options.get('cpu-slots', 1)), cpus)
+    if cpus != set(os.sched_getaffinity(0)):
+        os.sched_setaffinity(0, cpus)
+
+    if 'nice' in options:
+        os.nice(int(options['nice']))
+    if 'ionice' in options:
+        set_ionice(*parse_ionice(options['ionice']))
+
+
+def main(argv=None):
+    try:
+        options, program_args = _parse_args(sys.argv[1:] if argv is None else argv)
+    except ValueError as e:
+        print(f"{LAUNCHER_MODULE}: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        _apply(options)
+    except (OSError, ValueError) as e:
+        print(f"{LAUNCHER_MODULE}: cannot apply process settings {options}: {e}", file=sys.stderr)
+        return 126
+
+    try:
+        os.execvp(program_args[0], program_args)
+    except OSError as e:
+        print(f"{LAUNCHER_MODULE}: cannot execute {program_args[0]}: {e}", file=sys.stderr)
+        return 127
+
+
+if __name__ == '__main__':
+    sys.exit(main())
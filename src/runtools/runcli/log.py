@@ -18,9 +18,19 @@ Note:
     https://docs.python.org/3/howto/logging.html#configuring-logging-for-a-library.
 """
 
+import atexit
+import fcntl
+import gzip
 import json
 import logging
+import math
+import os
+import queue
+import re
+import shutil
+import threading
 from datetime import datetime, timezone
+from enum import Enum
 from functools import wraps
 from logging import handlers
 
@@ -30,12 +40,12 @@ import time
 from runtools.runcore import paths
 from runtools.runcore.err import RuntoolsException
 from runtools.runcore.paths import expand_user
-from runtools.runjob.log import RunContextFilter
 
 LOG_FILENAME = 'runcli.log'
 
 runtools_logger = logging.getLogger('runtools')
 runtools_logger.propagate = False
+_logger = logging.getLogger(__name__)
 
 log_timing = False
 
@@ -47,10 +57,80 @@ _LOG_RECORD_BUILTINS = frozenset({
 })
 
 
+_EXTRAS_CACHE_LIMIT = 1024
+_extras_keys_cache = {}
+
+
 def _collect_extras(record) -> dict:
-    """Collect non-builtin fields from a LogRecord (extras + filter-injected context)."""
-    return {k: v for k, v in record.__dict__.items()
-            if k not in _LOG_RECORD_BUILTINS and not k.startswith('_') and v is not None}
+    """Collect non-builtin fields from a LogRecord (extras + filter-injected context).
+
+    Records created by the same call site share the same attribute layout, so the extra field names are resolved
+    once per layout and cached.
+    """
+    record_dict = record.__dict__
+    layout = tuple(record_dict)
+    keys = _extras_keys_cache.get(layout)
+    if keys is None:
+        keys = tuple(k for k in layout if k not in _LOG_RECORD_BUILTINS and not k.startswith('_'))
+        if len(_extras_keys_cache) >= _EXTRAS_CACHE_LIMIT:
+            _extras_keys_cache.clear()
+        _extras_keys_cache[layout] = keys
+    return {k: v for k in keys if (v := record_dict[k]) is not None}
+
+
+_timestamp_second = (None, '')
+
+
+def _format_timestamp(created):
+    """Format the record creation time as ISO 8601 UTC with milliseconds, e.g. ``2025-04-25T10:20:30.123Z``.
+
+    The result is the same as of `datetime.isoformat(timespec='milliseconds')` (including its rounding
+    of the timestamp to microseconds), but the date and time up to seconds is formatted only once per second.
+    """
+    global _timestamp_second
+    frac, second = math.modf(created)
+    micros = round(frac * 1e6)
+    if micros >= 1_000_000:
+        second += 1
+        micros -= 1_000_000
+    cached_second, prefix = _timestamp_second
+    if cached_second != second:
+        prefix = datetime.fromtimestamp(second, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+        _timestamp_second = (second, prefix)
+    return f"{prefix}.{micros // 1000:03d}Z"
+
+
+JSON_STDLIB = 'stdlib'
+JSON_ORJSON = 'orjson'
+
+_stdlib_json_encoder = json.JSONEncoder(default=str, ensure_ascii=False)
+
+
+def _json_dumps_func(backend):
+    """
+    Returns:
+        Function serializing a dict to a JSON string using the backend, or None if the backend is not available
+    """
+    if backend == JSON_STDLIB:
+        return _stdlib_json_encoder.encode
+    if backend == JSON_ORJSON:
+        try:
+            import orjson
+        except ImportError:
+            return None
+
+        def dumps(data):
+            try:
+                return orjson.dumps(data, default=str).decode()
+            except orjson.JSONEncodeError:  # E.g. integers over 64 bits
+                return _stdlib_json_encoder.encode(data)
+
+        return dumps
+    return None
+
+
+def is_json_backend_available(backend):
+    return _json_dumps_func(backend) is not None
 
 
 class PlainFormatter(logging.Formatter):
@@ -71,12 +151,20 @@ class JsonFormatter(logging.Formatter):
 
     Produces one JSON object per line with keys matching the OutputLine JSONL convention:
     ``timestamp``, ``level``, ``logger``, ``message``, plus any extra fields and run context.
+
+    The default `stdlib` JSON backend produces output identical to ``json.dumps(data, default=str,
+    ensure_ascii=False)``. The optional `orjson` backend is faster, but uses compact separators.
     """
 
+    def __init__(self, json_backend=JSON_STDLIB):
+        super().__init__()
+        self._dumps = _json_dumps_func(json_backend)
+        if not self._dumps:
+            raise ValueError(f"JSON backend not available: {json_backend}")
+
     def format(self, record):
-        ts = datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds')
         data = {
-            "timestamp": ts[:-6] + 'Z' if ts.endswith('+00:00') else ts,
+            "timestamp": _format_timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -84,7 +172,9 @@ class JsonFormatter(logging.Formatter):
         data.update(_collect_extras(record))
         if record.exc_info and record.exc_info[1]:
             data["exc"] = self.formatException(record.exc_info)
-        return json.dumps(data, default=str, ensure_ascii=False)
+        elif record.exc_text:  # Exception pre-formatted by `AsyncQueueHandler`
+            data["exc"] = record.exc_text
+        return self._dumps(data)
 
 DEF_LEVEL_STDOUT = 'WARN'
 DEF_LEVEL_FILE = 'DEBUG'
@@ -93,18 +183,438 @@ STDOUT_HANDLER_NAME = 'stdout-handler'
 STDERR_HANDLER_NAME = 'stderr-handler'
 FILE_HANDLER_NAME = 'file-handler'
 
+DEF_QUEUE_SIZE = 10_000
+FLUSH_TIMEOUT = 5.0
+
+DEF_MAX_BYTES = 5_000_000
+DEF_BACKUP_COUNT = 3
+COMPRESS_DELAY = 0.5  # Must exceed `STAT_RECHECK_INTERVAL`, see `SharedRotatingFileHandler`
+STAT_RECHECK_RECORDS = 100
+STAT_RECHECK_INTERVAL = 0.1
+
+DEF_RATE_LIMIT_WINDOW = 60.0
+DEF_RATE_LIMIT_KEYS = ('job', 'instance')
+
+
+class Overflow(Enum):
+    """Policy applied by the async file logging when its queue is full."""
+    BLOCK = 'block'  # Wait for a free slot
+    DROP_DEBUG = 'drop-debug'  # Drop DEBUG (and lower) records, wait for a free slot for the others
+    DROP_OLDEST = 'drop-oldest'  # Discard the oldest queued record
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler with a bounded queue and an overflow policy. The records are only prepared in the logging thread
+    (message merged with its arguments, exception formatted); formatting and writing is done by the listener thread.
+    """
+
+    def __init__(self, record_queue, overflow=Overflow.BLOCK):
+        super().__init__(record_queue)
+        self.overflow = overflow
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if record.exc_info[1]:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.overflow is Overflow.BLOCK:
+            self.queue.put(record)
+            return
+
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+
+        if self.overflow is Overflow.DROP_DEBUG:
+            if record.levelno <= logging.DEBUG:
+                self._count_dropped()
+            else:
+                self.queue.put(record)
+            return
+
+        while True:  # DROP_OLDEST
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self._count_dropped()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                continue
+
+    def _count_dropped(self):
+        with self._dropped_lock:
+            self.dropped += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)  # Bounded queue: wait for a free slot instead of failing
+
+
+class SharedRotatingFileHandler(logging.Handler):
+    """
+    Rotating file handler safe for concurrent use of the log file by multiple processes.
+
+    The file is opened with `O_APPEND` and each record is written by a single `write` call, so records of concurrent
+    processes are appended atomically and never overwrite each other. Rotation is coordinated by an exclusive lock
+    of the `<file>.lock` file: the process which would exceed `max_bytes` takes the lock, reopens the file if it was
+    already rotated by another process, and if still needed renames the file to `<file>.<UTC timestamp>` segment.
+    Other processes detect the rotation by the changed inode of the file path and reopen the file. The path is
+    checked every `STAT_RECHECK_RECORDS` records or `STAT_RECHECK_INTERVAL` seconds, whichever comes first, and
+    before a write which would exceed `max_bytes` by the size estimated from the writes of this process (so the file
+    can exceed the limit by the records written by other processes since the last check).
+    Only the newest `backup_count` segments are kept (also counting `<file>.N` backups of the former rotating
+    handler, which are the oldest), with `backup_count` 0 the file is never rotated. With `compress`, the rotated
+    segment is compressed by gzip in a background thread into `<segment>.gz`, after `COMPRESS_DELAY` allowing
+    processes which have not detected the rotation yet to finish their writes.
+    """
+
+    LOCK_SUFFIX = '.lock'
+
+    def __init__(self, filename, max_bytes=DEF_MAX_BYTES, backup_count=DEF_BACKUP_COUNT, compress=False):
+        super().__init__()
+        self.baseFilename = os.path.abspath(os.fspath(filename))
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self._segment_pattern = re.compile(re.escape(os.path.basename(self.baseFilename)) + r'\.\d{8}T\d{12}')
+        self._legacy_pattern = re.compile(re.escape(os.path.basename(self.baseFilename)) + r'\.(\d+)')
+        self._fd = None
+        self._file_id = None
+        self._size = 0  # Size of the file at the last check plus the records written by this process since
+        self._unchecked = 0  # Records written since the last check
+        self._next_check = 0.0
+        self._compressor = None
+        self._compress_queue = queue.SimpleQueue()
+        self._closing = threading.Event()
+        self._open()
+
+    def _open(self):
+        fd = os.open(self.baseFilename, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC, 0o644)
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = fd
+        stat = os.fstat(fd)
+        self._file_id = (stat.st_dev, stat.st_ino)
+        self._checked(stat)
+        return stat
+
+    def _current_stat(self):
+        """Stat of the open file, reopened when the file was rotated or removed by another process."""
+        try:
+            stat = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            return self._open()
+        if (stat.st_dev, stat.st_ino) != self._file_id:
+            return self._open()
+        self._checked(stat)
+        return stat
+
+    def _checked(self, stat):
+        self._size = stat.st_size
+        self._unchecked = 0
+        self._next_check = time.monotonic() + STAT_RECHECK_INTERVAL
+
+    def _needs_rollover(self, size, length):
+        return self.max_bytes and self.backup_count and size and size + length > self.max_bytes
+
+    def _check_file(self, length):
+        """Check the path for a rotation by another process and rotate the file if the record would exceed the limit."""
+        self._unchecked += 1
+        if (self._unchecked < STAT_RECHECK_RECORDS and time.monotonic() < self._next_check
+                and not self._needs_rollover(self._size, length)):
+            return
+        if self._needs_rollover(self._current_stat().st_size, length):
+            self._rollover(length)
+
+    def emit(self, record):
+        try:
+            data = (self.format(record) + '\n').encode('utf-8', 'backslashreplace')
+            if self._fd is None:
+                self._open()
+            self._check_file(len(data))
+            os.write(self._fd, data)
+            self._size += len(data)
+        except Exception:
+            self.handleError(record)
+
+    def _rollover(self, length):
+        with open(self.baseFilename + self.LOCK_SUFFIX, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)  # Released by closing the file
+            if not self._needs_rollover(self._current_stat().st_size, length):
+                return  # Rotated by another process in the meantime
+            segment = f"{self.baseFilename}.{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}"
+            os.rename(self.baseFilename, segment)
+            self._open()
+            removed = self._remove_old_segments()
+        if self.compress and segment not in removed:
+            self._compress_async(segment)
+
+    def _remove_old_segments(self):
+        directory = os.path.dirname(self.baseFilename)
+        segments = {}  # Segment path -> its files (the segment and its compressed file)
+        order = {}  # Segment path -> sort key from the oldest
+        for name in os.listdir(directory):
+            if match := self._segment_pattern.match(name):
+                if name == match.group() or name == match.group() + '.gz':
+                    segment = os.path.join(directory, match.group())
+                    segments.setdefault(segment, []).append(name)
+                    order[segment] = (1, match.group())  # Timestamps sort by name
+            elif legacy := self._legacy_pattern.fullmatch(name):  # `.1` is the newest of the former backups
+                segment = os.path.join(directory, name)
+                segments[segment] = [name]
+                order[segment] = (0, -int(legacy.group(1)))
+        removed = sorted(segments, key=order.get)[:max(0, len(segments) - self.backup_count)]
+        for segment in removed:
+            for name in segments[segment]:
+                try:
+                    os.unlink(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def _compress_async(self, segment):
+        if not self._compressor:
+            self._compressor = threading.Thread(target=self._run_compressor, name='log-compressor', daemon=True)
+            self._compressor.start()
+        self._compress_queue.put((time.monotonic() + COMPRESS_DELAY, segment))
+
+    def _run_compressor(self):
+        while (item := self._compress_queue.get()) is not None:
+            due, segment = item
+            # Give processes, which checked the file right before the rotation, time to finish their write
+            if (delay := due - time.monotonic()) > 0:
+                self._closing.wait(delay)
+            _compress_segment(segment)
+
+    def close(self):
+        with self.lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+        if self._compressor:
+            self._closing.set()
+            self._compress_queue.put(None)
+            self._compressor.join()
+            self._compressor = None
+        super().close()
+
+
+def _compress_segment(segment):
+    """Compress the rotated log file into `<segment>.gz`, the original file is removed."""
+    tmp = segment + '.gz.tmp'
+    try:
+        source = open(segment, 'rb')
+    except FileNotFoundError:
+        return  # Already removed as an old segment
+    try:
+        with source, gzip.open(tmp, 'wb') as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        os.rename(tmp, segment + '.gz')
+        os.unlink(segment)
+    except OSError as e:
+        _logger.warning("Rotated log file not compressed", extra={"file": segment, "error": str(e)})
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
 
-_run_context_filter = RunContextFilter()
 
+class RateLimitFilter(logging.Filter):
+    """
+    Handler filter suppressing repeated records. Records are identical when they have the same logger, message
+    and values of the key extra fields. At most `burst` identical records pass per `window` seconds, the rest are
+    suppressed. For each suppressed group, a `Log records suppressed` summary record with the suppressed count is
+    emitted when its window ends, by a background thread (started by the first suppressed record), so the summary
+    is not delayed until a later record is logged. Summaries of windows not ended yet are emitted by `flush`
+    (on exit and on reconfiguration of the logging).
+
+    Each handler has its own instance and the summaries are passed only to that handler, not to the logger: a handler
+    gets summaries only of the records suppressed by its own filter.
+    """
 
-def configure(enabled, log_stdout_level=DEF_LEVEL_STDOUT, log_file_level=DEF_LEVEL_FILE, log_file_path=None):
+    SUMMARY_MESSAGE = "Log records suppressed"
+
+    def __init__(self, handler, burst, window=DEF_RATE_LIMIT_WINDOW, keys=DEF_RATE_LIMIT_KEYS):
+        super().__init__()
+        if burst < 1 or window <= 0:
+            raise ValueError("Rate limit burst and window must be positive")
+        self.handler = handler
+        self.burst = burst
+        self.window = window
+        self.keys = tuple(keys)
+        self._groups = {}  # identity -> [window start, count, suppressed]
+        self._next_sweep = time.monotonic() + window
+        self._lock = threading.Condition()
+        self._emitting = threading.local()
+        self._summarizer = None
+        self._stopping = False
+
+    def filter(self, record):
+        if getattr(self._emitting, 'active', False):
+            return True  # Summary record
+
+        now = time.monotonic()
+        identity = self._identity(record)
+        summaries = []
+        with self._lock:
+            group = self._groups.get(identity)
+            if group is None or now - group[0] >= self.window:
+                if group and group[2]:
+                    summaries.append((identity, group[2]))
+                group = self._groups[identity] = [now, 0, 0]
+            group[1] += 1
+            passed = group[1] <= self.burst
+            if not passed:
+                group[2] += 1
+                if group[2] == 1:
+                    self._schedule_summary()
+            if now >= self._next_sweep:
+                summaries += self._sweep(now)
+        if summaries:
+            self._emit_summaries(summaries)
+        return passed
+
+    def _identity(self, record):
+        message = record.getMessage() if record.args else record.msg
+        values = []
+        for key in self.keys:
+            value = getattr(record, key, None)
+            try:
+                hash(value)
+            except TypeError:
+                value = str(value)
+            values.append(value)
+        return record.name, message, tuple(values)
+
+    def _sweep(self, now, all_groups=False):
+        """Remove ended windows, must be called under the lock. Returns summaries of the removed groups."""
+        self._next_sweep = now + self.window
+        summaries = []
+        for identity, (start, _, suppressed) in list(self._groups.items()):
+            if all_groups or now - start >= self.window:
+                del self._groups[identity]
+                if suppressed:
+                    summaries.append((identity, suppressed))
+        return summaries
+
+    def _schedule_summary(self):
+        """A group has the first suppressed record in its window, must be called under the lock."""
+        if self._summarizer and self._summarizer.is_alive():  # Not alive in a forked process
+            self._lock.notify()
+            return
+        self._summarizer = threading.Thread(target=self._run_summarizer, name='log-rate-limit', daemon=True)
+        self._summarizer.start()
+
+    def _run_summarizer(self):
+        """Emit summaries of the suppressed groups when their windows end."""
+        with self._lock:
+            while not self._stopping:
+                due = min((start + self.window for start, _, suppressed in self._groups.values() if suppressed),
+                          default=None)
+                now = time.monotonic()
+                if due is None or due > now:
+                    self._lock.wait(None if due is None else due - now)
+                    continue
+                summaries = self._sweep(now)
+                self._lock.release()
+                try:
+                    self._emit_summaries(summaries)
+                finally:
+                    self._lock.acquire()
+
+    def flush(self):
+        """Stop the background emitting and emit summaries of all groups with suppressed records."""
+        with self._lock:
+            summarizer, self._summarizer = self._summarizer, None
+            self._stopping = True
+            self._lock.notify()
+        if summarizer:
+            summarizer.join()
+        with self._lock:
+            self._stopping = False
+            summaries = self._sweep(time.monotonic(), all_groups=True)
+        self._emit_summaries(summaries)
+
+    def _emit_summaries(self, summaries):
+        self._emitting.active = True
+        try:
+            for (name, message, values), suppressed in summaries:
+                extra = {"source_logger": name, "source_message": str(message), "suppressed": suppressed,
+                         "window": self.window}
+                extra.update((k, v) for k, v in zip(self.keys, values) if v is not None)
+                record = _logger.makeRecord(
+                    _logger.name, logging.WARNING, __file__, 0, self.SUMMARY_MESSAGE, None, None, extra=extra)
+                if record.levelno >= self.handler.level:
+                    self.handler.handle(record)
+        finally:
+            self._emitting.active = False
+
+
+_listener = None
+
+_run_context_filter = None
+_rate_limit_filters = []
+
+
+def _context_filter():
+    """The run context filter is created on first use, so commands without logging setup don't import `runjob`."""
+    global _run_context_filter
+    if _run_context_filter is None:
+        from runtools.runjob.log import RunContextFilter
+        _run_context_filter = RunContextFilter()
+    return _run_context_filter
+
+
+def configure(enabled, log_stdout_level=DEF_LEVEL_STDOUT, log_file_level=DEF_LEVEL_FILE, log_file_path=None, *,
+              log_file_async=False, log_file_queue_size=DEF_QUEUE_SIZE, log_file_overflow=Overflow.BLOCK.value,
+              log_file_json=JSON_STDLIB, log_file_max_size=DEF_MAX_BYTES, log_file_backup_count=DEF_BACKUP_COUNT,
+              log_file_compress=False, rate_limit_burst=None, rate_limit_window=DEF_RATE_LIMIT_WINDOW,
+              rate_limit_keys=DEF_RATE_LIMIT_KEYS):
+    """
+    Configure the runtools logger handlers. With `rate_limit_burst`, repeated records are suppressed by
+    `RateLimitFilter` added to each of the handlers.
+    """
+    _stop_listener()
+    for handler in runtools_logger.handlers:
+        handler.close()
     runtools_logger.handlers.clear()
+    _rate_limit_filters.clear()
     runtools_logger.setLevel(logging.WARNING)
 
     if not enabled:
         runtools_logger.disabled = True
         return
 
+    _setup_handlers(log_stdout_level, log_file_level, log_file_path, log_file_async, log_file_queue_size,
+                    log_file_overflow, log_file_json, log_file_max_size, log_file_backup_count, log_file_compress)
+    if rate_limit_burst:
+        try:
+            setup_rate_limit(rate_limit_burst, rate_limit_window, rate_limit_keys)
+        except (ValueError, TypeError):
+            runtools_logger.warning("Invalid log rate limit", extra={
+                "burst": rate_limit_burst, "window": rate_limit_window, "keys": rate_limit_keys})
+
+
+def _setup_handlers(log_stdout_level, log_file_level, log_file_path, log_file_async, log_file_queue_size,
+                    log_file_overflow, log_file_json, log_file_max_size, log_file_backup_count, log_file_compress):
+
     if log_stdout_level != 'off':
         level_error = False
         level = logging.getLevelName(log_stdout_level.upper())
@@ -125,16 +635,72 @@ def configure(enabled, log_stdout_level=DEF_LEVEL_STDOUT, log_file_level=DEF_LEV
         if not isinstance(level, int):
             level = logging.getLevelName(DEF_LEVEL_FILE)
             level_error = True
+        json_error = not is_json_backend_available(log_file_json)
+        json_backend = JSON_STDLIB if json_error else log_file_json
+        overflow_error = False
+        try:
+            overflow = Overflow(log_file_overflow)
+        except ValueError:
+            overflow = Overflow.BLOCK
+            overflow_error = True
+        rotation_error = False
+        try:
+            max_bytes = _parse_size(log_file_max_size)
+            backup_count = int(log_file_backup_count)
+            if max_bytes < 0 or backup_count < 0:
+                raise ValueError
+        except (ValueError, TypeError):
+            max_bytes, backup_count = DEF_MAX_BYTES, DEF_BACKUP_COUNT
+            rotation_error = True
+        rotation = {'max_bytes': max_bytes, 'backup_count': backup_count, 'compress': bool(log_file_compress)}
         try:
             log_file_path = expand_user(log_file_path) or (paths.log_dir(create=True) / LOG_FILENAME)
-            setup_file(level, log_file_path)
+            if log_file_async:
+                setup_async_file(level, log_file_path, log_file_queue_size, overflow, json_backend=json_backend,
+                                 **rotation)
+            else:
+                setup_file(level, log_file_path, json_backend=json_backend, **rotation)
         except OSError as e:
-            print(f"WARNING: File logging disabled: {e}", file=sys.stderr)
+            runtools_logger.warning("File logging disabled", extra={"file": str(log_file_path), "error": str(e)})
         else:
             if level < runtools_logger.getEffectiveLevel():
                 runtools_logger.setLevel(level)
             if level_error:
                 runtools_logger.warning("Invalid log level", extra={"type": "file", "level": log_file_level, "default": DEF_LEVEL_FILE})
+            if overflow_error and log_file_async:
+                runtools_logger.warning("Invalid log queue overflow policy",
+                                        extra={"overflow": log_file_overflow, "default": Overflow.BLOCK.value})
+            if json_error:
+                runtools_logger.warning("JSON backend not available",
+                                        extra={"backend": log_file_json, "default": JSON_STDLIB})
+            if rotation_error:
+                runtools_logger.warning("Invalid log file rotation", extra={
+                    "max_size": log_file_max_size, "backup_count": log_file_backup_count,
+                    "default_max_size": DEF_MAX_BYTES, "default_backup_count": DEF_BACKUP_COUNT})
+
+
+def _parse_size(size):
+    """Size in bytes from a number or a human-readable string (e.g. 5MB)."""
+    if isinstance(size, str):
+        from runtools.runcore.util.text import parse_size_to_bytes
+        return parse_size_to_bytes(size)
+    return int(size)
+
+
+def setup_rate_limit(burst, window=DEF_RATE_LIMIT_WINDOW, keys=DEF_RATE_LIMIT_KEYS):
+    """Add `RateLimitFilter` to each handler of the runtools logger, replacing the previous ones."""
+    burst, window = int(burst), float(window)
+    _flush_rate_limit()
+    for rate_limit_filter in _rate_limit_filters:
+        rate_limit_filter.handler.removeFilter(rate_limit_filter)
+    _rate_limit_filters[:] = [RateLimitFilter(handler, burst, window, keys) for handler in runtools_logger.handlers]
+    for rate_limit_filter in _rate_limit_filters:
+        rate_limit_filter.handler.addFilter(rate_limit_filter)
+
+
+def _flush_rate_limit():
+    for rate_limit_filter in _rate_limit_filters:
+        rate_limit_filter.flush()
 
 
 def is_disabled():
@@ -149,7 +715,7 @@ def setup_console(level):
     stdout_handler.setLevel(level)
     stdout_handler.setFormatter(formatter)
     stdout_handler.addFilter(lambda record: record.levelno <= logging.INFO)
-    stdout_handler.addFilter(_run_context_filter)
+    stdout_handler.addFilter(_context_filter())
     register_handler(stdout_handler)
 
     stderr_handler = logging.StreamHandler(sys.stderr)
@@ -157,7 +723,7 @@ def setup_console(level):
     stderr_handler.setLevel(level)
     stderr_handler.setFormatter(formatter)
     stderr_handler.addFilter(lambda record: record.levelno > logging.INFO)
-    stderr_handler.addFilter(_run_context_filter)
+    stderr_handler.addFilter(_context_filter())
     register_handler(stderr_handler)
 
 
@@ -165,16 +731,96 @@ def get_console_level():
     return _get_handler_level(STDOUT_HANDLER_NAME)
 
 
-def setup_file(level, file):
-    file_handler = logging.handlers.RotatingFileHandler(file, maxBytes=5_000_000, backupCount=3)
+def set_console_streams(stdout, stderr):
+    """Redirect the console handlers to the given streams, `None` restores `sys.stdout` and `sys.stderr`."""
+    for name, stream in ((STDOUT_HANDLER_NAME, stdout or sys.stdout), (STDERR_HANDLER_NAME, stderr or sys.stderr)):
+        handler = _find_handler(name)
+        if handler:
+            previous = handler.setStream(stream)
+            if previous not in (None, stream, sys.stdout, sys.stderr):
+                previous.close()
+
+
+def setup_file(level, file, *, json_backend=JSON_STDLIB, max_bytes=DEF_MAX_BYTES, backup_count=DEF_BACKUP_COUNT,
+               compress=False):
+    file_handler = _create_file_handler(level, file, json_backend, max_bytes, backup_count, compress)
+    file_handler.addFilter(_context_filter())
+    register_handler(file_handler)
+
+
+def _create_file_handler(level, file, json_backend, max_bytes, backup_count, compress):
+    file_handler = SharedRotatingFileHandler(file, max_bytes, backup_count, compress)
     file_handler.set_name(FILE_HANDLER_NAME)
     try:
         file_handler.setLevel(level)
     except ValueError as e:
         raise InvalidLogLevelError(str(e))
-    file_handler.setFormatter(JsonFormatter())
-    file_handler.addFilter(_run_context_filter)
-    register_handler(file_handler)
+    file_handler.setFormatter(JsonFormatter(json_backend))
+    return file_handler
+
+
+def setup_async_file(level, file, queue_size=DEF_QUEUE_SIZE, overflow=Overflow.BLOCK, *, json_backend=JSON_STDLIB,
+                     max_bytes=DEF_MAX_BYTES, backup_count=DEF_BACKUP_COUNT, compress=False):
+    """
+    Set up file logging where the records are passed through a bounded queue to a background thread, which formats
+    and writes them. The queue is drained on exit and by `flush()`.
+    """
+    global _listener
+    file_handler = _create_file_handler(level, file, json_backend, max_bytes, backup_count, compress)
+    queue_handler = AsyncQueueHandler(queue.Queue(queue_size), overflow)
+    queue_handler.set_name(FILE_HANDLER_NAME)
+    queue_handler.setLevel(file_handler.level)
+    queue_handler.addFilter(_context_filter())  # Run context must be resolved in the logging thread
+    queue_handler.file_handler = file_handler
+
+    _stop_listener()
+    _listener = _QueueListener(queue_handler.queue, file_handler, respect_handler_level=True)
+    _listener.queue_handler = queue_handler
+    _listener.start()
+    register_handler(queue_handler)
+
+
+def flush(timeout=FLUSH_TIMEOUT):
+    """Wait until all queued records of the async file logging are written, at most `timeout` seconds."""
+    if not _listener:
+        return
+    record_queue = _listener.queue
+    with record_queue.all_tasks_done:  # Notified by the listener thread marking the last queued record as done
+        record_queue.all_tasks_done.wait_for(lambda: not record_queue.unfinished_tasks, timeout)
+    for handler in _listener.handlers:
+        handler.flush()
+
+
+def shutdown():
+    """
+    Flush and close the logging like on the interpreter exit. For processes ending without running the exit handlers
+    (`os._exit`), e.g. forked daemon workers.
+    """
+    _stop_listener()
+    logging.shutdown()
+
+
+def get_dropped_count():
+    """Number of records dropped by the async file logging due to its overflow policy."""
+    return _listener.queue_handler.dropped if _listener else 0
+
+
+@atexit.register
+def _stop_listener():
+    global _listener
+    _flush_rate_limit()  # Pending summaries written before the file handlers are closed
+    if not _listener:
+        return
+    listener, _listener = _listener, None
+    runtools_logger.removeHandler(listener.queue_handler)
+    listener.stop()  # Processes all queued records
+    if dropped := listener.queue_handler.dropped:
+        file_handler = listener.queue_handler.file_handler
+        file_handler.handle(runtools_logger.makeRecord(
+            runtools_logger.name, logging.WARNING, __file__, 0, "Log records dropped", None, None,
+            extra={"dropped": dropped, "overflow": listener.queue_handler.overflow.value}))
+    for handler in listener.handlers:
+        handler.close()
 
 
 def get_file_level():
@@ -184,7 +830,7 @@ def get_file_level():
 def get_file_path():
     handler = _find_handler(FILE_HANDLER_NAME)
     if handler:
-        return handler.baseFilename
+        return getattr(handler, 'file_handler', handler).baseFilename
     else:
         return None
 
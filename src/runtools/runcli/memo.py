@@ -0,0 +1,222 @@
+"""
+Result memoization of jobs (`--cache-key`, `--inputs`, `--cache-env`, `--cache-ttl`).
+
+A job with memoization enabled is fingerprinted before it is executed. The fingerprint covers the job ID, the program
+and its arguments, the cache key, values of the selected environment variables and the content of the input files.
+When a successful run with the same fingerprint is found in the result cache (and is not older than the TTL),
+the program is not executed (the instance only records the skip, see `job.run_cached`). Otherwise the fingerprint
+is stored after the job completes successfully.
+
+Input files are hashed only when changed: digests are kept in an index keyed by the file path and validated
+by the modification time and size of the file (the same approach as the config cache, see `cfg`).
+
+The result cache is in the `results` subdirectory of the runtools cache directory, one JSON file per fingerprint.
+"""
+import glob
+import hashlib
+import json
+import logging
+import marshal
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from runtools.runcli import cfg
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR_NAME = 'results'
+INDEX_FILE = 'inputs.index'
+INDEX_VERSION = 1
+FINGERPRINT_VERSION = 1
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def results_dir():
+    return cfg.cache_dir() / RESULTS_DIR_NAME
+
+
+_index_lock = threading.Lock()  # Index updates of the jobs of a batch (threads), see `InputIndex.save`
+
+
+def _tmp_path(path):
+    """Temporary file for an atomic replacement of the path, unique per process and thread."""
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+class InputIndex:
+    """Digests of input files validated by their modification time and size."""
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = self._load()
+        self._updated = {}
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                version, entries = marshal.load(f)
+            if version == INDEX_VERSION:
+                return entries
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+        return {}
+
+    def digest(self, file):
+        stat = os.stat(file)
+        key = os.path.abspath(file)
+        cached = self._entries.get(key)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+        digest = file_digest(file)
+        self._entries[key] = self._updated[key] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def save(self):
+        """
+        The updated entries are merged into the current content of the index file, so the updates saved by other jobs
+        since this index was loaded are kept.
+        """
+        if not self._updated:
+            return
+        tmp = _tmp_path(self.path)
+        try:
+            with _index_lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                entries = self._load()
+                entries.update(self._updated)
+                with open(tmp, 'wb') as f:
+                    marshal.dump((INDEX_VERSION, entries), f)
+                os.replace(tmp, self.path)
+        except OSError as e:
+            logger.debug("Input index not saved", extra={"file": str(self.path), "error": str(e)})
+            tmp.unlink(missing_ok=True)
+
+
+def fingerprint(job_id, program_args, cache_key=None, inputs=(), env_vars=(), index=None):
+    """
+    Args:
+        job_id: ID of the job
+        program_args: program and its arguments
+        cache_key: arbitrary key, e.g. a version of the data the job is processing
+        inputs: glob patterns of the input files (`**` matches any directories)
+        env_vars: names of the environment variables included in the fingerprint
+        index: `InputIndex` used to avoid re-hashing of unchanged files
+
+    Returns:
+        Hex digest identifying the job execution
+    """
+    h = hashlib.sha256()
+
+    def feed(*values):
+        for value in values:
+            h.update(repr(value).encode())
+            h.update(b'\0')
+
+    feed(FINGERPRINT_VERSION, job_id, list(program_args), cache_key)
+    for name in sorted(set(env_vars)):
+        feed('env', name, os.environ.get(name))
+    for pattern in inputs:
+        files = sorted(f for f in glob.glob(pattern, recursive=True) if os.path.isfile(f))
+        feed('inputs', pattern, len(files))
+        for file in files:
+            feed(file, index.digest(file) if index else file_digest(file))
+    return h.hexdigest()
+
+
+def file_digest(file):
+    h = hashlib.sha256()
+    with open(file, 'rb') as f:
+        while chunk := f.read(_CHUNK_SIZE):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@dataclass
+class CachedResult:
+    fingerprint: str
+    job_id: str
+    run_id: str
+    completed: float  # Unix time
+    hits: int = 0
+
+    @property
+    def age(self):
+        return time.time() - self.completed
+
+
+class ResultCache:
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory) if directory else results_dir()
+
+    def _path(self, fp):
+        return self.directory / f"{fp}.json"
+
+    def lookup(self, fp, ttl=None):
+        """
+        Returns:
+            `CachedResult` of a successful run with the fingerprint, None if not found or older than TTL seconds
+        """
+        try:
+            result = CachedResult(**json.loads(self._path(fp).read_text()))
+        except (OSError, ValueError, TypeError):
+            return None
+        if ttl and result.age > ttl:
+            return None
+        return result
+
+    def store(self, fp, job_id, run_id):
+        self._write(CachedResult(fp, job_id, run_id, time.time()))
+
+    def record_hit(self, result):
+        result.hits += 1
+        self._write(result)
+
+    def _write(self, result):
+        path = self._path(result.fingerprint)
+        tmp = _tmp_path(path)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(result.__dict__))
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("Result not cached", extra={"file": str(path), "error": str(e)})
+            tmp.unlink(missing_ok=True)
+
+
+class Memo:
+    """Memoization of one job execution: the fingerprint computed before the run and its cache."""
+
+    def __init__(self, job_id, program_args, *, cache_key=None, inputs=(), env_vars=(), ttl=None, cache=None):
+        self.job_id = job_id
+        self.ttl = ttl
+        self.cache = cache or ResultCache()
+        index = InputIndex(self.cache.directory / INDEX_FILE)
+        self.fingerprint = fingerprint(job_id, program_args, cache_key, inputs, env_vars, index)
+        index.save()
+
+    @classmethod
+    def create(cls, job_id, program_args, *, cache_key=None, inputs=(), env_vars=(), ttl=None):
+        """Returns None when memoization is not enabled (neither cache key nor inputs are specified)."""
+        if not cache_key and not inputs:
+            return None
+        return cls(job_id, program_args, cache_key=cache_key, inputs=inputs, env_vars=env_vars, ttl=ttl)
+
+    def cached_result(self):
+        """Find the cached successful run, the hit is recorded in the cache entry."""
+        result = self.cache.lookup(self.fingerprint, self.ttl)
+        if result:
+            self.cache.record_hit(result)
+            logger.info("Job skipped, result cached", extra={
+                "job": self.job_id, "fingerprint": self.fingerprint, "cached_run": result.run_id,
+                "age": round(result.age, 1)})
+        return result
+
+    def store(self, run_id):
+        self.cache.store(self.fingerprint, self.job_id, run_id)
+        logger.debug("Job result cached", extra={"job": self.job_id, "fingerprint": self.fingerprint})
@@ -0,0 +1,214 @@
+"""
+Prometheus metrics of job runs (`--metrics-dir` or the `metrics.textfile_dir` config value, `--metrics-socket`).
+
+Metrics of a run are rendered in the Prometheus text exposition format and labelled by the job ID and
+the concurrency group. They are exported in one or both ways:
+    textfile: when the run ends, the metrics are written into `<dir>/runcli_<job>.prom` for the textfile collector
+              of node exporter. The file is written into a temporary file renamed over the target, so the collector
+              never reads a partially written file. Each run replaces the metrics of the previous run of the job.
+    socket:   while the job is running, current metrics are served over HTTP on the Unix socket
+              (e.g. `curl --unix-socket PATH http://localhost/metrics`).
+"""
+import http.server
+import logging
+import os
+import re
+import socketserver
+import stat
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'runcli_'
+TEXTFILE_SUFFIX = '.prom'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class RunMetrics:
+    """
+    Metrics of one run of a job, a context manager wrapping the run. The wait times are set by the wrapper,
+    the output metrics are read from the output counter (see `resources.OutputCounter`) and the output warning
+    detector (see `output.OutputWarningDetector`),
+    the resource usage from the resource monitor (must exit before this context manager).
+    On exit, the metrics are written into the textfile directory (if set).
+    """
+
+    def __init__(self, job_id, concurrency_group=None, *, textfile_dir=None, output_counter=None,
+                 warning_detector=None, time_warning=None):
+        self.job_id = job_id
+        self.concurrency_group = concurrency_group or ''
+        self.textfile_dir = textfile_dir
+        self.output_counter = output_counter
+        self.warning_detector = warning_detector
+        self.time_warning = time_warning
+        self.resource_monitor = None
+        self.admission_wait = 0.0
+        self.queue_wait = 0.0
+        self.success = None  # None while running
+        self._start = None
+        self._end = None
+        self._end_time = None
+
+    def __enter__(self):
+        self._start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._end, self._end_time = time.monotonic(), time.time()
+        self.success = exc_type is None
+        if self.textfile_dir:
+            write_textfile(self.textfile_dir, self)
+
+    @property
+    def duration(self):
+        if self._start is None:
+            return 0.0
+        return (self._end or time.monotonic()) - self._start
+
+    def samples(self):
+        """
+        Returns:
+            List of tuples (name, type, help, value)
+        """
+        duration = self.duration
+        samples = [
+            ('run_duration_seconds', 'gauge', 'Duration of the run (excluding waiting before the start)', duration),
+            ('admission_wait_seconds', 'gauge', 'Time waiting for the host conditions before the start',
+             self.admission_wait),
+            ('queue_wait_seconds', 'gauge', 'Time waiting in the local queue of the concurrency group',
+             self.queue_wait),
+            ('running', 'gauge', 'Whether the job is running', 1 if self.success is None else 0),
+        ]
+        if self.success is not None:
+            samples += [
+                ('run_success', 'gauge', 'Whether the last run completed successfully', int(self.success)),
+                ('run_end_timestamp_seconds', 'gauge', 'Unix time of the end of the last run', self._end_time),
+            ]
+        if counter := self.output_counter:
+            samples += [
+                ('output_lines', 'gauge', 'Output lines of the run', counter.lines),
+                ('output_bytes', 'gauge', 'Output bytes of the run', counter.bytes),
+                ('output_lines_per_second', 'gauge', 'Output lines per second of the run',
+                 counter.lines / duration if duration else 0.0),
+                ('output_bytes_per_second', 'gauge', 'Output bytes per second of the run',
+                 counter.bytes / duration if duration else 0.0),
+                ('parse_hits', 'gauge', 'Output lines with parsed fields', counter.parsed),
+            ]
+        warnings = self.warning_detector.count if self.warning_detector else 0
+        if self.time_warning and duration > self.time_warning:
+            warnings += 1
+        samples.append(('warnings', 'gauge', 'Output and time warnings of the run', warnings))
+        if usage := self.resource_monitor and self.resource_monitor.usage:
+            samples.append(('cpu_seconds', 'gauge', 'CPU time of the program (user and system)', usage.cpu_time))
+            if usage.max_rss is not None:
+                samples.append(
+                    ('max_rss_bytes', 'gauge', 'Peak resident set size of the largest program process', usage.max_rss))
+            if usage.memory_peak is not None:
+                samples.append(
+                    ('memory_peak_bytes', 'gauge', 'Peak memory usage of the cgroup of the program', usage.memory_peak))
+        return samples
+
+    def render(self):
+        """
+        Returns:
+            Metrics in the Prometheus text exposition format
+        """
+        labels = f'{{job="{_escape(self.job_id)}",group="{_escape(self.concurrency_group)}"}}'
+        lines = []
+        for name, metric_type, description, value in self.samples():
+            lines += [f"# HELP {PREFIX}{name} {description}",
+                      f"# TYPE {PREFIX}{name} {metric_type}",
+                      f"{PREFIX}{name}{labels} {value}"]
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(label_value):
+    return label_value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def textfile_path(directory, job_id):
+    name = re.sub(r'[^\w.@-]+', '_', job_id)
+    return os.path.join(directory, f"{PREFIX}{name}{TEXTFILE_SUFFIX}")
+
+
+def write_textfile(directory, metrics):
+    """Write the metrics for the textfile collector, atomically replacing the metrics of the previous run."""
+    path = textfile_path(directory, metrics.job_id)
+    tmp = f"{path}.{os.getpid()}.tmp"  # Not matching `*.prom`, ignored by the collector
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(tmp, 'w') as f:
+            f.write(metrics.render())
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning("Metrics not written", extra={"file": path, "error": str(e)})
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+class MetricsServer:
+    """HTTP server exposing the current metrics on a Unix socket in a background thread."""
+
+    def __init__(self, socket_path, metrics):
+        self.socket_path = str(socket_path)
+        self.metrics = metrics
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        metrics = self.metrics
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def address_string(self):
+                return 'unix'
+
+            def log_message(self, fmt, *args):
+                pass
+
+        if not _remove_socket(self.socket_path):  # Stale socket of a previous run
+            logger.warning("Metrics not served, the path exists and is not a socket", extra={
+                "socket": self.socket_path})
+            return self
+        self._server = _UnixHTTPServer(self.socket_path, Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True)
+        self._thread.start()
+        logger.debug("Metrics served", extra={"socket": self.socket_path})
+        return self
+
+    def stop(self):
+        if not self._server:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        _remove_socket(self.socket_path)
+
+
+def _remove_socket(path):
+    """
+    Returns:
+        False when the path exists and is not a socket (not removed), otherwise True
+    """
+    try:
+        if not stat.S_ISSOCK(os.lstat(path).st_mode):
+            return False
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    return True
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
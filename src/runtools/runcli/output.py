@@ -0,0 +1,274 @@
+"""
+Output processors of the `run` wrapper complementing the ones provided by `runjob`.
+
+Output processors are callables receiving an output line and returning the (possibly enriched) line.
+"""
+import dataclasses
+import re
+import threading
+import time
+
+PARSE_KV = 'kv'
+PARSE_JSON = 'json'
+PARSE_LOG = 'log'
+PARSE_FORMATS = (PARSE_KV, PARSE_JSON, PARSE_LOG)
+
+OUTPUT_MODE_LINES = 'lines'  # Output captured and processed line by line
+OUTPUT_MODE_RAW = 'raw'  # Output copied in byte chunks, no line processing (see `rawoutput`)
+OUTPUT_MODES = (OUTPUT_MODE_LINES, OUTPUT_MODE_RAW)
+
+COMPRESS_GZIP = 'gzip'
+COMPRESS_ZSTD = 'zstd'
+COMPRESS_LZ4 = 'lz4'
+COMPRESS_FORMATS = (COMPRESS_GZIP, COMPRESS_ZSTD, COMPRESS_LZ4)  # See `compress`
+COMPRESS_NONE = 'none'
+
+TERMINAL_FIELDS = frozenset({'result'})
+
+_LOG_LEVEL_PATTERN = re.compile(r'\b(?:TRACE|DEBUG|INFO|WARN|WARNING|ERROR|FATAL|CRITICAL)\b', re.IGNORECASE)
+
+
+def _kv_check(message):
+    return '=[' in message
+
+
+def _json_check(message):
+    return message.lstrip().startswith('{')
+
+
+def _log_check(message):
+    return _LOG_LEVEL_PATTERN.search(message) is not None
+
+
+_FORMAT_CHECKS = {
+    PARSE_KV: _kv_check,
+    PARSE_JSON: _json_check,
+    PARSE_LOG: _log_check,
+}
+
+
+class OutputPrefilter:
+    """
+    Output processor passing to the wrapped processor only the lines which can contain data in one of the selected
+    formats. Other lines are returned unchanged without entering the parsing machinery. The checks are cheap
+    approximations, a line passing the prefilter does not have to be parsable:
+        - kv: contains `=[` (the `key=[value]` format)
+        - json: starts with `{` (ignoring leading whitespace)
+        - log: contains a log level word (INFO, WARN, ERROR...)
+
+    If a marker is set, only lines starting with the marker are passed (and then checked for the formats).
+    """
+
+    def __init__(self, processor, formats=PARSE_FORMATS, marker=None):
+        unknown = set(formats) - set(PARSE_FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown parse formats: {', '.join(sorted(unknown))}")
+        self.processor = processor
+        self.formats = tuple(formats)
+        self.marker = marker
+        self._check = self._create_check()
+
+    def _create_check(self):
+        checks = [_FORMAT_CHECKS[f] for f in self.formats]
+        if len(checks) == 1:
+            format_check = checks[0]
+        else:
+            def format_check(message):
+                return any(check(message) for check in checks)
+
+        if not self.marker:
+            return format_check
+
+        marker = self.marker
+
+        def marker_check(message):
+            return message.startswith(marker) and format_check(message)
+
+        return marker_check
+
+    def __call__(self, output_line):
+        if self._check(output_line.message):
+            return self.processor(output_line)
+        return output_line
+
+
+class StatusCoalescer:
+    """
+    Output processor limiting the rate of status updates carried by parsed fields of output lines.
+
+    Fields parsed from lines within the interval after the last update are removed from the lines and accumulated
+    (later values override earlier ones). The accumulated fields are attached to the first line after the interval
+    has elapsed, so at most one merged update is emitted per interval. A line with a terminal field (e.g. `result`)
+    is always emitted immediately together with all accumulated fields.
+
+    When no line follows, the accumulated fields are emitted by a timer thread to the `sink` once the interval has
+    elapsed, or by `close` at the end of the instance. The emitted line is the last line whose fields were withheld,
+    carrying all the accumulated fields. Without a sink, the fields wait for the next line only.
+    """
+
+    def __init__(self, interval, terminal_fields=TERMINAL_FIELDS, *, sink=None):
+        self.interval = interval
+        self.terminal_fields = frozenset(terminal_fields)
+        self.sink = sink
+        self._pending = {}
+        self._pending_line = None
+        self._last_update = None
+        self._released = None  # Line emitted to the sink, passed unchanged if processed again
+        self._closed = False
+        self._timer = None
+        self._lock = threading.Condition()
+
+    def __call__(self, output_line):
+        fields = output_line.fields
+        with self._lock:
+            if (not fields and not self._pending) or output_line is self._released:
+                return output_line
+
+            now = time.monotonic()
+            due = self._last_update is None or now - self._last_update >= self.interval
+            if due or (fields and not self.terminal_fields.isdisjoint(fields)):
+                pending, self._pending = self._pending, {}
+                self._pending_line = None
+                self._last_update = now
+                if not pending:
+                    return output_line
+                return dataclasses.replace(output_line, fields={**pending, **fields} if fields else pending)
+
+            if not fields:
+                return output_line
+            self._pending.update(fields)
+            self._pending_line = output_line
+            if self.sink and not self._timer and not self._closed:
+                self._timer = threading.Thread(target=self._run_timer, name='status-coalescer', daemon=True)
+                self._timer.start()
+            self._lock.notify()
+        return dataclasses.replace(output_line, fields=None)
+
+    def _take_pending(self):
+        if not self._pending:
+            return None
+        line = dataclasses.replace(self._pending_line, fields=self._pending)
+        self._pending, self._pending_line = {}, None
+        self._last_update = time.monotonic()
+        self._released = line
+        return line
+
+    def _run_timer(self):
+        while True:
+            with self._lock:
+                while not self._closed:
+                    if not self._pending:
+                        self._lock.wait()
+                    elif (remaining := self._last_update + self.interval - time.monotonic()) > 0:
+                        self._lock.wait(remaining)
+                    else:
+                        break
+                if self._closed:
+                    return
+                line = self._take_pending()
+            self.sink(line)
+
+    def close(self, timeout=1.0):
+        """Stop the timer and emit the accumulated fields to the sink (if any), e.g. at the end of the instance."""
+        with self._lock:
+            self._closed = True
+            self._lock.notify()
+            line = self._take_pending() if self.sink else None
+        if self._timer:
+            self._timer.join(timeout)
+        if line:
+            self.sink(line)
+
+
+def combine_patterns(patterns, literals=()):
+    """
+    Combine regular expressions and literal strings into a single alternation without groups, used as a gate:
+    an output line is searched by one regex regardless of the number of patterns and only the lines matching the gate
+    are searched by the individual patterns (see `OutputWarningMatcher`). The alternatives are not named groups, which
+    would defeat the literal prefix optimization of the regex engine and make the search slower than separate
+    searches by all patterns.
+
+    Patterns with their own groups (which could be referenced by number) or with global inline flags cannot be
+    embedded into an alternation, these are returned separately.
+
+    Args:
+        patterns: regular expressions
+        literals: plain strings matched as substrings
+
+    Returns:
+        Tuple of (gate pattern or None, list of patterns covered by the gate, list of separate patterns)
+
+    Raises:
+        re.error: if any of the patterns is invalid
+    """
+    alternatives = []
+    gated = []
+    separate = []
+    for pattern in patterns:
+        compiled = re.compile(pattern)
+        if compiled.groups or compiled.flags & ~re.UNICODE:  # Groups or global flags like (?i)
+            separate.append(pattern)
+            continue
+        gated.append(pattern)
+        alternatives.append(pattern)  # Its own top-level alternatives are alternatives of the gate as well
+    for literal in literals:
+        gated.append(literal)
+        alternatives.append(re.escape(literal))
+
+    if not alternatives:
+        return None, [], separate
+    return '|'.join(alternatives), gated, separate
+
+
+class OutputWarningMatcher:
+    """
+    Matcher of the output warning patterns (regular expressions) and literals (plain substrings) finding the one
+    which matches a line. The patterns are combined into a gate by `combine_patterns`, so the cost of a line without
+    a warning is about one regex search regardless of the number of patterns.
+
+    Raises:
+        re.error: if any of the patterns is invalid
+    """
+
+    def __init__(self, patterns=(), literals=()):
+        gate, _, separate = combine_patterns(patterns, literals)
+        self.gate = re.compile(gate) if gate else None
+        separate = set(separate)
+        # (pattern, compiled regex or None for a literal) in the order given, patterns before literals
+        self._all = [(p, re.compile(p)) for p in patterns] + [(literal, None) for literal in literals]
+        self._separate = [(p, compiled) for p, compiled in self._all if compiled and p in separate]
+
+    def match(self, text):
+        """
+        Returns:
+            The first pattern or literal (in the order given, patterns before literals) found in the text,
+            None if there is none
+        """
+        candidates = self._all if self.gate and self.gate.search(text) else self._separate
+        for pattern, compiled in candidates:
+            if (compiled.search(text) if compiled else pattern in text):
+                return pattern
+        return None
+
+
+class OutputWarningDetector:
+    """
+    Output processor detecting output lines matching the output warning patterns (see `OutputWarningMatcher`).
+    Each detected line is counted and passed together with the matching pattern to `on_warning` (if set),
+    lines are returned unchanged.
+    """
+
+    def __init__(self, matcher, on_warning=None):
+        self.matcher = matcher
+        self.on_warning = on_warning
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, output_line):
+        pattern = self.matcher.match(output_line.message)
+        if pattern is not None:
+            with self._lock:
+                self.count += 1
+            if self.on_warning:
+                self.on_warning(pattern, output_line)
+        return output_line
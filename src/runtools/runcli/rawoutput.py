@@ -0,0 +1,125 @@
+"""
+Raw output mode: program output is copied in large byte chunks without decoding it into lines.
+
+The program is executed without output capturing by `ProgramPhase` and inherits stdout and stderr of this process.
+While the raw output pump is active, these are replaced by pipes and the data read from the pipes is written
+to the original streams (terminal), the raw output file and the memory-mapped tail buffer (`--tail-buffer-mmap`).
+Console logging of the wrapper itself is redirected to the original streams, so it does not end up in the stored
+output.
+
+The raw output file is stored in the output directory of the environment, where the node stores the output files
+of the jobs (the `file` output storage).
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+from runtools.runcore import paths
+
+from runtools.runcli import log
+from runtools.runcli.compress import open_output, DEF_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+CLOSE_TIMEOUT = 5.0
+RAW_SUFFIX = '.out'
+LINES_SUFFIX = '.jsonl'  # Output line records (see `compress.CompressedOutputWriter`)
+
+
+def output_path(env_id, job_id, run_id=None, suffix=RAW_SUFFIX):
+    """
+    Path of the output file stored by the wrapper itself (raw or compressed output) in the output directory
+    of the environment (see `runcore.paths.output_dir`).
+    """
+    name = re.sub(r'[^\w.@-]+', '_', f"{job_id}@{run_id}" if run_id else f"{job_id}@{os.getpid()}")
+    return paths.output_dir(env_id, create=True) / f"{name}{suffix}"
+
+
+class RawOutputPump:
+    """
+    Context manager redirecting stdout and stderr file descriptors of this process to pipes pumped in chunks
+    to the original descriptors, the output file (if any, optionally compressed) and the tail buffer (if any,
+    see `tailbuffer.MmapTailBuffer`). The pumped data are also passed to the `counter` (if any,
+    see `resources.OutputCounter`).
+
+    On exit, the pumps are waited for at most `close_timeout` seconds: the pipes stay open while any background
+    process started by the program holds a copy, the output of such a process is not copied after the exit.
+    """
+
+    def __init__(self, output_file=None, tail_buffer=None, chunk_size=CHUNK_SIZE, *, compression=None,
+                 flush_interval=DEF_FLUSH_INTERVAL, counter=None, close_timeout=CLOSE_TIMEOUT):
+        self.output_file = output_file
+        self.tail_buffer = tail_buffer
+        self.compression = compression
+        self.flush_interval = flush_interval
+        self.counter = counter
+        self.chunk_size = chunk_size
+        self.close_timeout = close_timeout
+        self._file = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._saved_fds = {}
+        self._saved_streams = []
+        self._threads = []
+
+    def __enter__(self):
+        if self.output_file:
+            self._file = open_output(self.output_file, self.compression, self.flush_interval)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        for fd in (1, 2):
+            saved_fd = os.dup(fd)
+            read_fd, write_fd = os.pipe()
+            os.dup2(write_fd, fd)
+            os.close(write_fd)
+            self._saved_fds[fd] = saved_fd
+            self._saved_streams.append(os.fdopen(os.dup(saved_fd), 'w', buffering=1))
+            thread = threading.Thread(target=self._pump, args=(read_fd, saved_fd), name=f"raw-output-{fd}",
+                                      daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        log.set_console_streams(*self._saved_streams)
+        return self
+
+    def _pump(self, read_fd, target_fd):
+        with open(read_fd, 'rb', buffering=0) as source:
+            while chunk := source.read(self.chunk_size):
+                with self._lock:  # Not written once closed, the target descriptor could be already reused
+                    if self._closed:
+                        return
+                    _write_all(target_fd, chunk)
+                    if self._file:
+                        self._file.write(chunk)
+                    if self.tail_buffer:
+                        self.tail_buffer.write(chunk)
+                    if self.counter:
+                        self.counter.add_chunk(chunk)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        log.set_console_streams(None, None)
+        for stream in self._saved_streams:
+            stream.close()
+        for fd, saved_fd in self._saved_fds.items():
+            os.dup2(saved_fd, fd)  # Closes our pipe write end, the pump gets EOF once the program closed its copy
+        deadline = time.monotonic() + self.close_timeout
+        for thread in self._threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        with self._lock:
+            self._closed = True
+            if any(thread.is_alive() for thread in self._threads):
+                logger.warning("Raw output still open after the end of the program, likely inherited by a background "
+                               "process, the rest is not captured", extra={"timeout": self.close_timeout})
+            for saved_fd in self._saved_fds.values():
+                os.close(saved_fd)
+            if self._file:
+                self._file.close()
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
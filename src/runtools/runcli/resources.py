@@ -0,0 +1,279 @@
+"""
+Resource usage accounting of the executed program (CPU time, memory, block I/O, context switches, output volume).
+
+The summary is computed from `getrusage(RUSAGE_CHILDREN)` of the wrapper process taken before and after the run.
+The program is executed and waited for (`wait4`) by the program phase, so the difference covers the program and
+all its descendants which were waited for by their parents. As the usage is process-wide, the summary is exact only
+when the wrapper runs a single program at a time (`run job`). The program is waited for by the program phase, not
+by the monitor, so the peak RSS of the program cannot be taken from its own `wait4` result: `ru_maxrss` of the
+children is the lifetime peak of all children of the wrapper and is used only when the run raised it (or no child
+was waited for before). With a memory limit (`--memory-max`), `memory.peak` of the cgroup of the program is
+the exact peak memory of the run.
+
+With a sample interval, the process tree of the wrapper is also sampled from `/proc` (Linux) while the program
+is running: each sample is logged as a `Resource sample` record and the summary includes the peak RSS of the whole
+tree (`ru_maxrss` is the peak of the largest single process only) and the bytes read from and written to storage.
+
+The summary and the samples are logged at the debug level (written to the log file by default), the summary is logged
+at the info level only when requested (`--resource-summary`), so it is shown on the terminal.
+"""
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from dataclasses import dataclass, asdict
+
+logger = logging.getLogger(__name__)
+
+_PROC = '/proc'
+_MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024  # `ru_maxrss` is in bytes on macOS, in KiB elsewhere
+
+
+@dataclass
+class ResourceUsage:
+    """
+    Attributes:
+        wall_time: seconds from the start to the end of the monitoring
+        cpu_user: CPU time in user mode in seconds
+        cpu_sys: CPU time in kernel mode in seconds
+        max_rss: peak resident set size of the largest process in bytes, None when a child waited for before
+            the run had a higher peak (then the peak of the run is unknown)
+        block_in: number of block input operations
+        block_out: number of block output operations
+        ctx_switches_vol: voluntary context switches (waiting for a resource)
+        ctx_switches_invol: involuntary context switches (preempted)
+        output_lines: number of output lines of the program (None if not counted)
+        output_bytes: bytes of output of the program (None if not counted)
+        peak_tree_rss: peak resident set size of the whole process tree in bytes (sampled)
+        read_bytes: bytes read from storage by the process tree (sampled, processes alive at the last sample)
+        write_bytes: bytes written to storage by the process tree (sampled, processes alive at the last sample)
+        samples: number of `/proc` samples taken
+        limit_events: limit events of the cgroup of the program (see `cgroup.Cgroup.limit_events`)
+        memory_peak: peak memory usage of the cgroup of the program in bytes (see `cgroup.Cgroup.memory_peak`)
+    """
+    wall_time: float
+    cpu_user: float
+    cpu_sys: float
+    max_rss: int
+    block_in: int
+    block_out: int
+    ctx_switches_vol: int
+    ctx_switches_invol: int
+    output_lines: int = None
+    output_bytes: int = None
+    peak_tree_rss: int = None
+    read_bytes: int = None
+    write_bytes: int = None
+    samples: int = 0
+    limit_events: dict = None
+    memory_peak: int = None
+
+    @property
+    def cpu_time(self):
+        return self.cpu_user + self.cpu_sys
+
+    def as_dict(self):
+        """Fields with known values, durations rounded to milliseconds (e.g. for log records)."""
+        usage = {k: v for k, v in asdict(self).items() if v is not None}
+        for key in ('wall_time', 'cpu_user', 'cpu_sys'):
+            usage[key] = round(usage[key], 3)
+        return usage
+
+
+class OutputCounter:
+    """
+    Output processor counting output lines, their bytes and the lines with fields parsed by the preceding
+    processors. Lines are returned unchanged.
+    """
+
+    def __init__(self):
+        self.lines = 0
+        self.bytes = 0
+        self.parsed = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, output_line):
+        message = output_line.message
+        size = (len(message) if message.isascii() else len(message.encode())) + 1  # +1: line separator
+        parsed = 1 if getattr(output_line, 'fields', None) else 0
+        with self._lock:
+            self.lines += 1
+            self.bytes += size
+            self.parsed += parsed
+        return output_line
+
+    def add_chunk(self, data):
+        """Count raw output data (see `rawoutput.RawOutputPump`)."""
+        with self._lock:
+            self.lines += data.count(b'\n')
+            self.bytes += len(data)
+
+
+class ResourceMonitor:
+    """
+    Context manager measuring the resource usage of the programs executed in its scope.
+    The result is available in the `usage` attribute after exit.
+    """
+
+    def __init__(self, job_id=None, run_id=None, *, sample_interval=None, output_counter=None, cgroup=None,
+                 summary=False):
+        self.job_id = job_id
+        self.run_id = run_id
+        self.sample_interval = sample_interval
+        self.output_counter = output_counter
+        self.cgroup = cgroup
+        self.summary = summary
+        self.usage = None
+        self._start = None
+        self._start_rusage = None
+        self._sampler = None
+
+    def __enter__(self):
+        self._start = time.monotonic()
+        self._start_rusage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        if self.sample_interval and os.path.isdir(_PROC):
+            self._sampler = _TreeSampler(self.sample_interval, self.job_id)
+            self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end = resource.getrusage(resource.RUSAGE_CHILDREN)
+        start = self._start_rusage
+        usage = ResourceUsage(
+            wall_time=time.monotonic() - self._start,
+            cpu_user=end.ru_utime - start.ru_utime,
+            cpu_sys=end.ru_stime - start.ru_stime,
+            max_rss=_run_max_rss(start.ru_maxrss, end.ru_maxrss),
+            block_in=end.ru_inblock - start.ru_inblock,
+            block_out=end.ru_oublock - start.ru_oublock,
+            ctx_switches_vol=end.ru_nvcsw - start.ru_nvcsw,
+            ctx_switches_invol=end.ru_nivcsw - start.ru_nivcsw,
+        )
+        if self.output_counter:
+            usage.output_lines, usage.output_bytes = self.output_counter.lines, self.output_counter.bytes
+        if self._sampler:
+            self._sampler.stop()
+            usage.peak_tree_rss = self._sampler.peak_rss
+            usage.read_bytes, usage.write_bytes = self._sampler.read_bytes, self._sampler.write_bytes
+            usage.samples = self._sampler.count
+        if self.cgroup:
+            usage.limit_events = self.cgroup.limit_events()
+            usage.memory_peak = self.cgroup.memory_peak()
+        self.usage = usage
+        logger.log(logging.INFO if self.summary else logging.DEBUG, "Resource usage", extra={"job": self.job_id, "run": self.run_id, **usage.as_dict()})
+
+
+def _run_max_rss(start_maxrss, end_maxrss):
+    """
+    `ru_maxrss` of the children is the peak of all children ever waited for, it can be attributed to the run only
+    when the run raised it or when no child was waited for before the run.
+    """
+    if end_maxrss > start_maxrss or not start_maxrss:
+        return end_maxrss * _MAXRSS_UNIT
+    return None
+
+
+class _TreeSampler(threading.Thread):
+    """Samples CPU time, RSS and storage I/O of all descendants of this process from `/proc`."""
+
+    def __init__(self, interval, job_id=None):
+        super().__init__(name='resource-sampler', daemon=True)
+        self.interval = interval
+        self.job_id = job_id
+        self.peak_rss = 0
+        self.read_bytes = None
+        self.write_bytes = None
+        self.count = 0
+        self._stopped = threading.Event()
+        self._page_size = os.sysconf('SC_PAGE_SIZE')
+        self._clock_ticks = os.sysconf('SC_CLK_TCK')
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def sample(self):
+        pids = descendants(os.getpid())
+        cpu_ticks = rss_pages = 0
+        read_bytes = write_bytes = None
+        for pid in pids:
+            stat = _read_stat(pid)
+            if not stat:
+                continue  # Exited in the meantime
+            cpu_ticks += stat[0]
+            rss_pages += stat[1]
+            if io := _read_io(pid):
+                read_bytes = (read_bytes or 0) + io[0]
+                write_bytes = (write_bytes or 0) + io[1]
+
+        rss = rss_pages * self._page_size
+        self.peak_rss = max(self.peak_rss, rss)
+        if read_bytes is not None:
+            self.read_bytes, self.write_bytes = read_bytes, write_bytes
+        self.count += 1
+        logger.debug("Resource sample", extra={
+            "job": self.job_id, "processes": len(pids), "cpu_time": round(cpu_ticks / self._clock_ticks, 3),
+            "rss": rss, "read_bytes": read_bytes, "write_bytes": write_bytes})
+
+
+def descendants(pid):
+    """
+    Returns:
+        PIDs of all live descendants of the process (empty when `/proc` is not available)
+    """
+    result = []
+    parents = [pid]
+    while parents:
+        children = []
+        for parent in parents:
+            children += _children(parent)
+        result += children
+        parents = children
+    return result
+
+
+def _children(pid):
+    children = []
+    try:
+        tasks = os.listdir(f"{_PROC}/{pid}/task")
+    except OSError:
+        return children
+    for tid in tasks:
+        try:
+            with open(f"{_PROC}/{pid}/task/{tid}/children") as f:
+                children += [int(c) for c in f.read().split()]
+        except OSError:
+            pass  # Task ended, or the kernel does not provide the `children` file
+    return children
+
+
+def _read_stat(pid):
+    """
+    Returns:
+        Tuple of (CPU ticks in user and kernel mode, RSS in pages), None if the process does not exist
+    """
+    try:
+        with open(f"{_PROC}/{pid}/stat") as f:
+            fields = f.read().rpartition(')')[2].split()  # The command name can contain spaces and parentheses
+        return int(fields[11]) + int(fields[12]), int(fields[21])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _read_io(pid):
+    """
+    Returns:
+        Tuple of (read bytes, written bytes) of storage I/O, None if not readable
+    """
+    try:
+        with open(f"{_PROC}/{pid}/io") as f:
+            io = dict(line.split(': ') for line in f.read().splitlines())
+        return int(io['read_bytes']), int(io['write_bytes'])
+    except (OSError, KeyError, ValueError):
+        return None
@@ -0,0 +1,50 @@
+"""
+Runtime directory of the `run` wrapper shared by its processes on this host: the daemon sockets (see `daemon`),
+the local queues (see `dispatch`) and the memory-mapped tail buffers (see `tailbuffer`).
+
+The directory is `$XDG_RUNTIME_DIR/runtools`, or `/tmp/runtools-<uid>` when `XDG_RUNTIME_DIR` is not set. As the path
+in `/tmp` is predictable, the directory is used only when it is owned by the user and not accessible by others.
+"""
+import os
+import stat
+from pathlib import Path
+
+from runtools.runcore.err import RuntoolsException
+
+RUNTIME_DIR_NAME = 'runtools'
+
+
+def runtime_dir(create=False):
+    """
+    Args:
+        create: create the directory (private to the user) if it does not exist and check that it is private
+
+    Raises:
+        InsecureDirectoryError: when created and the existing directory is not private to the user
+    """
+    xdg_runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if xdg_runtime_dir:
+        directory = Path(xdg_runtime_dir) / RUNTIME_DIR_NAME
+    else:
+        directory = Path('/tmp') / f"{RUNTIME_DIR_NAME}-{os.getuid()}"
+    if create:
+        directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        check_private_dir(directory)
+    return directory
+
+
+def check_private_dir(directory):
+    """
+    Raises:
+        InsecureDirectoryError: when the directory is not owned by the current user or is accessible by other users
+    """
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise InsecureDirectoryError(directory, st)
+
+
+class InsecureDirectoryError(RuntoolsException):
+
+    def __init__(self, directory, st):
+        super().__init__(f"Directory `{directory}` must be owned by the current user (uid {os.getuid()}) "
+                         f"with no access for others, found owner uid {st.st_uid} and mode {oct(st.st_mode & 0o777)}")
@@ -0,0 +1,188 @@
+"""
+Sharded fan-out of one job into parallel program processes (`--shards N`).
+
+The program phase of a sharded job executes the shard supervisor (`python -m runtools.runcli.shard N -- PROGRAM...`)
+instead of the program itself, so the job still has a single `EXEC` phase tracked as one instance. The supervisor
+starts N processes of the program, each with:
+    - `{shard}` and `{shards}` placeholders in the program arguments replaced by the shard index (0 to N-1) and N
+    - `RUN_SHARD` and `RUN_SHARDS` environment variables set to the same values
+    - standard input redirected from `/dev/null`
+
+Output lines of all shards are merged into the output of the supervisor (stdout to stdout, stderr to stderr), each
+prefixed with the shard tag `[shard i] `. A line is always written at once, so lines of different shards never
+interleave.
+
+When a shard fails, the remaining shards are terminated and the supervisor exits with the exit code of the first
+failed shard, which fails the job. Stopping the job terminates the supervisor, which terminates all the shards.
+"""
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+
+SHARD_PLACEHOLDER = '{shard}'
+SHARDS_PLACEHOLDER = '{shards}'
+ENV_SHARD = 'RUN_SHARD'
+ENV_SHARDS = 'RUN_SHARDS'
+
+_READ_SIZE = 64 * 1024
+_STOP_SIGNALS = (signal.SIGTERM, signal.SIGINT, signal.SIGHUP)
+
+
+def launcher_args(program_args, shards):
+    """
+    Returns:
+        Arguments of the program phase executing the program in the given number of shards
+    """
+    return [sys.executable, '-m', __name__, str(shards), '--', *program_args]
+
+
+def shard_args(program_args, shard, shards):
+    return [arg.replace(SHARD_PLACEHOLDER, str(shard)).replace(SHARDS_PLACEHOLDER, str(shards))
+            for arg in program_args]
+
+
+def shard_env(shard, shards, env=None):
+    return {**(os.environ if env is None else env), ENV_SHARD: str(shard), ENV_SHARDS: str(shards)}
+
+
+def exit_code(returncode):
+    """Exit code of the shell convention for a `Popen` return code (128+N for a process killed by signal N)."""
+    return 128 - returncode if returncode < 0 else returncode
+
+
+class ShardSupervisor:
+
+    def __init__(self, program_args, shards, *, stdout=None, stderr=None):
+        if shards < 1:
+            raise ValueError("Number of shards must be at least 1")
+        self.program_args = list(program_args)
+        self.shards = shards
+        self._stdout = _LineMerger(stdout if stdout is not None else sys.stdout.buffer)
+        self._stderr = _LineMerger(stderr if stderr is not None else sys.stderr.buffer)
+        self._processes = {}
+        self._lock = threading.Lock()
+        self._stopping = False
+        self._stop_signal = None  # Signal which stopped the supervisor
+
+    def run(self):
+        """
+        Execute all shards and wait for them to finish.
+
+        Returns:
+            0 if all shards succeeded, otherwise the exit code of the first failed shard
+            (128+N when the supervisor was stopped by signal N)
+        """
+        exits = queue.Queue()
+        threads = []
+        result = 0
+        with self._lock:
+            for shard in range(self.shards):
+                if self._stopping:
+                    break
+                try:
+                    process = subprocess.Popen(
+                        shard_args(self.program_args, shard, self.shards), env=shard_env(shard, self.shards),
+                        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                except OSError as e:
+                    self._stderr.message(shard, f"cannot be started: {e}")
+                    result = 127
+                    self._stop_processes(signal.SIGTERM)
+                    break
+                self._processes[shard] = process
+                tag = f"[shard {shard}] ".encode()
+                threads += [_start_thread(self._stdout.pump, process.stdout, tag),
+                            _start_thread(self._stderr.pump, process.stderr, tag),
+                            _start_thread(_wait, shard, process, exits)]
+        if self._stop_signal:
+            self._stop_processes(self._stop_signal)  # Stopped by a signal while starting the shards
+
+        for _ in range(len(self._processes)):
+            shard, returncode = exits.get()
+            if returncode == 0 or self._stopping:
+                continue
+            if not result:
+                result = exit_code(returncode)
+                self._stderr.message(shard, f"failed with exit code {result}, stopping remaining shards")
+            self.stop()
+        for thread in threads:
+            thread.join()
+        return 128 + self._stop_signal if self._stop_signal else result
+
+    def stop(self, signum=signal.SIGTERM):
+        """Terminate all running shards by the given signal (can be called from a signal handler)."""
+        self._stopping = True
+        if self._lock.acquire(blocking=False):  # Not re-entered from a signal handler interrupting `run`
+            try:
+                self._stop_processes(signum)
+            finally:
+                self._lock.release()
+
+    def _stop_processes(self, signum):
+        self._stopping = True
+        for process in self._processes.values():
+            if process.poll() is None:
+                try:
+                    process.send_signal(signum)
+                except ProcessLookupError:
+                    pass
+
+    def handle_signal(self, signum, _):
+        self._stop_signal = signum
+        self.stop(signum)
+
+
+def _start_thread(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+def _wait(shard, process, exits):
+    exits.put((shard, process.wait()))
+
+
+class _LineMerger:
+    """Writes complete lines of several sources into one binary stream, each line prefixed with its source tag."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._lock = threading.Lock()
+
+    def pump(self, pipe, tag):
+        pending = b''
+        with pipe:
+            while chunk := pipe.read1(_READ_SIZE):
+                data = pending + chunk
+                end = data.rfind(b'\n') + 1
+                pending = data[end:]
+                if end:
+                    self._write(data[:end], tag)
+        if pending:
+            self._write(pending + b'\n', tag)
+
+    def message(self, shard, text):
+        self._write(f"{text}\n".encode(), f"[shard {shard}] ".encode())
+
+    def _write(self, lines, tag):
+        tagged = tag + lines[:-1].replace(b'\n', b'\n' + tag) + b'\n'
+        with self._lock:
+            self._stream.write(tagged)
+            self._stream.flush()
+
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) < 3 or args[1] != '--' or not args[0].isdigit() or int(args[0]) < 1:
+        print("usage: python -m runtools.runcli.shard SHARDS -- PROGRAM [ARG...]", file=sys.stderr)
+        return 2
+    supervisor = ShardSupervisor(args[2:], int(args[0]))
+    for signum in _STOP_SIGNALS:
+        signal.signal(signum, supervisor.handle_signal)
+    return supervisor.run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
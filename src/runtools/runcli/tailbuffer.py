@@ -0,0 +1,290 @@
+"""
+Tail buffer of recent job output kept in a memory-mapped file, readable by other processes while the job runs.
+
+The file is created in the `tail` subdirectory of the runtime directory (`$XDG_RUNTIME_DIR/runtools`, see
+`runtime.runtime_dir`) and removed when the job ends. Its layout:
+
+    header (64 bytes, little-endian):
+        magic       4s  b'RTTB'
+        version     H
+        reserved    H
+        capacity    Q   size of the data area
+        offset      Q   total number of bytes ever written (write position = offset % capacity)
+        generation  Q   incremented before and after each write, odd while a write is in progress
+        pid         Q   writer process
+        start time  Q   start time of the writer process (clock ticks since boot), 0 if unknown
+    data area (capacity bytes): ring buffer
+
+Readers use the generation as a sequence lock: the data are copied and the copy is used only when the generation
+is the same even number before and after copying.
+
+A file of a killed job is not removed by the job. The readers check whether the writer process (identified by
+the pid and its start time, so a reused pid is not mistaken for the writer) is still alive and remove such stale
+files when listing the buffers and when following one.
+"""
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from pathlib import Path
+
+from runtools.runcore.err import RuntoolsException
+
+from runtools.runcli.runtime import runtime_dir
+
+TAIL_DIR_NAME = 'tail'
+TAIL_FILE_SUFFIX = '.tail'
+DEF_CAPACITY = 2 * 1024 * 1024
+
+MAGIC = b'RTTB'
+VERSION = 2
+HEADER_SIZE = 64
+_HEADER = struct.Struct('<4sHHQQQQQ')
+_COUNTERS = struct.Struct('<QQ')  # offset, generation
+_COUNTERS_POS = 16
+
+_READ_RETRIES = 100
+
+
+def tail_dir(create=False):
+    return runtime_dir(create) / TAIL_DIR_NAME
+
+
+def tail_path(job_id, run_id=None, create_dir=False):
+    name = re.sub(r'[^\w.@-]+', '_', f"{job_id}@{run_id}" if run_id else f"{job_id}@{os.getpid()}")
+    return tail_dir(create_dir) / f"{name}{TAIL_FILE_SUFFIX}"
+
+
+def find_tail_files(instance=None):
+    """
+    Files of writers which are not alive anymore are removed, files with an unknown header are skipped.
+
+    Args:
+        instance: job ID or `job_id@run_id`, all running jobs if not specified
+
+    Returns:
+        Paths of the tail buffer files of the currently running jobs matching the instance, sorted by name
+    """
+    files = sorted(tail_dir().glob(f"*{TAIL_FILE_SUFFIX}"))
+    if instance:
+        name = re.sub(r'[^\w.@-]+', '_', instance)
+        files = [f for f in files if f.stem == name or f.stem.startswith(name + '@')]
+    running = []
+    for file in files:
+        writer = _read_writer(file)
+        if writer is None:
+            continue
+        if _is_alive(*writer):
+            running.append(file)
+        else:
+            file.unlink(missing_ok=True)
+    return running
+
+
+def _read_writer(path):
+    """
+    Returns:
+        Tuple of (pid, start time) of the writer of the tail buffer file, None if the file has no valid header
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+    except OSError:
+        return None
+    if len(header) < _HEADER.size:
+        return None
+    magic, version, _, _, _, _, pid, start_time = _HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        return None
+    return pid, start_time
+
+
+def _process_start_time(pid):
+    """
+    Returns:
+        Start time of the process in clock ticks since boot, 0 if not available (no `/proc`)
+    """
+    try:
+        with open(f"/proc/{pid}/stat", 'rb') as f:
+            stat = f.read()
+    except OSError:
+        return 0
+    return int(stat[stat.rindex(b')') + 2:].split()[19])  # Field 22, the fields after the name start by the 3rd
+
+
+def _is_alive(pid, start_time=0):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return not start_time or _process_start_time(pid) in (0, start_time)
+
+
+def last_lines(data, count):
+    """
+    Returns:
+        The last `count` lines of the data (the last one can be incomplete), like `tail -n`
+    """
+    if count <= 0:
+        return b''
+    pos = len(data) - 1 if data.endswith(b'\n') else len(data)
+    for _ in range(count):
+        pos = data.rfind(b'\n', 0, pos)
+        if pos < 0:
+            return data
+    return data[pos + 1:]
+
+
+class MmapTailBuffer:
+    """Writer of the memory-mapped tail buffer, safe to be used from multiple threads of the owning process."""
+
+    def __init__(self, path, capacity=DEF_CAPACITY):
+        if capacity <= 0:
+            raise ValueError("Tail buffer capacity must be positive")
+        self.path = Path(path)
+        self.capacity = capacity
+        self.path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, HEADER_SIZE + capacity)
+            self._map = mmap.mmap(fd, HEADER_SIZE + capacity)
+        finally:
+            os.close(fd)
+        pid = os.getpid()
+        _HEADER.pack_into(self._map, 0, MAGIC, VERSION, 0, capacity, 0, 0, pid, _process_start_time(pid))
+        self._offset = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def write(self, data):
+        if not data:
+            return
+        with self._lock:
+            self._write(data)
+
+    def _write(self, data):
+        size = len(data)
+        if size > self.capacity:
+            data = data[-self.capacity:]
+        offset = self._offset + size
+        start = (offset - len(data)) % self.capacity
+
+        self._generation += 1
+        _COUNTERS.pack_into(self._map, _COUNTERS_POS, self._offset, self._generation)
+        first = min(len(data), self.capacity - start)
+        self._map[HEADER_SIZE + start:HEADER_SIZE + start + first] = data[:first]
+        if first < len(data):
+            self._map[HEADER_SIZE:HEADER_SIZE + len(data) - first] = data[first:]
+        self._offset = offset
+        self._generation += 1
+        _COUNTERS.pack_into(self._map, _COUNTERS_POS, self._offset, self._generation)
+
+    def snapshot(self):
+        with self._lock:
+            return _ring_bytes(self._map, self.capacity, self._offset, self._offset)
+
+    def close(self, remove=True):
+        with self._lock:
+            if self._map.closed:
+                return
+            self._map.close()
+        if remove:
+            self.path.unlink(missing_ok=True)
+
+
+class TailBufferWriter:
+    """Output processor copying the captured output lines into a tail buffer. Lines are returned unchanged."""
+
+    def __init__(self, tail_buffer):
+        self.tail_buffer = tail_buffer
+
+    def __call__(self, output_line):
+        self.tail_buffer.write(output_line.message.encode() + b'\n')
+        return output_line
+
+
+class TailReader:
+    """Reader of a memory-mapped tail buffer of another process."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        try:
+            with open(self.path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise TailBufferError(f"Cannot open tail buffer `{path}`: {e}")
+        magic, version, _, self.capacity, _, _, self.pid, self.start_time = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise TailBufferError(f"Not a tail buffer file (or unsupported version): {path}")
+
+    def writer_alive(self):
+        return _is_alive(self.pid, self.start_time)
+
+    def read(self, since=0):
+        """
+        Read the buffered data written after the `since` offset (everything still buffered for 0).
+
+        Returns:
+            Tuple of (data, offset) where offset is to be passed as `since` to the next call
+        """
+        for _ in range(_READ_RETRIES):
+            offset, generation = _COUNTERS.unpack_from(self._map, _COUNTERS_POS)
+            if generation % 2:
+                time.sleep(0)
+                continue
+            data = _ring_bytes(self._map, self.capacity, offset, offset - since)
+            if _COUNTERS.unpack_from(self._map, _COUNTERS_POS) == (offset, generation):
+                return data, offset
+        raise TailBufferError(f"Tail buffer is changing too fast to be read consistently: {self.path}")
+
+    def follow(self, poll_interval=0.2):
+        """
+        Yield data chunks as they are written until the buffer file is removed (the job ended) or the writer process
+        is not alive anymore (the job was killed, the stale file is removed).
+        """
+        return self.follow_from(0, poll_interval)
+
+    def follow_from(self, offset, poll_interval=0.2):
+        """Like `follow` but yielding only the data written after the `offset` returned by `read`."""
+        while True:
+            # Checked before reading, so the data written before the removal or the death of the writer are read
+            removed = not self.path.exists()
+            killed = not removed and not self.writer_alive()
+            data, offset = self.read(offset)
+            if data:
+                yield data
+            if killed:
+                self.path.unlink(missing_ok=True)
+            if removed or killed:
+                return
+            time.sleep(poll_interval)
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _ring_bytes(buf, capacity, offset, size):
+    """Return the last `size` bytes (at most capacity) of the ring ending at `offset`."""
+    size = min(size, capacity, offset)
+    if size <= 0:
+        return b''
+    end = offset % capacity or capacity
+    if size <= end:
+        return bytes(buf[HEADER_SIZE + end - size:HEADER_SIZE + end])
+    head = size - end
+    return bytes(buf[HEADER_SIZE + capacity - head:HEADER_SIZE + capacity]) + bytes(buf[HEADER_SIZE:HEADER_SIZE + end])
+
+
+class TailBufferError(RuntoolsException):
+    pass
@@ -0,0 +1,117 @@
+"""
+Timing trace of the `run` wrapper activated by the `--profile` option.
+
+Spans are recorded only when a tracer is started, otherwise `span()` is a no-op. The trace is written in the Chrome
+trace event format, which can be opened in `chrome://tracing` or https://ui.perfetto.dev.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+MAX_OUTPUT_SPANS = 10_000
+
+_tracer = None
+
+
+class Tracer:
+
+    def __init__(self, origin_ns=None):
+        self.origin_ns = origin_ns or time.perf_counter_ns()
+        self._epoch_offset_us = time.time_ns() // 1000 - (time.perf_counter_ns() - self.origin_ns) // 1000
+        self.events = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def complete(self, name, start_ns, end_ns, cat='wrapper', args=None):
+        """Record a finished span, times are `time.perf_counter_ns()` values."""
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": self._epoch_offset_us + (start_ns - self.origin_ns) // 1000,
+            "dur": (end_ns - start_ns) / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    def drop(self):
+        """Count a span not recorded."""
+        with self._lock:
+            self.dropped += 1
+
+    @contextmanager
+    def span(self, name, cat='wrapper', **args):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.complete(name, start, time.perf_counter_ns(), cat, args)
+
+    def write(self, path):
+        trace = {"traceEvents": self.events, "displayTimeUnit": "ms", "otherData": {"dropped_spans": self.dropped}}
+        with open(path, 'w') as f:
+            json.dump(trace, f, default=str)
+
+
+class TracedOutputProcessor:
+    """
+    Output processor recording the time spent in the wrapped processor. Only the first spans are recorded.
+    Called by the reader threads of both the stdout and stderr of the program.
+    """
+
+    def __init__(self, tracer, processor, max_spans=MAX_OUTPUT_SPANS):
+        self.tracer = tracer
+        self.processor = processor
+        self.name = f"output:{type(processor).__name__}"
+        self._remaining = max_spans
+        self._lock = threading.Lock()
+
+    def __call__(self, output_line):
+        with self._lock:
+            recorded = self._remaining > 0
+            if recorded:
+                self._remaining -= 1
+        if not recorded:
+            self.tracer.drop()
+            return self.processor(output_line)
+
+        start = time.perf_counter_ns()
+        try:
+            return self.processor(output_line)
+        finally:
+            self.tracer.complete(self.name, start, time.perf_counter_ns(), 'output')
+
+
+def start(origin_ns=None):
+    global _tracer
+    _tracer = Tracer(origin_ns)
+    return _tracer
+
+
+def stop():
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def active():
+    return _tracer
+
+
+def span(name, cat='wrapper', **args):
+    """Context manager recording a span if a tracer is active, no-op otherwise."""
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.span(name, cat, **args)
+
+
+def trace_output_processors(output_processors):
+    if _tracer is None:
+        return output_processors
+    return tuple(TracedOutputProcessor(_tracer, p) for p in output_processors)
@@ -0,0 +1,45 @@
+import signal
+import threading
+import time
+
+from runtools.runcli.admission import AdmissionConditions, AdmissionWaiter
+
+_NEVER_MET = AdmissionConditions(min_free_mem=2 ** 62)
+
+
+def test_timeout():
+    waiter = AdmissionWaiter(_NEVER_MET, 'job')
+
+    assert not waiter.wait(0.2)
+    assert not waiter.interrupted
+    assert 0.2 <= waiter.wait_time < 2
+
+
+def test_met_conditions_admitted_at_once():
+    waiter = AdmissionWaiter(AdmissionConditions(min_free_mem=0), 'job')
+
+    assert waiter.wait(5)
+    assert waiter.wait_time < 1
+
+
+def test_interrupted_from_signal_handler():
+    waiter = AdmissionWaiter(_NEVER_MET, 'job')
+    previous = signal.signal(signal.SIGALRM, lambda _, __: waiter.interrupt())
+    signal.setitimer(signal.ITIMER_REAL, 0.3)
+    try:
+        start = time.monotonic()
+        assert not waiter.wait(30)
+        assert time.monotonic() - start < 2
+        assert waiter.interrupted
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def test_interrupted_from_another_thread():
+    waiter = AdmissionWaiter(_NEVER_MET, 'job')
+    threading.Timer(0.3, waiter.interrupt).start()
+
+    start = time.monotonic()
+    assert not waiter.wait()
+    assert time.monotonic() - start < 2
@@ -0,0 +1,49 @@
+from pathlib import Path
+
+import pytest
+
+BENCHMARKS_DIR = Path(__file__).parent.parent / 'benchmarks'
+
+
+@pytest.fixture
+def suite(monkeypatch):
+    monkeypatch.syspath_prepend(str(BENCHMARKS_DIR))
+    import suite
+    return suite
+
+
+def test_regression_independent_of_metric_direction(suite):
+    assert suite.regression(120.0, 'ms', 100.0) == pytest.approx(0.2)  # Slower
+    assert suite.regression(80.0, 'lines/s', 100.0) == pytest.approx(0.2)  # Lower throughput
+    assert suite.regression(120.0, 'lines/s', 100.0) == pytest.approx(-0.2)
+    assert suite.regression(1.0, 'ms', 0.0) == 0.0
+
+
+def test_run_only_selected_metrics(suite, monkeypatch):
+    called = []
+
+    def bench(name, *metrics):
+        def run(repeat):
+            called.append(name)
+            return {metric: (1.0, 'ms') for metric in metrics}
+        return run
+
+    monkeypatch.setattr(suite, 'BENCHMARKS', {
+        'startup': bench('startup', 'startup.job', 'startup.log'),
+        'parser': bench('parser', 'parser.default'),
+    })
+
+    assert suite.run(['startup.job']) == {'startup.job': (1.0, 'ms')}
+    assert called == ['startup']
+    assert set(suite.run()) == {'startup.job', 'startup.log', 'parser.default'}
+
+
+def test_formatter_benchmark_metrics(suite):
+    import formatters
+    records = formatters.create_records(300)
+    formatters.verify_identical(formatters.ReferenceJsonFormatter(), formatters.optimized_formatters()[0][1], records)
+
+    metrics = suite.bench_formatter(1)
+
+    assert {'formatter.json', 'formatter.plain'} <= set(metrics)
+    assert all(value > 0 and unit == 'records/s' for value, unit in metrics.values())
@@ -0,0 +1,36 @@
+import sys
+import types
+
+import pytest
+
+from runtools import runcore
+from runtools.runcli import cfg
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setattr(cfg, '_cache', None)
+    return tmp_path / 'cache'
+
+
+def test_cache_in_xdg_cache_dir(cache_home):
+    assert cfg.cache_path() == cache_home / 'runtools' / cfg.CACHE_FILE
+
+
+def test_env_configs_read_through_cache(tmp_path, monkeypatch):
+    parsed = []
+    env = types.ModuleType('runtools.runcore.env')
+    env.read_toml_file = lambda path: parsed.append(path)
+    monkeypatch.setitem(sys.modules, 'runtools.runcore.env', env)
+    monkeypatch.setattr(runcore, 'env', env, raising=False)
+    monkeypatch.setattr(cfg, 'read_toml_file', lambda path: parsed.append(path) or {'id': 'prod'})
+    env_file = tmp_path / 'env.toml'
+    env_file.write_text("id = 'prod'\n")
+
+    cfg.cache_env_configs()
+
+    assert env.read_toml_file(env_file) == {'id': 'prod'}
+    assert env.read_toml_file(env_file) == {'id': 'prod'}
+    assert parsed == [env_file]  # Parsed once, then loaded from the cache
+    assert cfg.cache_status() == [(str(env_file), 'valid')]
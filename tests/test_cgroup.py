@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from runtools.runcli import cgroup, launch
+from runtools.runcli.cgroup import CgroupLimits
+
+
+@pytest.fixture
+def root(tmp_path):
+    """Delegated subtree with all controllers available, none enabled for its children."""
+    (tmp_path / 'cgroup.controllers').write_text('cpuset cpu io memory pids\n')
+    (tmp_path / 'cgroup.subtree_control').write_text('')
+    return tmp_path
+
+
+def test_limit_files_written_to_leaf(root):
+    limits = CgroupLimits(cpu_max=1.5, memory_max=1 << 30, io_weight=50, pids_max=64)
+
+    created = cgroup.create_cgroup('backup job', 'r1', limits, root=root)
+
+    assert created.path == root / cgroup.BASE_NAME / f"backup_job@r1.{os.getpid()}"
+    assert {f.name: f.read_text() for f in created.path.iterdir()} == {
+        'cpu.max': '150000 100000',
+        'memory.max': str(1 << 30),
+        'memory.oom.group': '1',
+        'io.weight': 'default 50',
+        'pids.max': '64',
+    }
+    assert (root / 'cgroup.subtree_control').read_text() == '+cpu +memory +io +pids'
+    assert (root / cgroup.BASE_NAME / 'cgroup.subtree_control').read_text() == '+cpu +memory +io +pids'
+
+
+def test_only_used_controllers_enabled(root):
+    (root / 'cgroup.subtree_control').write_text('memory\n')
+
+    created = cgroup.create_cgroup('job', None, CgroupLimits(cpu_max=0.001, memory_max=1024), root=root)
+
+    assert (root / 'cgroup.subtree_control').read_text() == '+cpu'  # Memory already enabled
+    assert (created.path / 'cpu.max').read_text() == '1000 100000'  # Lower bound of the kernel
+    assert created.path.name == f"job.{os.getpid()}"
+
+
+def test_missing_controller_not_applied(root, caplog):
+    (root / 'cgroup.controllers').write_text('cpu memory\n')
+
+    assert cgroup.create_cgroup('job', None, CgroupLimits(pids_max=10), root=root) is None
+    assert not (root / cgroup.BASE_NAME).exists()
+    assert 'controllers not available: pids' in caplog.records[-1].errors[0]
+
+
+def test_leaf_removed_when_limit_not_written(root, monkeypatch):
+    monkeypatch.setattr(CgroupLimits, 'settings', lambda _: {'missing/pids.max': '10'})  # Write of the file fails
+
+    with pytest.raises(OSError):
+        cgroup._create_leaf(root, 'job', None, CgroupLimits(pids_max=10))
+    assert not (root / cgroup.BASE_NAME / f"job.{os.getpid()}").exists()
+
+
+def test_launcher_moves_itself_into_cgroup(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, 'sched_getaffinity', lambda _: {0})
+
+    launch._apply({'cgroup': str(tmp_path)})
+
+    assert (tmp_path / 'cgroup.procs').read_text() == '0'
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+import types
+from argparse import Namespace
+
+from runtools.runcli import cli, cmd
+
+
+def _modules_after(code):
+    """Names of the runtools and rich modules imported by the code executed in a fresh interpreter."""
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)}
+    script = code + "\nprint(' '.join(m for m in sys.modules if m.startswith(('runtools', 'rich'))))"
+    result = subprocess.run([sys.executable, '-c', 'import sys\n' + script], env=env, capture_output=True,
+                            text=True, check=True)
+    return set(result.stdout.split())
+
+
+def test_only_requested_subcommand_parser_built():
+    assert cli._subcommand_parsers(['tail', '-f']) == [cli._SUBCOMMAND_PARSERS['tail']]
+    assert cli._subcommand_parsers(['--help']) == list(cli._SUBCOMMAND_PARSERS.values())
+    assert cli._subcommand_parsers([]) == list(cli._SUBCOMMAND_PARSERS.values())
+
+
+def test_parsing_imports_neither_rich_nor_subcommands():
+    modules = _modules_after("from runtools.runcli import cli\ncli.parse_args(['job', '--', 'ls', '-l'])")
+
+    assert 'runtools.runcli.cli' in modules
+    assert not {m for m in modules if m.startswith('rich')}
+    assert not {m for m in modules if m.startswith(('runtools.runjob', 'runtools.runcli.cmd.'))}
+
+
+def test_moved_functions_imported_on_first_access():
+    modules = _modules_after("import runtools.runcli")
+    assert 'runtools.runcli.cmd.log' not in modules
+
+    modules = _modules_after("import runtools.runcli\nruntools.runcli.run_log")
+    assert 'runtools.runcli.cmd.log' in modules
+    assert 'runtools.runcli.cmd.job' not in modules
+
+
+def test_dispatch_runs_module_of_action(monkeypatch):
+    called = []
+    module = types.ModuleType('runtools.runcli.cmd.queue')
+    module.run = called.append
+    monkeypatch.setitem(sys.modules, 'runtools.runcli.cmd.queue', module)
+    args = Namespace(action='queue')
+
+    cmd.run(args)
+
+    assert called == [args]
@@ -0,0 +1,136 @@
+import json
+import os
+import signal
+import socket
+import threading
+import time
+
+import pytest
+
+from runtools.runcli import daemon
+
+
+def _fake_run(argv):
+    """Replaces the execution of `run` in the forked worker, the protocol is exercised without running real jobs."""
+    command, *args = argv
+    if command == 'echo':
+        os.write(1, ' '.join(args).encode())
+        return 0
+    if command == 'env':
+        os.write(1, os.environ.get(args[0], '').encode())
+        return 0
+    if command == 'exit':
+        return int(args[0])
+    if command == 'wait-file':
+        while not os.path.exists(args[0]):
+            time.sleep(0.01)
+        return 0
+    if command == 'wait-signal':
+        received = []
+        signal.signal(signal.SIGTERM, lambda signum, _: received.append(signum))
+        open(args[0], 'w').close()  # Ready for the signal
+        while not received:
+            time.sleep(0.01)
+        return 128 + received[0]
+    return 127
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+    monkeypatch.setattr(daemon._JobRequestHandler, '_run', staticmethod(_fake_run))
+    path = daemon.socket_path()
+    path.parent.mkdir(mode=0o700)
+    srv = daemon._ForkingUnixStreamServer(str(path), daemon._JobRequestHandler)
+    pid = os.fork()  # The daemon serves from the main thread of its own process like `daemon.serve`
+    if pid == 0:
+        try:
+            srv.serve_forever()
+        finally:
+            os._exit(0)
+    srv.server_close()
+    yield path
+    os.kill(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+
+
+def test_stdout_passed(server, capfd):
+    assert daemon.submit(['echo', 'hello', 'daemon']) == 0
+    assert capfd.readouterr().out == 'hello daemon'
+
+
+def test_environment_passed(server, capfd, monkeypatch):
+    monkeypatch.setenv('RUNCLI_TEST_VAR', 'client value')
+    assert daemon.submit(['env', 'RUNCLI_TEST_VAR']) == 0
+    assert capfd.readouterr().out == 'client value'
+
+
+def test_exit_code(server):
+    assert daemon.submit(['exit', '3']) == 3
+
+
+def test_signal_forwarded(server, tmp_path):
+    ready = tmp_path / 'ready'
+    original = signal.getsignal(signal.SIGTERM)
+
+    def send_signal():
+        while not ready.exists():
+            time.sleep(0.01)
+        os.kill(os.getpid(), signal.SIGTERM)  # Received by the client, forwarded to the worker
+
+    threading.Thread(target=send_signal, daemon=True).start()
+    assert daemon.submit(['wait-signal', str(ready)]) == 128 + signal.SIGTERM
+    assert signal.getsignal(signal.SIGTERM) == original
+
+
+def test_not_running(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+    assert daemon.submit(['exit', '0']) is None
+    assert not daemon.is_running()
+
+
+def test_insecure_socket_dir_not_used(server):
+    server.parent.chmod(0o755)
+    assert daemon.submit(['exit', '0']) is None
+    with pytest.raises(daemon.InsecureDirectoryError):
+        daemon.check_private_dir(server.parent)
+
+
+def test_is_running_by_pid_file(server):
+    assert not daemon.is_running()
+    daemon.pid_path().write_text(str(os.getpid()))
+    assert daemon.is_running()
+
+
+def _send_job(path, argv):
+    """Submit like `daemon.submit`, without waiting for the exit code and replacing the signal handlers."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(10)  # Fail instead of hanging when the daemon stops accepting
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            sock.connect(str(path))
+            break
+        except BlockingIOError:  # Backlog of the listening socket full
+            assert time.monotonic() < deadline, "Connection not accepted"
+            time.sleep(0.01)
+    payload = json.dumps({"argv": argv, "env": dict(os.environ), "cwd": os.getcwd()}).encode()
+    socket.send_fds(sock, [daemon._UINT.pack(len(payload))], [0, 1, 2])
+    sock.sendall(payload)
+    return sock
+
+
+def _exit_code(sock):
+    with sock:
+        return daemon._UINT.unpack(daemon._recv_exact(sock, daemon._UINT.size))[0]
+
+
+def test_more_workers_than_forking_mixin_default(server, tmp_path):
+    release = tmp_path / 'release'
+    try:
+        waiting = [_send_job(server, ['wait-file', str(release)]) for _ in range(50)]  # Over the default of 40
+
+        assert _exit_code(_send_job(server, ['exit', '7'])) == 7  # Still accepted and served
+    finally:
+        release.touch()  # The workers end also when the test fails
+    assert [_exit_code(sock) for sock in waiting] == [0] * 50
@@ -0,0 +1,125 @@
+import multiprocessing
+import time
+
+import pytest
+
+from runtools.runcli import dispatch
+from runtools.runcli.dispatch import LocalDispatcher
+
+_ctx = multiprocessing.get_context('fork')
+
+
+def _run_waiter(directory, max_concurrent, priority, hold, results):
+    dispatcher = LocalDispatcher('test', max_concurrent, priority=priority, directory=directory, recheck_interval=1.0)
+    with dispatcher.slot() as ticket:
+        results.put((ticket.name, 'start', time.monotonic()))
+        time.sleep(hold)
+        results.put((ticket.name, 'end', time.monotonic()))
+
+
+def _start_waiters(directory, max_concurrent, priorities, hold=0.05):
+    """Start the waiters one by one, each is in the queue before the next one is started (deterministic arrival)."""
+    LocalDispatcher('test', max_concurrent, directory=directory)  # Creates the queue directories
+    results = _ctx.Queue()
+    processes = []
+    for priority in priorities:
+        process = _ctx.Process(target=_run_waiter, args=(directory, max_concurrent, priority, hold, results))
+        process.start()
+        processes.append(process)
+        _wait_until(lambda: not process.is_alive() or _in_queue(directory, process.pid))
+    return processes, results
+
+
+def _in_queue(directory, pid):
+    running, waiting = dispatch.group_status(directory)
+    return any(entry.pid == pid for entry in running + waiting)
+
+
+def _wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Condition not met in time"
+        time.sleep(0.005)
+
+
+def _collect(processes, results):
+    events = [results.get(timeout=30) for _ in range(len(processes) * 2)]
+    for process in processes:
+        process.join(10)
+        assert process.exitcode == 0
+    return sorted(events, key=lambda e: e[2])
+
+
+def _pid(ticket_name):
+    return dispatch.QueueEntry.parse(ticket_name).pid
+
+
+@pytest.mark.parametrize('max_concurrent', [1, 3])
+def test_at_most_max_concurrent_hold_slot(tmp_path, max_concurrent):
+    processes, results = _start_waiters(tmp_path, max_concurrent, [0] * 12, hold=0.05)
+    events = _collect(processes, results)
+
+    holding = peak = 0
+    for _, kind, _ in events:
+        holding += 1 if kind == 'start' else -1
+        peak = max(peak, holding)
+    assert peak <= max_concurrent
+    assert {_pid(name) for name, _, _ in events} == {p.pid for p in processes}
+
+
+def test_fifo_order(tmp_path):
+    blocker = LocalDispatcher('test', 1, directory=tmp_path)
+    ticket = blocker.acquire()  # All waiters are queued behind the held slot
+    processes, results = _start_waiters(tmp_path, 1, [0] * 6)
+    blocker.release(ticket)
+    events = _collect(processes, results)
+
+    assert [_pid(name) for name, kind, _ in events if kind == 'start'] == [p.pid for p in processes]
+
+
+def test_priority_order(tmp_path):
+    blocker = LocalDispatcher('test', 1, directory=tmp_path)
+    ticket = blocker.acquire()
+    processes, results = _start_waiters(tmp_path, 1, [0, 5, 1, 5])
+    blocker.release(ticket)
+    events = _collect(processes, results)
+
+    expected = [processes[i].pid for i in (1, 3, 2, 0)]  # Higher priority first, then by arrival
+    assert [_pid(name) for name, kind, _ in events if kind == 'start'] == expected
+
+
+def test_acquire_timeout(tmp_path):
+    blocker = LocalDispatcher('test', 1, directory=tmp_path)
+    ticket = blocker.acquire()
+    waiter = LocalDispatcher('test', 1, directory=tmp_path)
+
+    assert waiter.acquire(timeout=0.1) is None
+    assert not waiter.interrupted
+    assert dispatch.group_status(tmp_path)[1] == []  # Left the queue
+    blocker.release(ticket)
+
+
+def test_queue_dir_keyed_by_env(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+
+    assert dispatch.queue_dir('g', 'prod') != dispatch.queue_dir('g', 'test')
+    assert dispatch.queue_dir('g') == dispatch.queue_dir('g', 'default')
+    LocalDispatcher('g', env_id='prod')
+    assert dispatch.list_groups('prod') == [dispatch.queue_dir('g', 'prod')]
+    assert dispatch.list_groups('test') == []
+    assert (tmp_path / 'runtools').stat().st_mode & 0o777 == 0o700
+
+
+def test_waiting_reports_position_and_effective_priority(tmp_path):
+    blocker = LocalDispatcher('test', 1, directory=tmp_path)
+    ticket = blocker.acquire()
+    reported = []
+    waiter = LocalDispatcher('test', 1, priority=3, aging=0.1, directory=tmp_path, recheck_interval=0.05,
+                             on_waiting=lambda position, priority: reported.append((position, priority)))
+
+    assert waiter.acquire(timeout=0.35) is None
+    assert reported[0] == (1, 3)
+    assert [position for position, _ in reported] == [1] * len(reported)
+    assert [priority for _, priority in reported] == sorted(set(priority for _, priority in reported))
+    assert reported[-1][1] >= 5  # Aged by one level per 0.1 s
+    blocker.release(ticket)
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from runtools.runcli import launch
+from runtools.runcli.launch import LaunchOptions
+
+
+def test_options_args_parsed_back():
+    options = LaunchOptions(cgroup='/sys/fs/cgroup/job', cpus=[0, 1, 2, 5], cpu_slot_dir='/run/slots', cpu_slots=2,
+                            nice=5, ionice=(2, 7), numa_node=1)
+
+    parsed, program_args = launch._parse_args([*options.args(), '--', 'ls', '--', '-l'])
+
+    assert parsed == {'cgroup': '/sys/fs/cgroup/job', 'numa-node': '1', 'cpus': '0-2,5', 'cpu-slot-dir': '/run/slots',
+                      'cpu-slots': '2', 'nice': '5', 'ionice': '2:7'}
+    assert program_args == ['ls', '--', '-l']
+
+
+def test_launcher_used_only_with_options():
+    assert launch.launcher_args(['ls']) == ['ls']
+    assert launch.launcher_args(['ls'], LaunchOptions()) == ['ls']
+    assert launch.launcher_args(['ls'], LaunchOptions(nice=0)) == [
+        sys.executable, '-m', launch.LAUNCHER_MODULE, '--nice', '0', '--', 'ls']
+
+
+@pytest.mark.parametrize('argv', [[], ['--nice'], ['nice', '1', '--', 'ls'], ['--nice', '1', '--'], ['--nice', '1']])
+def test_invalid_arguments(argv):
+    with pytest.raises(ValueError):
+        launch._parse_args(argv)
+    assert launch.main(argv) == 2
+
+
+def test_cpu_list():
+    assert launch.parse_cpu_list('0-3,8, 10-11,2') == [0, 1, 2, 3, 8, 10, 11]
+    assert launch.format_cpu_list([11, 0, 1, 2, 3, 8, 10]) == '0-3,8,10-11'
+    for invalid in ('', 'a', '1-', '3-1', '1,,2'):
+        with pytest.raises(ValueError):
+            launch.parse_cpu_list(invalid)
+
+
+def test_ionice():
+    assert launch.parse_ionice('idle') == (3, 4)
+    assert launch.parse_ionice('best-effort:7') == (2, 7)
+    assert launch.parse_ionice('1:0') == (1, 0)
+    for invalid in ('fast', '2:8', '4', 'idle:x'):
+        with pytest.raises(ValueError):
+            launch.parse_ionice(invalid)
+
+
+def test_cpu_slots_split_cpus(tmp_path):
+    assert launch.take_cpu_slot(tmp_path, 3, range(8)) == [0, 1, 2]
+    assert launch.take_cpu_slot(tmp_path, 3, range(8)) == [3, 4, 5]  # Slot 0 held by this process
+    (tmp_path / f"2.{2 ** 22 + 1}").touch()  # Slot of a dead process is freed
+    assert launch.take_cpu_slot(tmp_path, 3, range(8)) == [6, 7]
+    assert not (tmp_path / f"2.{2 ** 22 + 1}").exists()
+
+
+def test_settings_applied_before_exec():
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)}
+    cpu = min(os.sched_getaffinity(0))
+    code = "import os; print(os.nice(0), sorted(os.sched_getaffinity(0)))"
+
+    result = subprocess.run(
+        launch.launcher_args([sys.executable, '-c', code], LaunchOptions(cpus=[cpu], nice=3)),
+        env=env, capture_output=True, text=True, check=True)
+
+    assert result.stdout.split(' ', 1) == [str(os.nice(0) + 3), f"[{cpu}]\n"]
@@ -0,0 +1,179 @@
+import logging
+import multiprocessing
+import time
+
+import pytest
+
+from runtools.runcli import log
+from runtools.runcli.log import RateLimitFilter, SharedRotatingFileHandler
+
+
+class ListHandler(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def summaries(self):
+        return [r for r in self.records if r.getMessage() == RateLimitFilter.SUMMARY_MESSAGE]
+
+
+@pytest.fixture
+def handler():
+    handler = ListHandler()
+    log.runtools_logger.addHandler(handler)
+    yield handler
+    log.runtools_logger.removeHandler(handler)
+
+
+def test_burst_then_silence_emits_summary(handler):
+    rate_limit = RateLimitFilter(handler, 2, 0.1)
+    handler.addFilter(rate_limit)
+    logger = logging.getLogger('runtools.test')
+    for _ in range(10):
+        logger.warning("Disk full", extra={"job": "j1"})
+
+    assert len(handler.records) == 2
+    deadline = time.monotonic() + 2
+    while not handler.summaries() and time.monotonic() < deadline:
+        time.sleep(0.01)  # No more records logged, the summary is emitted when the window ends
+
+    [summary] = handler.summaries()
+    assert summary.suppressed == 8
+    assert summary.source_message == "Disk full"
+    assert summary.job == "j1"
+    rate_limit.flush()
+    assert len(handler.summaries()) == 1
+
+
+def test_flush_emits_summary_of_open_window(handler):
+    rate_limit = RateLimitFilter(handler, 1, 60)
+    handler.addFilter(rate_limit)
+    logger = logging.getLogger('runtools.test')
+    for i in range(3):
+        logger.warning("Retry", extra={"job": "j1"})
+    logger.warning("Retry", extra={"job": "j2"})
+
+    assert handler.summaries() == []
+    rate_limit.flush()
+
+    [summary] = handler.summaries()
+    assert (summary.job, summary.suppressed) == ("j1", 2)
+
+
+def test_configure_resets_rate_limit(monkeypatch, handler):
+    log.setup_rate_limit(5)
+    flushed = []
+    monkeypatch.setattr(log._rate_limit_filters[0], 'flush', lambda: flushed.append(True))
+
+    log.configure(False)
+
+    assert flushed == [True]  # Pending summaries emitted before the handlers are replaced
+    assert log._rate_limit_filters == []
+    log.runtools_logger.disabled = False
+
+
+def test_summary_only_to_handler_of_filter(handler):
+    other = ListHandler()
+    log.runtools_logger.addHandler(other)
+    rate_limit = RateLimitFilter(handler, 1, 60)
+    handler.addFilter(rate_limit)
+    logger = logging.getLogger('runtools.test')
+    for _ in range(3):
+        logger.warning("Retry")
+
+    rate_limit.flush()
+    log.runtools_logger.removeHandler(other)
+
+    assert len(handler.summaries()) == 1
+    assert other.summaries() == []
+    assert len(other.records) == 3
+
+
+def _write_records(path, count, max_bytes, backup_count):
+    handler = SharedRotatingFileHandler(path, max_bytes, backup_count)
+    handler.setFormatter(logging.Formatter('%(process)d %(message)s'))
+    for i in range(count):
+        handler.emit(logging.makeLogRecord({'msg': f"record {i:05d} " + 'x' * 50}))
+    handler.close()
+
+
+def _log_files(path):
+    return sorted(path.parent.glob(path.name + '*'))
+
+
+def test_rotation_by_two_processes(tmp_path):
+    path = tmp_path / 'runcli.log'
+    ctx = multiprocessing.get_context('fork')
+    processes = [ctx.Process(target=_write_records, args=(path, 3000, 20_000, 1000)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+        assert process.exitcode == 0
+
+    files = [f for f in _log_files(path) if not f.name.endswith('.lock')]
+    lines = [line for f in files for line in f.read_text().splitlines()]
+    assert len(files) > 2
+    assert len(lines) == 6000  # No record lost or overwritten by the rotations
+    for process in processes:
+        records = sorted(line.split()[2] for line in lines if line.startswith(f"{process.pid} record "))
+        assert records == [f"{i:05d}" for i in range(3000)]
+    # The limit is exceeded at most by the records of the other process written since the last check of the path
+    assert all(f.stat().st_size <= 20_000 + log.STAT_RECHECK_RECORDS * 80 for f in files)
+
+
+def test_zero_backup_count_never_rotates(tmp_path):
+    path = tmp_path / 'runcli.log'
+    _write_records(path, 500, 1000, 0)
+
+    assert [f.name for f in _log_files(path) if not f.name.endswith('.lock')] == ['runcli.log']
+    assert len(path.read_text().splitlines()) == 500
+
+
+def test_rotation_prunes_legacy_backups(tmp_path):
+    path = tmp_path / 'runcli.log'
+    for n in (1, 2, 3):
+        (tmp_path / f'runcli.log.{n}').write_text('old\n')
+
+    _write_records(path, 30, 1000, 3)  # Two rotations
+    segments = [f.name for f in _log_files(path) if f.name not in ('runcli.log', 'runcli.log.lock')]
+
+    assert len(segments) == 3
+    assert 'runcli.log.1' in segments and 'runcli.log.2' not in segments and 'runcli.log.3' not in segments
+
+
+def test_configure_closes_replaced_handlers():
+    closed = []
+    handler = ListHandler()
+    handler.close = lambda: closed.append(handler)
+    log.runtools_logger.addHandler(handler)
+
+    log.configure(False)
+
+    assert closed == [handler]
+    log.runtools_logger.disabled = False
+
+
+def test_flush_waits_for_queued_records(tmp_path):
+    path = tmp_path / 'runcli.log'
+    log.setup_async_file(logging.INFO, str(path))
+    for i in range(100):
+        log.runtools_logger.warning("Record", extra={"i": i})
+
+    log.flush()
+
+    assert len(path.read_text().splitlines()) == 100
+    log.configure(False)
+    log.runtools_logger.disabled = False
+
+
+def test_file_logging_failure_reported_by_logging(tmp_path, capsys):
+    log.configure(True, 'warning', 'info', str(tmp_path / 'missing' / 'runcli.log'))
+
+    assert "File logging disabled" in capsys.readouterr().err
+    log.configure(False)
+    log.runtools_logger.disabled = False
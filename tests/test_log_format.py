@@ -0,0 +1,93 @@
+"""The optimized formatters must produce the same output as the original implementation below, byte for byte."""
+import json
+import logging
+import random
+import sys
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+from runtools.runcli.log import JsonFormatter, PlainFormatter
+
+_LOG_RECORD_BUILTINS = frozenset({
+    'name', 'msg', 'args', 'created', 'filename', 'funcName', 'levelname',
+    'levelno', 'lineno', 'module', 'msecs', 'pathname', 'process',
+    'processName', 'relativeCreated', 'stack_info', 'exc_info', 'exc_text',
+    'thread', 'threadName', 'taskName', 'message',
+})
+
+
+def _collect_extras(record):
+    return {k: v for k, v in record.__dict__.items()
+            if k not in _LOG_RECORD_BUILTINS and not k.startswith('_') and v is not None}
+
+
+class BaselinePlainFormatter(logging.Formatter):
+
+    def format(self, record):
+        msg = f"{record.levelname} - {record.getMessage()}"
+        extras = _collect_extras(record)
+        if extras:
+            msg += ' ' + ' '.join(f"{k}={v}" for k, v in extras.items())
+        if record.exc_info and record.exc_info[1]:
+            msg += '\n' + self.formatException(record.exc_info)
+        return msg
+
+
+class BaselineJsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        ts = datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds')
+        data = {
+            "timestamp": ts[:-6] + 'Z' if ts.endswith('+00:00') else ts,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        data.update(_collect_extras(record))
+        if record.exc_info and record.exc_info[1]:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+def _exc_info():
+    try:
+        raise ValueError("Bad value ✗")
+    except ValueError:
+        return sys.exc_info()
+
+
+_EXTRAS = [
+    {},
+    {"job": "export", "instance": "export@1"},
+    {"job": "ünïcode ✓", "count": 3, "ratio": 0.1 + 0.2, "flag": True, "empty": None},
+    {"path": Path('/tmp/x'), "amount": Decimal('1.10'), "items": [1, "two", None], "nested": {"a": {"b": [1.5]}}},
+    {"big": 2 ** 70, "quote": 'say "hi"\n\ttab', "control": '\x00\x1f'},
+    {"_private": "hidden", "job": "j"},
+]
+
+
+def _records():
+    rng = random.Random(42)
+    second = 1_745_576_430
+    times = [second, second + 0.9994999, second + 0.9995, second + 0.9999996, second + 1e-7, 0.0005, 1.0]
+    times += [second + rng.random() * 86_400 for _ in range(200)]
+    for i, created in enumerate(times):
+        extra = _EXTRAS[i % len(_EXTRAS)]
+        record = logging.makeLogRecord({
+            'name': 'runtools.test', 'levelno': logging.WARNING, 'levelname': 'WARNING',
+            'msg': "Message %s ✓" if i % 2 else "Plain message", 'args': (i,) if i % 2 else None,
+            'exc_info': _exc_info() if i % 7 == 0 else None, **extra})
+        record.created = created
+        yield record
+
+
+@pytest.mark.parametrize('formatter, baseline', [
+    (JsonFormatter(), BaselineJsonFormatter()),
+    (PlainFormatter(), BaselinePlainFormatter()),
+])
+def test_output_same_as_baseline(formatter, baseline):
+    for record in _records():
+        assert formatter.format(record).encode() == baseline.format(record).encode()
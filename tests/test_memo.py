@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+from runtools.runcli.memo import Memo, ResultCache, InputIndex, fingerprint
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(tmp_path / 'results')
+
+
+def test_miss_then_hit(cache):
+    memo = Memo('job', ['./etl.sh'], cache_key='v1', cache=cache)
+    assert memo.cached_result() is None
+
+    memo.store('run-1')
+    result = Memo('job', ['./etl.sh'], cache_key='v1', cache=cache).cached_result()
+
+    assert result.run_id == 'run-1'
+    assert result.hits == 1
+    assert cache.lookup(memo.fingerprint).hits == 1  # Hit recorded in the cache entry
+
+
+def test_different_key_or_args_miss(cache):
+    Memo('job', ['./etl.sh'], cache_key='v1', cache=cache).store('run-1')
+
+    assert Memo('job', ['./etl.sh'], cache_key='v2', cache=cache).cached_result() is None
+    assert Memo('job', ['./etl.sh', '-f'], cache_key='v1', cache=cache).cached_result() is None
+    assert Memo('other', ['./etl.sh'], cache_key='v1', cache=cache).cached_result() is None
+
+
+def test_ttl_expired(cache):
+    memo = Memo('job', ['./etl.sh'], cache_key='v1', ttl=60, cache=cache)
+    memo.store('run-1')
+    result = cache.lookup(memo.fingerprint)
+    result.completed = time.time() - 61
+    cache._write(result)
+
+    assert memo.cached_result() is None
+    assert Memo('job', ['./etl.sh'], cache_key='v1', ttl=120, cache=cache).cached_result().run_id == 'run-1'
+    assert Memo('job', ['./etl.sh'], cache_key='v1', cache=cache).cached_result().run_id == 'run-1'  # No TTL
+
+
+def test_changed_input_misses(cache, tmp_path):
+    data = tmp_path / 'data.csv'
+    data.write_text('a,b\n')
+    inputs = [str(tmp_path / '*.csv')]
+    Memo('job', ['./etl.sh'], inputs=inputs, cache=cache).store('run-1')
+    assert Memo('job', ['./etl.sh'], inputs=inputs, cache=cache).cached_result()
+
+    data.write_text('a,b,c\n')
+    assert Memo('job', ['./etl.sh'], inputs=inputs, cache=cache).cached_result() is None
+
+    data.write_text('a,b\n')
+    (tmp_path / 'new.csv').write_text('')  # Added input file
+    assert Memo('job', ['./etl.sh'], inputs=inputs, cache=cache).cached_result() is None
+
+
+def test_env_var_in_fingerprint(monkeypatch):
+    monkeypatch.setenv('REGION', 'eu')
+    eu = fingerprint('job', [], 'v1', env_vars=['REGION'])
+    monkeypatch.setenv('REGION', 'us')
+
+    assert fingerprint('job', [], 'v1', env_vars=['REGION']) != eu
+    assert fingerprint('job', [], 'v1') == fingerprint('job', [], 'v1', env_vars=[])
+
+
+def test_index_reuses_digest_of_unchanged_file(tmp_path, monkeypatch):
+    data = tmp_path / 'data.csv'
+    data.write_text('a,b\n')
+    index = InputIndex(tmp_path / 'inputs.index')
+    digest = index.digest(data)
+    index.save()
+
+    monkeypatch.setattr('runtools.runcli.memo.file_digest', lambda _: pytest.fail("Unchanged file hashed again"))
+    assert InputIndex(tmp_path / 'inputs.index').digest(data) == digest
+
+
+def test_concurrent_saves_keep_all_entries(tmp_path):
+    """Jobs of a batch load the index in parallel threads, no saved digest can be lost."""
+    files = []
+    for i in range(8):
+        files.append(tmp_path / f'data{i}.csv')
+        files[-1].write_text(f'{i}\n')
+    indexes = [InputIndex(tmp_path / 'inputs.index') for _ in files]
+    start = threading.Barrier(len(files))
+
+    def save(index, file):
+        index.digest(file)
+        start.wait()
+        index.save()
+
+    threads = [threading.Thread(target=save, args=args) for args in zip(indexes, files)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(InputIndex(tmp_path / 'inputs.index')._load()) == len(files)
+    assert list(tmp_path.glob('*.tmp')) == []
+
+
+def test_concurrent_stores_of_same_result(cache):
+    threads = [threading.Thread(target=cache.store, args=('fp', 'job', f'run{i}')) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.lookup('fp').run_id.startswith('run')
+    assert list(cache.directory.glob('*.tmp')) == []
+
+
+def test_create_disabled_without_key_or_inputs():
+    assert Memo.create('job', ['./etl.sh']) is None
@@ -0,0 +1,47 @@
+import socket
+from dataclasses import dataclass
+
+from runtools.runcli.metrics import MetricsServer, RunMetrics
+from runtools.runcli.output import OutputWarningDetector, OutputWarningMatcher
+
+
+@dataclass
+class Line:
+    message: str
+
+
+def _get(path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(path))
+        sock.sendall(b"GET /metrics HTTP/1.0\r\n\r\n")
+        return b''.join(iter(lambda: sock.recv(65536), b'')).decode()
+
+
+def test_warnings_counted_by_detector():
+    detector = OutputWarningDetector(OutputWarningMatcher(['ERR']))
+    metrics = RunMetrics('job', warning_detector=detector)
+    for message in ('ok', 'ERR 1', 'ERR 2'):
+        detector(Line(message))
+
+    assert ('warnings', 'gauge', 'Output and time warnings of the run', 2) in metrics.samples()
+
+
+def test_server_replaces_stale_socket(tmp_path):
+    path = tmp_path / 'metrics.sock'
+    socket.socket(socket.AF_UNIX, socket.SOCK_STREAM).bind(str(path))  # Left by a previous run
+
+    server = MetricsServer(path, RunMetrics('job')).start()
+    try:
+        assert 'runcli_warnings{job="job",group=""} 0' in _get(path)
+    finally:
+        server.stop()
+    assert not path.exists()
+
+
+def test_server_does_not_remove_other_files(tmp_path):
+    path = tmp_path / 'metrics.sock'
+    path.write_text('data')
+
+    MetricsServer(path, RunMetrics('job')).start().stop()
+
+    assert path.read_text() == 'data'
@@ -0,0 +1,125 @@
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+import pytest
+
+from runtools.runcli.output import StatusCoalescer, combine_patterns, OutputWarningMatcher, OutputWarningDetector
+
+
+@dataclass
+class Line:
+    """Has the attributes of `runcore.output.OutputLine` used by the output processors."""
+    message: str
+    ordinal: int = 0
+    fields: dict = None
+
+
+class Sink:
+
+    def __init__(self):
+        self.lines = []
+        self.received = threading.Event()
+
+    def __call__(self, line):
+        self.lines.append(line)
+        self.received.set()
+
+
+def test_coalescer_merges_updates_within_interval():
+    coalescer = StatusCoalescer(60)
+
+    assert coalescer(Line('a', fields={'completed': 1})).fields == {'completed': 1}
+    assert coalescer(Line('b', fields={'completed': 2, 'total': 5})).fields is None
+    assert coalescer(Line('c', fields={'completed': 3})).fields is None
+    assert coalescer(Line('d')).fields is None
+
+
+def test_coalescer_terminal_field_flushes_pending():
+    coalescer = StatusCoalescer(60)
+    coalescer(Line('a', fields={'completed': 1}))
+    coalescer(Line('b', fields={'completed': 2, 'total': 5}))
+
+    assert coalescer(Line('done', fields={'result': 'ok'})).fields == {'completed': 2, 'total': 5, 'result': 'ok'}
+
+
+def test_coalescer_pending_attached_to_next_line_after_interval():
+    coalescer = StatusCoalescer(0.05)
+    coalescer(Line('a', fields={'completed': 1}))
+    coalescer(Line('b', fields={'completed': 2}))
+    time.sleep(0.06)
+
+    assert coalescer(Line('c')).fields == {'completed': 2}
+
+
+def test_coalescer_last_update_emitted_after_silence():
+    sink = Sink()
+    coalescer = StatusCoalescer(0.1, sink=sink)
+    coalescer(Line('a', 1, fields={'completed': 1}))
+    coalescer(Line('b', 2, fields={'completed': 2}))
+    coalescer(Line('c', 3, fields={'completed': 3, 'total': 3}))
+
+    assert sink.received.wait(2)
+    coalescer.close()
+    assert sink.lines == [Line('c', 3, fields={'completed': 3, 'total': 3})]
+    assert coalescer(sink.lines[0]) is sink.lines[0]  # Released line passes unchanged if processed again
+
+
+def test_coalescer_close_emits_pending():
+    sink = Sink()
+    coalescer = StatusCoalescer(60, sink=sink)
+    coalescer(Line('a', fields={'completed': 1}))
+    coalescer(Line('b', fields={'completed': 2}))
+
+    coalescer.close()
+
+    assert [line.fields for line in sink.lines] == [{'completed': 2}]
+
+
+def test_combine_patterns_gate_without_groups():
+    gate, gated, separate = combine_patterns(['ERR.*', 'fail(ed)?', '(?i)fatal', 'a|b'], ['x.y'])
+
+    assert gate == r'ERR.*|a|b|x\.y'
+    assert re.compile(gate).groups == 0
+    assert gated == ['ERR.*', 'a|b', 'x.y']
+    assert separate == ['fail(ed)?', '(?i)fatal']
+
+
+def test_combine_patterns_nothing_to_combine():
+    assert combine_patterns([]) == (None, [], [])
+    assert combine_patterns(['(a)']) == (None, [], ['(a)'])
+
+
+def test_combine_patterns_invalid():
+    with pytest.raises(re.error):
+        combine_patterns(['ERR[', 'ok'])
+
+
+def test_matcher_reports_pattern_which_matched():
+    matcher = OutputWarningMatcher(['ERR\\d+', 'timeout', 'retry (\\d+)'], ['Traceback', '[!]'])
+
+    assert matcher.match('all good') is None
+    assert matcher.match('ERR42 disk full') == 'ERR\\d+'
+    assert matcher.match('connection timeout') == 'timeout'
+    assert matcher.match('Traceback (most recent call last):') == 'Traceback'
+    assert matcher.match('[!] attention') == '[!]'
+    assert matcher.match('retry 3') == 'retry (\\d+)'
+
+
+def test_matcher_reports_first_pattern_in_given_order():
+    matcher = OutputWarningMatcher(['retry (\\d+)', 'ERR'], ['retry'])
+
+    assert matcher.match('ERR on retry 3') == 'retry (\\d+)'  # Separate (not gated) pattern given first
+    assert matcher.match('ERR on retry') == 'ERR'
+    assert matcher.match('retry') == 'retry'
+
+
+def test_detector_counts_and_reports_warnings():
+    reported = []
+    detector = OutputWarningDetector(OutputWarningMatcher(['ERR']), lambda pattern, line: reported.append(pattern))
+    lines = [Line('ok'), Line('ERR 1'), Line('ERR 2')]
+
+    assert [detector(line) for line in lines] == lines
+    assert detector.count == 2
+    assert reported == ['ERR', 'ERR']
@@ -0,0 +1,61 @@
+import gzip
+import multiprocessing
+import os
+import subprocess
+import time
+
+from runtools.runcli.rawoutput import RawOutputPump
+
+_ctx = multiprocessing.get_context('fork')
+
+
+def _pump_program(terminal, output_file, program, results, **pump_options):
+    """Run the program under the pump in a child process, its stdout and stderr (the terminal) go to the file."""
+    fd = os.open(terminal, os.O_WRONLY | os.O_CREAT)
+    os.dup2(fd, 1)
+    os.dup2(fd, 2)
+    os.close(fd)
+    start = time.monotonic()
+    pump = RawOutputPump(output_file, **pump_options)
+    with pump:
+        subprocess.run(program)
+    elapsed = time.monotonic() - start
+    os.write(1, b"after\n")  # Original descriptor restored
+    results.put((elapsed, [t.is_alive() for t in pump._threads]))
+
+
+def _run(tmp_path, program, output_name='output.out', **pump_options):
+    terminal, output_file = tmp_path / 'terminal', tmp_path / output_name
+    results = _ctx.Queue()
+    process = _ctx.Process(target=_pump_program, args=(terminal, output_file, program, results), kwargs=pump_options)
+    process.start()
+    elapsed, alive = results.get(timeout=30)
+    process.join(10)
+    assert process.exitcode == 0
+    return terminal, output_file, elapsed, alive
+
+
+def test_output_copied_and_descriptors_restored(tmp_path):
+    terminal, output_file, _, alive = _run(tmp_path, ['sh', '-c', 'echo out; echo err >&2'])
+
+    assert sorted(output_file.read_bytes().splitlines()) == [b'err', b'out']
+    assert terminal.read_bytes().splitlines()[-1] == b'after'
+    assert sorted(terminal.read_bytes().splitlines()[:-1]) == [b'err', b'out']
+    assert alive == [False, False]
+
+
+def test_exit_not_blocked_by_background_process(tmp_path):
+    program = ['sh', '-c', 'echo started; sleep 5 & echo done']
+
+    terminal, output_file, elapsed, alive = _run(tmp_path, program, close_timeout=0.2)
+
+    assert elapsed < 3
+    assert output_file.read_bytes().splitlines() == [b'started', b'done']
+    assert alive == [True, True]  # Pumps left behind, the output of the background process is not copied
+    assert terminal.read_bytes().splitlines()[-1] == b'after'
+
+
+def test_compressed_output_complete_after_exit(tmp_path):
+    _, output_file, _, _ = _run(tmp_path, ['seq', '1000'], 'output.out.gz', compression='gzip')
+
+    assert gzip.decompress(output_file.read_bytes()).splitlines() == [str(i).encode() for i in range(1, 1001)]
@@ -0,0 +1,46 @@
+import logging
+import subprocess
+import sys
+
+from runtools.runcli.cgroup import Cgroup, CgroupLimits
+from runtools.runcli.resources import ResourceMonitor
+
+
+def _allocate(mib):
+    subprocess.run([sys.executable, '-c', f"b = bytearray({mib} * 1024 * 1024); b[::4096] = b'x' * len(b[::4096])"],
+                   check=True)
+
+
+def test_max_rss_of_run_raising_the_peak():
+    _allocate(1)
+    with ResourceMonitor() as monitor:
+        _allocate(250)
+
+    assert monitor.usage.max_rss >= 250 * 1024 * 1024
+
+
+def test_max_rss_unknown_when_earlier_child_peaked_higher():
+    _allocate(200)
+    with ResourceMonitor() as monitor:
+        _allocate(1)
+
+    assert monitor.usage.max_rss is None
+
+
+def test_cgroup_memory_peak(tmp_path):
+    (tmp_path / 'memory.peak').write_text('123456\n')
+
+    assert Cgroup(tmp_path, CgroupLimits(memory_max=1 << 30)).memory_peak() == 123456
+    assert Cgroup(tmp_path, CgroupLimits(cpu_max=1.0)).memory_peak() is None  # Memory controller not used
+    assert Cgroup(tmp_path / 'missing', CgroupLimits(memory_max=1 << 30)).memory_peak() is None
+
+
+def test_summary_logged_at_info_only_when_requested(caplog):
+    caplog.set_level(logging.DEBUG, logger='runtools.runcli.resources')
+    with ResourceMonitor():
+        pass
+    with ResourceMonitor(summary=True):
+        pass
+
+    assert [(r.getMessage(), r.levelno) for r in caplog.records] == [
+        ('Resource usage', logging.DEBUG), ('Resource usage', logging.INFO)]
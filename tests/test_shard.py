@@ -0,0 +1,67 @@
+import io
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from runtools.runcli import shard
+from runtools.runcli.shard import ShardSupervisor
+
+_SLEEPER = "import os, time; print(os.getpid(), flush=True); time.sleep(30)"
+
+
+def _python(code):
+    return [sys.executable, '-c', code]
+
+
+def _pids(output):
+    return [int(line.split(b'] ')[1]) for line in output.splitlines()]
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def _wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Condition not met in time"
+        time.sleep(0.01)
+
+
+def test_shard_placeholders_and_env_and_tagged_output():
+    code = "import os, sys; print(sys.argv[1], os.environ['RUN_SHARD'], os.environ['RUN_SHARDS'])"
+    stdout, stderr = io.BytesIO(), io.BytesIO()
+
+    assert ShardSupervisor(_python(code) + ['{shard}/{shards}'], 3, stdout=stdout, stderr=stderr).run() == 0
+    assert sorted(stdout.getvalue().splitlines()) == [f"[shard {i}] {i}/3 {i} 3".encode() for i in range(3)]
+    assert stderr.getvalue() == b''
+
+
+def test_failed_shard_terminates_remaining_shards():
+    code = f"import sys\nif sys.argv[1] == '1': sys.exit(3)\n{_SLEEPER}"
+    stdout, stderr = io.BytesIO(), io.BytesIO()
+    started = time.monotonic()
+
+    assert ShardSupervisor(_python(code) + ['{shard}'], 3, stdout=stdout, stderr=stderr).run() == 3
+    assert time.monotonic() - started < 10
+    assert b"[shard 1] failed with exit code 3" in stderr.getvalue()
+    assert not any(_is_alive(pid) for pid in _pids(stdout.getvalue()))
+
+
+def test_stop_of_supervisor_terminates_shards():
+    supervisor = subprocess.Popen(shard.launcher_args(_python(_SLEEPER), 2), stdout=subprocess.PIPE,
+                                  stderr=subprocess.PIPE, env={**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)})
+    pids = [_pids(supervisor.stdout.readline())[0] for _ in range(2)]  # Both shards started
+
+    supervisor.send_signal(signal.SIGTERM)
+
+    assert supervisor.wait(10) == 128 + signal.SIGTERM
+    _wait_until(lambda: not any(_is_alive(pid) for pid in pids))
+    supervisor.stdout.close()
+    supervisor.stderr.close()
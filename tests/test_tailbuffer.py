@@ -0,0 +1,106 @@
+import multiprocessing
+import os
+import struct
+import threading
+
+import pytest
+
+from runtools.runcli import tailbuffer
+from runtools.runcli.tailbuffer import MmapTailBuffer, TailReader
+
+_ctx = multiprocessing.get_context('fork')
+
+
+@pytest.fixture(autouse=True)
+def runtime_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+
+
+def _buffer(job_id='job', capacity=16):
+    return MmapTailBuffer(tailbuffer.tail_path(job_id, 'run', create_dir=True), capacity)
+
+
+def test_wraparound_keeps_last_capacity_bytes():
+    buffer = _buffer(capacity=16)
+    with TailReader(buffer.path) as reader:
+        buffer.write(b'0123456789')
+        assert reader.read() == (b'0123456789', 10)
+        buffer.write(b'abcdefghij')
+        assert reader.read() == (b'456789abcdefghij', 20)
+        assert reader.read(since=15) == (b'fghij', 20)
+        buffer.write(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ')  # Larger than the capacity
+        assert reader.read(since=20) == (b'KLMNOPQRSTUVWXYZ', 46)  # The rest was overwritten before read
+    assert buffer.snapshot() == b'KLMNOPQRSTUVWXYZ'
+    buffer.close()
+
+
+def test_follow_until_buffer_removed():
+    buffer = _buffer(capacity=1024)
+    written = [f"line {i}\n".encode() for i in range(50)]
+
+    def write():
+        for chunk in written:
+            buffer.write(chunk)
+        buffer.close()
+
+    with TailReader(buffer.path) as reader:
+        writer = threading.Thread(target=write)
+        writer.start()
+        followed = b''.join(reader.follow(poll_interval=0.001))
+        writer.join()
+
+    assert followed == b''.join(written)
+    assert tailbuffer.find_tail_files() == []
+
+
+def _write_and_die(path):
+    MmapTailBuffer(path, 64).write(b'last words\n')
+    os._exit(0)  # Killed job: the file is not removed
+
+
+def _file_of_dead_writer(job_id):
+    path = tailbuffer.tail_path(job_id, 'run', create_dir=True)
+    process = _ctx.Process(target=_write_and_die, args=(path,))
+    process.start()
+    process.join(10)
+    assert path.exists()
+    return path
+
+
+def test_follow_ends_when_writer_dead():
+    path = _file_of_dead_writer('killed')
+
+    with TailReader(path) as reader:
+        assert b''.join(reader.follow(poll_interval=0.001)) == b'last words\n'
+    assert not path.exists()
+
+
+def test_stale_files_removed_when_listed():
+    alive = _buffer('alive')
+    path = _file_of_dead_writer('killed')
+
+    assert tailbuffer.find_tail_files() == [alive.path]
+    assert not path.exists()
+    alive.close()
+
+
+def test_reused_pid_not_taken_for_writer():
+    buffer = _buffer()
+    with open(buffer.path, 'r+b') as f:  # Same (alive) pid, but a different process start time
+        f.seek(tailbuffer._HEADER.size - 8)
+        f.write(struct.pack('<Q', tailbuffer._process_start_time(os.getpid()) + 1))
+
+    assert tailbuffer.find_tail_files() == []
+    buffer.close()
+
+
+@pytest.mark.parametrize('data, count, expected', [
+    (b'a\nb\nc\n', 2, b'b\nc\n'),
+    (b'a\nb\nc\n', 1, b'c\n'),
+    (b'a\nb\nc', 1, b'c'),
+    (b'a\nb\nc', 5, b'a\nb\nc'),
+    (b'a\nb\n', 0, b''),
+    (b'', 3, b''),
+])
+def test_last_lines(data, count, expected):
+    assert tailbuffer.last_lines(data, count) == expected
@@ -0,0 +1,21 @@
+import threading
+
+from runtools.runcli import tracing
+
+
+def test_output_spans_counted_from_concurrent_readers():
+    tracer = tracing.Tracer()
+    processor = tracing.TracedOutputProcessor(tracer, lambda line: None, max_spans=100)
+
+    def read():
+        for _ in range(20_000):
+            processor('line')
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+
+    assert len(tracer.events) == 100
+    assert tracer.dropped == 39_900